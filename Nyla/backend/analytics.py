@@ -1,7 +1,46 @@
 import re
+import numpy as np
 import pandas as pd
 import math
-from datetime import timedelta, datetime
+from datetime import datetime
+
+
+# rows fetched to detect columns before loading or aggregating
+DETECTION_SAMPLE_ROWS = 1000
+# information_schema DATA_TYPEs never sampled for detection (binary, JSON, spatial)
+UNSAMPLED_TYPES = {
+    'tinyblob', 'blob', 'mediumblob', 'longblob', 'binary', 'varbinary', 'json',
+    'geometry', 'point', 'linestring', 'polygon', 'multipoint', 'multilinestring',
+    'multipolygon', 'geometrycollection', 'geomcollection',
+}
+# information_schema DATA_TYPEs fetched as HEX() text, so binary ids compare and print as strings
+BINARY_TYPES = {'binary', 'varbinary', 'tinyblob', 'blob', 'mediumblob', 'longblob'}
+# information_schema DATA_TYPEs that hold dates SQL can compare chronologically
+TEMPORAL_TYPES = {'date', 'datetime', 'timestamp'}
+# information_schema DATA_TYPEs whose comparisons follow the column collation
+STRING_TYPES = {'char', 'varchar', 'tinytext', 'text', 'mediumtext', 'longtext', 'enum', 'set'}
+# rows fetched per round-trip by the streaming engine
+STREAM_CHUNK_ROWS = 100000
+# chunk aggregates buffered before they are folded into the running state
+STREAM_FOLD_EVERY = 8
+# estimated in-memory table size above which 'auto' switches to streaming
+STREAM_MEMORY_LIMIT = 512 * 1024 * 1024
+# pandas object columns take roughly this multiple of the on-disk data size
+FRAME_SIZE_FACTOR = 3
+
+ENGINES = ('auto', 'pushdown', 'stream', 'pandas')
+
+# record keys each frontend analysis_type displays; requests without one get every key
+ANALYSIS_COLUMNS = {
+    'order-frequency': ('customer_id', 'customer_name', 'last_order_date', 'predicted_next_order_date'),
+    'recency': ('customer_id', 'last_order_date', 'recency'),
+    'churn-flag': ('customer_id', 'customer_name', 'last_order_date', 'churn_flag'),
+    'segmentation': ('customer_id', 'customer_name', 'last_order_date', 'customer_classification'),
+}
+# other accepted spellings of analysis_type
+ANALYSIS_ALIASES = {'churn': 'churn-flag', 'frequency': 'order-frequency', 'segments': 'segmentation'}
+# analysis types with a plan cheaper than the full per-customer aggregation
+LIGHT_ANALYSES = ('recency',)
 
 
 def _find_date_column(df):
@@ -64,9 +103,11 @@ def _find_customer_name_column(df, customer_col=None):
     return None
 
 
-def _classify_customer_segment(total_orders, avg_gap, last_order_date, first_order_date):
+def _classify_customer_segment(total_orders, avg_gap, last_order_date, first_order_date, now=None):
     """
     New segmentation: Loyal, At Risk, Lost, New, High Value, One-time buyers
+
+    ``now`` is the reference time for recency (default: the current time).
     """
     try:
         # Handle NaN values
@@ -78,7 +119,8 @@ def _classify_customer_segment(total_orders, avg_gap, last_order_date, first_ord
         # Calculate days since last order
         if pd.notna(last_order_date):
             last_date = pd.Timestamp(last_order_date)
-            days_since_last = (datetime.now().replace(tzinfo=None) - last_date.replace(tzinfo=None)).days
+            now = datetime.now() if now is None else now
+            days_since_last = (now.replace(tzinfo=None) - last_date.replace(tzinfo=None)).days
         else:
             days_since_last = float('inf')
         
@@ -130,14 +172,95 @@ def _classify_customer_segment(total_orders, avg_gap, last_order_date, first_ord
         return 'Unknown'
 
 
-def perform_analytics(connection, table_name):
-    """Perform customer-wise analytics and return JSON-serializable records."""
-    query = f"SELECT * FROM `{table_name}`"
-    df = pd.read_sql(query, connection)
+# Segment rules, evaluated in priority order: each customer gets the first
+# segment whose condition holds, or DEFAULT_SEGMENT if none do. Conditions
+# take a dict of numpy arrays (one entry per customer) and return a boolean
+# mask:
+#   total_orders       number of dated orders
+#   avg_gap            average days between orders (inf when undefined)
+#   days_since_last    days from the reference time to the last order (inf when unknown)
+#   customer_lifetime  days from first to last order (0 when unknown)
+SEGMENT_RULES = [
+    ('One-time buyers', lambda m: m['total_orders'] == 1),
+    ('New', lambda m: (m['customer_lifetime'] < 30) & (m['total_orders'] <= 2)),
+    ('High Value', lambda m: (m['total_orders'] >= 10) & (m['avg_gap'] <= 14)),
+    ('Loyal', lambda m: (m['total_orders'] >= 5) & (m['avg_gap'] > 0)
+        & (m['days_since_last'] <= m['avg_gap'] * 1.5)),
+    ('At Risk', lambda m: (m['total_orders'] >= 3) & (m['days_since_last'] > m['avg_gap'] * 1.5)
+        & (m['days_since_last'] < m['avg_gap'] * 3)),
+    ('Lost', lambda m: (m['days_since_last'] > m['avg_gap'] * 3) | (m['days_since_last'] > 90)),
+    ('Loyal', lambda m: m['total_orders'] >= 3),
+]
+DEFAULT_SEGMENT = 'At Risk'
+CHURN_SEGMENTS = ('At Risk', 'Lost')
 
-    if df.empty:
-        return []
 
+def _naive(dates):
+    """Return a datetime Series with any timezone dropped, keeping wall-clock time."""
+    dates = pd.to_datetime(dates)
+    if getattr(dates.dt, 'tz', None) is not None:
+        return dates.dt.tz_localize(None)
+    return dates
+
+
+def _segment_metrics(results, now):
+    """Build the per-customer arrays that SEGMENT_RULES are evaluated against."""
+    last = _naive(results['last_order_date'])
+    first = _naive(results['first_order_date'])
+    return {
+        'total_orders': np.trunc(pd.to_numeric(results['total_orders'], errors='coerce').to_numpy(dtype=float)),
+        'avg_gap': pd.to_numeric(results['avg_order_gap'], errors='coerce').fillna(np.inf).to_numpy(dtype=float),
+        'days_since_last': (pd.Timestamp(now) - last).dt.days.fillna(np.inf).to_numpy(dtype=float),
+        'customer_lifetime': (last - first).dt.days.fillna(0).to_numpy(dtype=float),
+    }
+
+
+def _classify_segments(results, now, rules=None):
+    """Classify every customer at once by evaluating segment rules as boolean masks.
+
+    Vectorized equivalent of ``_classify_customer_segment`` with ``now`` as
+    the reference time for every row.
+    """
+    rules = SEGMENT_RULES if rules is None else rules
+    metrics = _segment_metrics(results, now)
+    # a missing order count short-circuits to 'New', as in the scalar version
+    conditions = [np.isnan(metrics['total_orders'])]
+    choices = ['New']
+    for segment, condition in rules:
+        conditions.append(np.asarray(condition(metrics), dtype=bool))
+        choices.append(segment)
+    segments = np.select(conditions, choices, default=DEFAULT_SEGMENT)
+    return pd.Series(segments, index=results.index, dtype=object)
+
+
+def _quote_ident(name):
+    """Quote a MySQL identifier, escaping embedded backticks."""
+    return '`' + str(name).replace('`', '``') + '`'
+
+
+def _column_expr(column, types=None):
+    """SQL reading ``column``'s values; binary columns are read as their hex text."""
+    if types and types.get(column) in BINARY_TYPES:
+        return f"HEX({_quote_ident(column)})"
+    return _quote_ident(column)
+
+
+def _select_column(column, types=None):
+    """SELECT list entry for ``column``, named after the column."""
+    expr = _column_expr(column, types)
+    return expr if expr == _quote_ident(column) else f"{expr} AS {_quote_ident(column)}"
+
+
+def _key_placeholder(column, types=None):
+    """Placeholder comparing ``column`` with a value read through ``_select_column``."""
+    return 'UNHEX(%s)' if types and types.get(column) in BINARY_TYPES else '%s'
+
+
+def _detect_columns(df):
+    """Detect the date, customer id and customer name columns of a frame.
+
+    Raises ValueError when no usable date or customer column is found.
+    """
     date_col = _find_date_column(df)
     customer_col = _find_customer_column(df)
     name_col = _find_customer_name_column(df, customer_col)
@@ -149,113 +272,758 @@ def perform_analytics(connection, table_name):
             'detected_customer_column': customer_col,
         }
         raise ValueError(f"Table must contain at least one date and one customer identifier column. Detection: {found}")
+    return date_col, customer_col, name_col
+
+
+def _column_types(connection, table_name):
+    """Return ``{column: data_type}`` in table order from information_schema, or None if unavailable."""
+    try:
+        cursor = connection.cursor()
+        cursor.execute(
+            "SELECT COLUMN_NAME, DATA_TYPE FROM information_schema.COLUMNS "
+            "WHERE TABLE_SCHEMA = DATABASE() AND TABLE_NAME = %s ORDER BY ORDINAL_POSITION",
+            (table_name,)
+        )
+        rows = cursor.fetchall()
+        cursor.close()
+    except Exception:
+        return None
+    if not rows:
+        return None
+    return {_as_text(name): _as_text(data_type).lower() for name, data_type in rows}
+
+
+def _as_text(value):
+    """Decode bytes returned by some drivers for information_schema columns."""
+    return value.decode('utf-8') if isinstance(value, (bytes, bytearray)) else str(value)
+
+
+def _detect_sample_columns(connection, table_name):
+    """Detect columns on a small sample instead of the whole table.
+
+    When information_schema is available, the values of binary, JSON and
+    spatial columns are not fetched (the detectors still see their names)
+    and temporal columns are typed from their declared type.  A binary
+    column detected as the customer id is read as ``HEX()`` text by the
+    loaders. Returns ``(date_col, customer_col, name_col,
+    native_dates)``, or None if the table is empty. ``native_dates`` is True
+    when the date column is a DATE/DATETIME/TIMESTAMP column that SQL can
+    compare and order chronologically.
+    """
+    types = _column_types(connection, table_name)
+    if types:
+        select = ', '.join(_quote_ident(c) if t not in UNSAMPLED_TYPES else f"NULL AS {_quote_ident(c)}"
+                           for c, t in types.items())
+    else:
+        select = '*'
+    sample = pd.read_sql(f"SELECT {select} FROM {_quote_ident(table_name)} LIMIT {DETECTION_SAMPLE_ROWS}", connection)
+    if sample.empty:
+        return None
+    if types:
+        # an all-NULL sample of a temporal column should still detect as a date
+        for c in sample.columns:
+            if types.get(c) in TEMPORAL_TYPES:
+                sample[c] = pd.to_datetime(sample[c], errors='coerce')
+    date_col, customer_col, name_col = _detect_columns(sample)
+    if types:
+        native_dates = types.get(date_col) in TEMPORAL_TYPES
+    else:
+        native_dates = pd.api.types.is_datetime64_any_dtype(sample[date_col])
+    return date_col, customer_col, name_col, native_dates
+
+
+def _load_projected(connection, table_name, date_col, customer_col, name_col=None, where=None,
+                    progress=None, params=None):
+    """Load only the detected columns, with compact dtypes.
+
+    Dates are parsed to datetime64 and string ids and names become
+    categoricals, which store each distinct value once. ``where`` may use
+    ``%s`` placeholders bound from ``params``. ``progress`` is told when the
+    fetch ends and 'parsing' starts. Binary columns are read as hex text.
+    """
+    types = _column_types(connection, table_name)
+    columns = list(dict.fromkeys(c for c in (customer_col, date_col, name_col) if c))
+    query = f"SELECT {', '.join(_select_column(c, types) for c in columns)} FROM {_quote_ident(table_name)}"
+    if where:
+        query += f" WHERE {where}"
+    df = pd.read_sql(query, connection, params=params)
+    _report(progress, 'parsing', len(df))
+    df[date_col] = pd.to_datetime(df[date_col], errors='coerce')
+    for c in (customer_col, name_col):
+        if c and c != date_col and _all_strings(df[c]):
+            df[c] = df[c].astype('category')
+    return df
+
+
+def _all_strings(values):
+    """Return True if every non-null value is a str (so categories sort like the raw values)."""
+    if values.dtype != object and not pd.api.types.is_string_dtype(values):
+        return False
+    present = values.dropna()
+    return not present.empty and present.map(type).eq(str).all()
+
+
+def _supports_pushdown(connection):
+    """Return True if the server supports the window functions used by the pushdown query.
 
+    MySQL 8.0+ and MariaDB 10.2+ provide LAG() and FIRST_VALUE(). Connections
+    that are not MySQL (or whose version cannot be read) report False so the
+    pandas path is used instead.
+    """
+    try:
+        info = connection.get_server_info()
+    except Exception:
+        return False
+    if not info:
+        return False
+    match = re.search(r'(\d+)\.(\d+)(?:\.\d+)?-MariaDB', info, re.IGNORECASE)
+    if match:
+        return (int(match.group(1)), int(match.group(2))) >= (10, 2)
+    match = re.match(r'(\d+)\.(\d+)', info)
+    if match:
+        return int(match.group(1)) >= 8
+    return False
+
+
+def _build_pushdown_query(table_name, date_col, customer_col, name_col=None, where=None, types=None):
+    """Build a GROUP BY query returning one row of order stats per customer.
+
+    Gaps are whole days between consecutive orders (TIMESTAMPDIFF truncates
+    like ``timedelta.days`` does for positive gaps). Their sum and count are
+    returned separately so the average is computed in full float precision
+    rather than MySQL's DECIMAL AVG(). NULL dates are ordered last, matching
+    the pandas sort, and ``row_count`` lets the caller detect them. ``where``
+    further restricts the rows before the window functions run. ``types``
+    (``{column: data_type}``) decides how the customer key is read: text
+    ids are grouped under a binary collation, so ids differing only in case
+    or accents stay apart as they do in pandas, and binary ids as hex text.
+    """
+    types = types or {}
+    table = _quote_ident(table_name)
+    cust = _quote_ident(customer_col)
+    if types.get(customer_col) in STRING_TYPES:
+        cust = f"CONVERT({cust} USING utf8mb4) COLLATE utf8mb4_bin"
+    else:
+        cust = _column_expr(customer_col, types)
+    date = _quote_ident(date_col)
+    order = f"{date} IS NULL, {date}"
+    if name_col:
+        name = _quote_ident(name_col)
+        name_expr = (
+            f"FIRST_VALUE({name}) OVER (PARTITION BY {cust} "
+            f"ORDER BY {name} IS NULL, {order})"
+        )
+    else:
+        name_expr = "NULL"
+    condition = f"{_quote_ident(customer_col)} IS NOT NULL" + (f" AND ({where})" if where else "")
+
+    return (
+        "SELECT customer_id, "
+        "COUNT(*) AS row_count, "
+        "COUNT(order_date) AS total_orders, "
+        "MIN(order_date) AS first_order_date, "
+        "MAX(order_date) AS last_order_date, "
+        "MAX(first_name) AS customer_name, "
+        "SUM(gap) AS gap_sum, "
+        "COUNT(gap) AS gap_count "
+        "FROM ("
+        f"SELECT {cust} AS customer_id, {date} AS order_date, "
+        f"{name_expr} AS first_name, "
+        f"TIMESTAMPDIFF(DAY, LAG({date}) OVER (PARTITION BY {cust} ORDER BY {order}), {date}) AS gap "
+        f"FROM {table} WHERE {condition}"
+        ") AS o "
+        "GROUP BY customer_id"
+    )
+
+
+def _aggregate_pushdown(connection, table_name, date_col, customer_col, name_col=None, where=None, params=None):
+    """Run the pushdown query and return the per-customer order stats frame."""
+    types = _column_types(connection, table_name)
+    query = _build_pushdown_query(table_name, date_col, customer_col, name_col, where, types)
+    agg = pd.read_sql(query, connection, params=params)
+
+    agg['first_order_date'] = pd.to_datetime(agg['first_order_date'], errors='coerce')
+    agg['last_order_date'] = pd.to_datetime(agg['last_order_date'], errors='coerce')
+    agg['total_orders'] = agg['total_orders'].astype('int64')
+
+    # a NULL date anywhere in a multi-order history makes the pandas gap NaN
+    gap_count = pd.to_numeric(agg['gap_count'], errors='coerce')
+    gap_sum = pd.to_numeric(agg['gap_sum'], errors='coerce').astype(float)
+    complete = (gap_count > 0) & (agg['row_count'] == agg['total_orders'])
+    agg['avg_order_gap'] = (gap_sum / gap_count).where(complete)
+
+    if name_col:
+        names = agg['customer_name']
+        agg['customer_name'] = names.where(names.isna(), names.astype(str))
+    else:
+        agg['customer_name'] = None
+
+    agg = agg.sort_values('customer_id').reset_index(drop=True)
+    return agg[['customer_id', 'total_orders', 'first_order_date', 'last_order_date',
+                'customer_name', 'avg_order_gap']]
+
+
+def _aggregate_frame(df, date_col, customer_col, name_col=None, check_dates=True, progress=None):
+    """Compute the per-customer order stats frame from raw order rows.
+
+    ``check_dates=False`` skips the all-dates-unparseable check, for callers
+    aggregating one shard of a larger table. ``progress`` is told when the
+    gap computation ('gaps') starts.
+    """
     df[date_col] = pd.to_datetime(df[date_col], errors='coerce')
-    if df[date_col].isna().all():
+    if check_dates and df[date_col].isna().all():
         raise ValueError(f"Detected date column '{date_col}' could not be parsed as dates.")
 
     df = df.sort_values(by=[customer_col, date_col])
 
     # compute basic order stats per customer
-    customer_orders = df.groupby(customer_col).agg({
+    customer_orders = df.groupby(customer_col, observed=True).agg({
         date_col: ['count', 'min', 'max']
     }).reset_index()
     customer_orders.columns = ['customer_id', 'total_orders', 'first_order_date', 'last_order_date']
+    if isinstance(customer_orders['customer_id'].dtype, pd.CategoricalDtype):
+        customer_orders['customer_id'] = customer_orders['customer_id'].astype(object)
 
-    # attach customer name if available
+    # attach customer name if available: first non-null name in date order
     if name_col and name_col in df.columns:
-        names = (
-            df.groupby(customer_col)[name_col]
-            .apply(lambda s: s.dropna().astype(str).iloc[0] if not s.dropna().empty else None)
-            .reset_index()
-        )
-        # Normalize the name mapping to use 'customer_id' as the join key so
-        # we don't accidentally drop the primary id column when merging.
-        names = names.rename(columns={customer_col: 'customer_id', name_col: 'customer_name'})
-        customer_orders = customer_orders.merge(names, on='customer_id', how='left')
+        names = df.loc[df[name_col].notna()].groupby(customer_col, observed=True)[name_col].first().astype(str)
+        customer_orders['customer_name'] = customer_orders['customer_id'].map(names).astype(object)
     else:
         customer_orders['customer_name'] = None
 
-    # compute average gaps
-    order_gaps = []
-    for customer_id, group in df.groupby(customer_col):
-        dates = group[date_col].sort_values().tolist()
-        if len(dates) > 1:
-            gaps = [(dates[i + 1] - dates[i]).days for i in range(len(dates) - 1)]
-            avg_gap = float(sum(gaps)) / len(gaps)
-        else:
-            avg_gap = float('nan')
-        order_gaps.append({'customer_id': customer_id, 'avg_order_gap': avg_gap})
+    # compute average gaps: the frame is sorted by customer then date, so a
+    # grouped diff yields the whole-day gaps between consecutive orders
+    _report(progress, 'gaps')
+    grouped = df.groupby(customer_col, sort=False, observed=True)
+    gap_days = grouped[date_col].diff().dt.days
+    later = grouped.cumcount() > 0
+    gap_days = gap_days[later]
+    by_customer = df.loc[later, customer_col]
+    # an unparseable date inside a multi-order history leaves the average undefined
+    incomplete = gap_days.isna().groupby(by_customer, observed=True).any()
+    avg_gaps = gap_days.groupby(by_customer, observed=True).mean().mask(incomplete)
+    customer_orders['avg_order_gap'] = customer_orders['customer_id'].map(avg_gaps).astype(float)
+    return customer_orders
 
-    gaps_df = pd.DataFrame(order_gaps)
-    results = customer_orders.merge(gaps_df, left_on='customer_id', right_on='customer_id', how='left')
 
-    def _predict_next(row):
+def _report(progress, phase, rows=None):
+    """Forward a phase change to an optional progress callback."""
+    if progress is not None:
+        progress(phase, rows)
+
+
+def _estimate_frame_bytes(connection, table_name):
+    """Estimate the memory a full pandas load of the table would need, or None if unknown."""
+    try:
+        cursor = connection.cursor()
+        cursor.execute(
+            "SELECT DATA_LENGTH FROM information_schema.TABLES "
+            "WHERE TABLE_SCHEMA = DATABASE() AND TABLE_NAME = %s",
+            (table_name,)
+        )
+        row = cursor.fetchone()
+        cursor.close()
+    except Exception:
+        return None
+    if not row or row[0] is None:
+        return None
+    return int(row[0]) * FRAME_SIZE_FACTOR
+
+
+def _iter_chunks(connection, query, chunk_rows, params=None):
+    """Yield DataFrames of at most ``chunk_rows`` rows from an unbuffered cursor."""
+    cursor = connection.cursor()
+    try:
+        cursor.execute(query, params or ())
+        columns = [d[0] for d in cursor.description]
+        while True:
+            rows = cursor.fetchmany(chunk_rows)
+            if not rows:
+                break
+            yield pd.DataFrame.from_records(rows, columns=columns)
+    finally:
         try:
-            gap = row.get('avg_order_gap', None)
-            if gap is None or (isinstance(gap, float) and math.isnan(gap)):
-                return None
-            gap = float(gap)
-            if gap > 0:
-                last = row['last_order_date']
-                if pd.notna(last):
-                    return last + timedelta(days=round(gap))
+            cursor.close()
         except Exception:
-            pass
-        return None
+            # an abandoned unbuffered result must be drained before the connection is reused
+            if hasattr(connection, 'consume_results'):
+                connection.consume_results()
 
-    results['predicted_next_order_date'] = results.apply(_predict_next, axis=1)
 
-    # Calculate recency (days since last order)
-    results['recency'] = results['last_order_date'].apply(lambda x: (datetime.now().replace(tzinfo=None) - pd.Timestamp(x).replace(tzinfo=None)).days if pd.notna(x) else None)
-    
-    # Calculate new segmentation classification FIRST
-    results['customer_classification'] = results.apply(
-        lambda row: _classify_customer_segment(
-            row['total_orders'],
-            row['avg_order_gap'],
-            row['last_order_date'],
-            row['first_order_date']
-        ),
-        axis=1
-    )
-    
-    # Calculate churn_flag (1 if at risk or lost, 0 otherwise) AFTER segmentation
-    results['churn_flag'] = results.apply(
-        lambda row: 1 if row['customer_classification'] in ['At Risk', 'Lost'] else 0,
-        axis=1
+def _chunk_partial(chunk, date_col, customer_col, name_col=None):
+    """Aggregate one chunk of order rows into per-customer partial state.
+
+    Partial state holds, per customer: ``rows`` (including undated rows),
+    ``total_orders``, first and last order date, the sum and count of the
+    whole-day gaps seen so far, and the first non-null name.
+    """
+    chunk[date_col] = pd.to_datetime(chunk[date_col], errors='coerce')
+    chunk = chunk.loc[chunk[customer_col].notna()].sort_values([customer_col, date_col], kind='stable')
+
+    keys = chunk[customer_col]
+    grouped = chunk.groupby(keys, sort=False)[date_col]
+    partial = grouped.agg(['size', 'count', 'min', 'max'])
+    partial.columns = ['rows', 'total_orders', 'first_order_date', 'last_order_date']
+    gap_days = grouped.diff().dt.days
+    partial['gap_sum'] = gap_days.groupby(keys).sum()
+    partial['gap_count'] = gap_days.groupby(keys).count()
+    if name_col:
+        named = chunk.loc[chunk[name_col].notna()]
+        partial['customer_name'] = named.groupby(customer_col)[name_col].first().astype(str)
+    else:
+        partial['customer_name'] = None
+    partial.index.name = 'customer_id'
+    return partial
+
+
+def _fold_partials(partials):
+    """Fold partial states, given in stream order, into one partial state.
+
+    Each customer's rows must arrive in date order across the stream; the gap
+    between the last order of one partial and the first order of the next is
+    added to the running gap sum.
+    """
+    if len(partials) == 1:
+        return partials[0]
+
+    combined = pd.concat(partials, keys=range(len(partials)), names=['seq', 'customer_id']).reset_index()
+    grouped = combined.groupby('customer_id', sort=False)
+    bridge = (combined['first_order_date'] - grouped['last_order_date'].shift()).dt.days
+    combined['gap_sum'] = combined['gap_sum'] + bridge.fillna(0)
+    combined['gap_count'] = combined['gap_count'] + bridge.notna()
+
+    grouped = combined.groupby('customer_id', sort=False)
+    return grouped.agg(
+        rows=('rows', 'sum'),
+        total_orders=('total_orders', 'sum'),
+        first_order_date=('first_order_date', 'min'),
+        last_order_date=('last_order_date', 'max'),
+        gap_sum=('gap_sum', 'sum'),
+        gap_count=('gap_count', 'sum'),
+        customer_name=('customer_name', 'first'),
     )
 
-    # convert dates to ISO strings or None
-    def _dt_to_str(v):
-        if pd.isna(v):
-            return None
-        try:
-            return pd.Timestamp(v).isoformat()
-        except Exception:
-            return str(v)
 
-    results['first_order_date'] = results['first_order_date'].apply(_dt_to_str)
-    results['last_order_date'] = results['last_order_date'].apply(_dt_to_str)
-    results['predicted_next_order_date'] = results['predicted_next_order_date'].apply(_dt_to_str)
+def _partials_to_orders(state):
+    """Convert folded partial state to the per-customer order stats frame."""
+    state = state.sort_index()
+    complete = (state['gap_count'] > 0) & (state['rows'] == state['total_orders'])
+    avg_gaps = (state['gap_sum'].astype(float) / state['gap_count']).where(complete)
+    return pd.DataFrame({
+        'customer_id': state.index,
+        'total_orders': state['total_orders'].astype('int64').to_numpy(),
+        'first_order_date': state['first_order_date'].to_numpy(),
+        'last_order_date': state['last_order_date'].to_numpy(),
+        'customer_name': state['customer_name'].to_numpy(),
+        'avg_order_gap': avg_gaps.to_numpy(),
+    })
 
-    # normalize avg_order_gap: round or None
-    def _safe_round(x):
-        try:
-            if x is None or (isinstance(x, float) and math.isnan(x)):
-                return None
-            return round(float(x), 2)
-        except Exception:
+
+def _stream_query(table_name, date_col, customer_col, name_col=None, where=None, types=None):
+    """Build the query that streams the detected columns ordered by customer and date.
+
+    ``types`` is as returned by ``_column_types``; binary columns are read as hex text.
+    """
+    columns = [customer_col, date_col] + ([name_col] if name_col else [])
+    cust = _quote_ident(customer_col)
+    date = _quote_ident(date_col)
+    query = f"SELECT {', '.join(_select_column(c, types) for c in columns)} FROM {_quote_ident(table_name)}"
+    if where:
+        query += f" WHERE {where}"
+    return query + f" ORDER BY {cust}, {date} IS NULL, {date}"
+
+
+def _fold_stream(connection, query, date_col, customer_col, name_col=None,
+                 chunk_rows=STREAM_CHUNK_ROWS, params=None, progress=None):
+    """Fold the rows of a streaming query into partial state, or None if it returns no rows."""
+    state = None
+    pending = []
+    rows = 0
+    for chunk in _iter_chunks(connection, query, chunk_rows, params):
+        rows += len(chunk)
+        _report(progress, 'loading', rows)
+        pending.append(_chunk_partial(chunk, date_col, customer_col, name_col))
+        if len(pending) >= STREAM_FOLD_EVERY:
+            state = _fold_partials(([state] if state is not None else []) + pending)
+            pending = []
+    if pending:
+        state = _fold_partials(([state] if state is not None else []) + pending)
+    return state
+
+
+def _aggregate_stream(connection, table_name, date_col, customer_col, name_col=None,
+                      chunk_rows=STREAM_CHUNK_ROWS, progress=None, where=None, params=None):
+    """Stream the table in chunks and fold them into per-customer accumulators.
+
+    Rows are ordered by customer and date on the server, so memory grows
+    with the number of customers rather than the number of rows. The date
+    column must be a native DATE/DATETIME so that the server sorts it
+    chronologically. ``where`` and ``params`` restrict the streamed rows.
+    """
+    query = _stream_query(table_name, date_col, customer_col, name_col, where, _column_types(connection, table_name))
+    state = _fold_stream(connection, query, date_col, customer_col, name_col, chunk_rows,
+                         params=params, progress=progress)
+    if state is None or state.empty:
+        return None
+    return _partials_to_orders(state)
+
+
+def perform_analytics(connection, table_name, engine='auto', memory_limit=None, progress=None, snapshot=None,
+                      as_of=None):
+    """Perform customer-wise analytics and return JSON-serializable records.
+
+    ``engine`` selects how the per-customer aggregation runs:
+    ``'pushdown'`` runs it inside MySQL (8.0+ / MariaDB 10.2+), ``'stream'``
+    folds the table in chunks with memory bounded by the customer count,
+    ``'pandas'`` loads the whole table at once, and ``'auto'`` picks
+    pushdown when the server and date column allow it, otherwise streaming
+    when the date column is native and the table is estimated to exceed
+    ``memory_limit`` bytes (default ``STREAM_MEMORY_LIMIT``), otherwise
+    pandas. Pushdown and stream reject text date columns, which the server
+    can only sort lexically.
+
+    ``progress``, if given, is called as ``progress(phase, rows)`` as the run
+    moves through 'detecting', 'loading', 'aggregating' and 'classifying';
+    ``rows`` is the number of source rows read so far, or None when unknown.
+    Exceptions it raises abort the run, which is how callers cancel.
+
+    ``snapshot``, if given, is a local copy of the projected columns with
+    ``load(columns)`` and ``save(frame)`` (see ``SnapshotCache.bind``). The
+    pandas engine reads it instead of the table when it is present and
+    writes it after a fetch otherwise; ``'auto'`` then prefers pandas over
+    pushdown unless the table is too large to load.
+
+    ``as_of``, a naive datetime (see ``parse_as_of``), computes the results
+    as they stood at that time: only orders dated at or before it are read
+    and it replaces the current time in recency and segmentation. Native
+    date columns are filtered in the query itself; text dates are filtered
+    after parsing, which needs the pandas engine.
+    """
+    results = _aggregate_table(connection, table_name, engine, memory_limit, progress, snapshot, as_of)
+    if results is None:
+        return []
+    _report(progress, 'classifying')
+    return _finalize_results(results, progress, now=as_of)
+
+
+def parse_as_of(value):
+    """Parse an ISO-8601 date or datetime into the naive datetime ``as_of`` arguments take.
+
+    None or '' gives None. A date alone means midnight at its start; a
+    timezone offset is dropped, keeping the wall-clock time as ``_naive``
+    does. Raises ValueError for anything else.
+    """
+    if value is None or value == '':
+        return None
+    if not isinstance(value, str):
+        raise ValueError(f"Invalid as_of {value!r}; expected an ISO-8601 date or datetime")
+    try:
+        stamp = pd.Timestamp(value)
+    except (TypeError, ValueError):
+        stamp = pd.NaT
+    if stamp is pd.NaT:
+        raise ValueError(f"Invalid as_of '{value}'; expected an ISO-8601 date or datetime")
+    if stamp.tz is not None:
+        stamp = stamp.tz_localize(None)
+    return stamp.to_pydatetime()
+
+
+def _as_of_filter(date_col, native_dates, as_of):
+    """Return ``(where, params)`` restricting a query to orders dated at or before ``as_of``.
+
+    Only native date columns compare chronologically in SQL; for text
+    dates (or no ``as_of``) this is ``(None, None)`` and ``_until`` filters
+    the parsed frame instead.
+    """
+    if as_of is None or not native_dates:
+        return None, None
+    return f"{_quote_ident(date_col)} <= %s", (as_of,)
+
+
+def _until(df, date_col, as_of):
+    """Keep the rows of a parsed frame dated at or before ``as_of``; undated rows are dropped, as SQL's ``<=`` drops NULLs."""
+    return df.loc[(_naive(df[date_col]) <= pd.Timestamp(as_of)).to_numpy()]
+
+
+def analysis_plan(analysis_type):
+    """Return ``(analysis_type, columns)`` for a requested analysis type.
+
+    Aliases resolve to the canonical name; no type gives ``(None, None)``,
+    meaning every column. Raises ValueError for an unknown type.
+    """
+    if not analysis_type:
+        return None, None
+    analysis_type = ANALYSIS_ALIASES.get(analysis_type, analysis_type)
+    if analysis_type not in ANALYSIS_COLUMNS:
+        raise ValueError(f"Unknown analysis type '{analysis_type}'")
+    return analysis_type, ANALYSIS_COLUMNS[analysis_type]
+
+
+def project_records(records, columns):
+    """Keep only ``columns`` of each record; ``None`` keeps the records as they are."""
+    if columns is None:
+        return records
+    return [{c: record.get(c) for c in columns} for record in records]
+
+
+def perform_recency_analytics(connection, table_name, progress=None, as_of=None):
+    """Days since each customer's last order, from a single GROUP BY MAX() query.
+
+    Order counts, gaps, names and segments are not computed; records have
+    the 'recency' analysis columns. Text dates, which SQL cannot compare
+    chronologically, are loaded and reduced in pandas instead. ``as_of`` is
+    as for ``perform_analytics``.
+    """
+    _report(progress, 'detecting')
+    detected = _detect_sample_columns(connection, table_name)
+    if detected is None:
+        return []
+    date_col, customer_col, _, native_dates = detected
+    cust = _quote_ident(customer_col)
+    if native_dates:
+        _report(progress, 'aggregating')
+        where, params = _as_of_filter(date_col, native_dates, as_of)
+        condition = f"{cust} IS NOT NULL" + (f" AND {where}" if where else "")
+        key = _column_expr(customer_col, _column_types(connection, table_name))
+        results = pd.read_sql(
+            f"SELECT {key} AS customer_id, MAX({_quote_ident(date_col)}) AS last_order_date "
+            f"FROM {_quote_ident(table_name)} WHERE {condition} GROUP BY {cust}",
+            connection, params=params
+        )
+        results['last_order_date'] = pd.to_datetime(results['last_order_date'], errors='coerce')
+    else:
+        _report(progress, 'loading')
+        df = _load_projected(connection, table_name, date_col, customer_col, progress=progress)
+        if as_of is not None:
+            df = _until(df, date_col, as_of)
+        _report(progress, 'aggregating', len(df))
+        results = df.groupby(customer_col, observed=True)[date_col].max().reset_index()
+        results.columns = ['customer_id', 'last_order_date']
+        if isinstance(results['customer_id'].dtype, pd.CategoricalDtype):
+            results['customer_id'] = results['customer_id'].astype(object)
+    if results.empty:
+        return []
+    if results['last_order_date'].isna().all():
+        raise ValueError(f"Detected date column '{date_col}' could not be parsed as dates.")
+    results = results.sort_values('customer_id', kind='stable', ignore_index=True)
+    _report(progress, 'classifying')
+    return _finalize_results(results, progress, columns=ANALYSIS_COLUMNS['recency'], now=as_of)
+
+
+def _aggregate_table(connection, table_name, engine='auto', memory_limit=None, progress=None, snapshot=None,
+                     as_of=None):
+    """Detect columns and build the per-customer stats frame with the chosen engine.
+
+    Returns None for an empty table. Arguments are as for ``perform_analytics``.
+    """
+    if engine not in ENGINES:
+        raise ValueError(f"Unknown analytics engine '{engine}'")
+    if engine == 'pushdown' and not _supports_pushdown(connection):
+        raise ValueError("Pushdown engine requires MySQL 8.0+ or MariaDB 10.2+ (window functions).")
+
+    # detect columns first so only the ones analytics needs are fetched
+    _report(progress, 'detecting')
+    detected = _detect_sample_columns(connection, table_name)
+    if detected is None:
+        return None
+    date_col, customer_col, name_col, native_dates = detected
+    if engine == 'pushdown' and not native_dates:
+        raise ValueError(f"Pushdown engine requires a native DATE/DATETIME column; '{date_col}' is not one.")
+    # the server sorts text dates lexically, which breaks gaps across chunk boundaries
+    if engine == 'stream' and not native_dates:
+        raise ValueError(f"Stream engine requires a native DATE/DATETIME column; '{date_col}' is not one.")
+    where, params = _as_of_filter(date_col, native_dates, as_of)
+
+    columns = list(dict.fromkeys(c for c in (customer_col, date_col, name_col) if c))
+    df = None
+    if snapshot is not None and engine in ('auto', 'pandas'):
+        _report(progress, 'snapshot')
+        df = snapshot.load(columns)
+        if df is not None:
+            engine = 'pandas'
+
+    if engine == 'auto':
+        limit = STREAM_MEMORY_LIMIT if memory_limit is None else memory_limit
+        estimate = _estimate_frame_bytes(connection, table_name)
+        if native_dates and _supports_pushdown(connection) and snapshot is None:
+            engine = 'pushdown'
+        elif native_dates and estimate is not None and estimate > limit:
+            engine = 'stream'
+        else:
+            engine = 'pandas'
+
+    if engine == 'pushdown':
+        _report(progress, 'aggregating')
+        results = _aggregate_pushdown(connection, table_name, date_col, customer_col, name_col, where, params)
+    elif engine == 'stream':
+        results = _aggregate_stream(connection, table_name, date_col, customer_col, name_col, progress=progress,
+                                    where=where, params=params)
+    else:
+        if df is None:
+            _report(progress, 'loading')
+            df = _load_projected(connection, table_name, date_col, customer_col, name_col, where=where,
+                                 progress=progress, params=params)
+            # a filtered fetch is not a copy of the table
+            if snapshot is not None and where is None:
+                _report(progress, 'snapshot')
+                snapshot.save(df)
+        if as_of is not None:
+            df = _until(df, date_col, as_of)
+
+        if df.empty:
             return None
 
-    results['avg_order_gap'] = results['avg_order_gap'].apply(_safe_round)
+        _report(progress, 'aggregating', len(df))
+        results = _aggregate_frame(df, date_col, customer_col, name_col, progress=progress)
+
+    if results is None or results.empty:
+        return None
+    if results['last_order_date'].isna().all():
+        raise ValueError(f"Detected date column '{date_col}' could not be parsed as dates.")
+    return results
+
+
+def perform_customer_lookup(connection, table_name, customer_id=None, name=None):
+    """Compute analytics for the customers matching an id or a name, reading only their orders.
+
+    Records are the same as ``perform_analytics`` returns for those
+    customers. A name matches customers with any order under that name.
+    """
+    detected = _detect_sample_columns(connection, table_name)
+    if detected is None:
+        return []
+    date_col, customer_col, name_col, _ = detected
+    cust = _quote_ident(customer_col)
+    if customer_id is not None:
+        where = f"{cust} = {_key_placeholder(customer_col, _column_types(connection, table_name))}"
+        params = (customer_id,)
+    elif name is not None and name_col:
+        where = (f"{cust} IN (SELECT {cust} FROM {_quote_ident(table_name)} "
+                 f"WHERE {_quote_ident(name_col)} = %s)")
+        params = (name,)
+    else:
+        return []
+    df = _load_projected(connection, table_name, date_col, customer_col, name_col, where=where, params=params)
+    if df.empty:
+        return []
+    results = _aggregate_frame(df, date_col, customer_col, name_col, check_dates=False)
+    if results.empty:
+        return []
+    return _finalize_results(results)
+
+
+def _dt_to_str(v):
+    """One date as an ISO string, or None."""
+    if pd.isna(v):
+        return None
+    try:
+        return pd.Timestamp(v).isoformat()
+    except Exception:
+        return str(v)
+
+
+def _iso_strings(values):
+    """Format a date column as ``Timestamp.isoformat`` would, with None for NaT, a whole array at a time.
+
+    Fractional seconds are written only where present: microseconds, or
+    nanoseconds when those are non-zero. Timezone-aware and unparsed
+    columns go through ``_dt_to_str`` one value at a time.
+    """
+    if not pd.api.types.is_datetime64_any_dtype(values) or getattr(values.dtype, 'tz', None) is not None:
+        return [_dt_to_str(v) for v in values]
+    stamps = values.to_numpy()
+    missing = np.isnat(stamps)
+    whole = stamps.astype('datetime64[s]')
+    text = np.datetime_as_string(whole, unit='s').astype(object)
+    fractional = (stamps != whole) & ~missing
+    if fractional.any():
+        part = stamps[fractional]
+        micro = part.astype('datetime64[us]')
+        text[fractional] = np.where(part == micro, np.datetime_as_string(micro, unit='us'),
+                                    np.datetime_as_string(part, unit='ns'))
+    text[missing] = None
+    return text.tolist()
+
+
+def _round_gaps(values):
+    """Round to 2 places exactly as ``round()`` does; None where missing or not numeric."""
+    gaps = pd.to_numeric(values, errors='coerce').to_numpy(dtype=float)
+    rounded = np.round(gaps, 2)
+    # np.round scales by 100 first, which can tip values lying next to a
+    # half-way point; those few are rounded again by Python
+    scaled = gaps * 100
+    close = np.abs(scaled - np.floor(scaled) - 0.5) < 1e-6
+    for i in np.flatnonzero(close):
+        rounded[i] = round(float(gaps[i]), 2)
+    return _native_values(rounded)
+
+
+def _native_values(values):
+    """A column as a list of native Python values with None for missing ones."""
+    array = np.asarray(values)
+    if array.dtype.kind == 'f':
+        out = array.astype(object)
+        out[np.isnan(array)] = None
+        return out.tolist()
+    if array.dtype.kind in 'iub':
+        return array.tolist()
+    out = np.array(array, dtype=object)
+    out[pd.isna(out)] = None
+    return out.tolist()
+
+
+def _to_records(results):
+    """Convert a finalized frame to JSON-safe records without per-value Python calls.
+
+    Dates become ISO strings and the average gap is rounded to 2 places.
+    Missing values become None, and every value is a native Python type.
+    """
+    columns = list(results.columns)
+    values = []
+    for c in columns:
+        if c in ('first_order_date', 'last_order_date', 'predicted_next_order_date'):
+            values.append(_iso_strings(results[c]))
+        elif c == 'avg_order_gap':
+            values.append(_round_gaps(results[c]))
+        else:
+            values.append(_native_values(results[c].to_numpy()))
+    return [dict(zip(columns, row)) for row in zip(*values)]
+
+
+def _finalize_results(results, progress=None, columns=None, now=None):
+    """Add predictions, recency and segments, and convert to JSON-safe records.
+
+    ``progress`` is told when the conversion to records ('formatting') starts.
+    ``columns``, if given, limits the records to those keys, and derived
+    columns not among them are not computed. ``now`` is the reference time
+    for recency and segments (default: the current time).
+    """
+    def wanted(*names):
+        return columns is None or any(name in columns for name in names)
+
+    # predicted next order: last order plus the average gap rounded to whole days
+    if wanted('predicted_next_order_date'):
+        gaps = results['avg_order_gap'].astype(float)
+        predicted = results['last_order_date'] + pd.to_timedelta(gaps.round(), unit='D')
+        results['predicted_next_order_date'] = predicted.where(gaps > 0)
+
+    # a single reference time for the whole run
+    if now is None:
+        now = datetime.now()
+
+    # Calculate recency (days since last order)
+    if wanted('recency'):
+        results['recency'] = (pd.Timestamp(now) - _naive(results['last_order_date'])).dt.days
+
+    if wanted('customer_classification', 'churn_flag'):
+        # Calculate new segmentation classification FIRST
+        results['customer_classification'] = _classify_segments(results, now)
 
-    records = results.to_dict('records')
+        # Calculate churn_flag (1 if at risk or lost, 0 otherwise) AFTER segmentation
+        results['churn_flag'] = results['customer_classification'].isin(CHURN_SEGMENTS).astype(int)
 
-    # final cleanup
-    for record in records:
-        for k, v in list(record.items()):
-            if isinstance(v, float) and math.isnan(v):
-                record[k] = None
+    _report(progress, 'formatting')
+    if columns is not None:
+        results = results[list(columns)]
 
-    return records
+    return _to_records(results)
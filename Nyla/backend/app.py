@@ -1,7 +1,10 @@
 import http.server
+import itertools
 import socketserver
 import json
 import os
+import threading
+import time
 import sys
 from urllib.parse import urlparse, parse_qs
 from pathlib import Path
@@ -9,32 +12,310 @@ from pathlib import Path
 # Add the backend directory to the path
 sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
 
-from db_connector import connect_to_db, get_tables
-from analytics import perform_analytics
+# only modules that import quickly are loaded here; the analytics modules
+# (pandas, numpy, mysql.connector) are imported by load_backend()
+from cache import ResultCache
+from jobs import JobManager
+from metrics import Metrics, PhaseTimer
+from encoding import (
+    FORMAT_CONTENT_TYPES, RESPONSE_FORMATS, COMPRESS_MIN_BYTES, StreamCompressor, compress, dumps,
+    format_unavailable, is_compressible, iter_encoded, negotiate_encoding,
+)
 
 PORT = 8000
+# serve each request on its own thread so slow analytics don't block other users
+THREADED = True
+# bind the port first and import the analytics modules in a warmup thread;
+# /readyz answers 503 until they are loaded and the warmup has finished
+LAZY_STARTUP = True
 FRONTEND_DIR = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'frontend')
 
-# Global variable to store the current connection
-current_connection = None
+# Global connection pool for the current schema; swapped as a unit under session_lock
+current_pool = None
 current_schema = None
+current_server = None
+session_lock = threading.Lock()
+
+# Analytics results keyed by (server, schema, table)
+result_cache = ResultCache()
+# Local snapshots of projected source columns, used when a request sends "snapshot": true
+# (created by load_backend)
+snapshot_cache = None
+# Background analytics jobs submitted through /api/jobs
+job_manager = JobManager()
+# Latest results per (server, schema, table), paged through /api/results (created by load_backend)
+result_store = None
+# Request latencies and analytics phase timings, exported at /api/metrics
+metrics = Metrics()
+# request header asking for the phase breakdown of an analytics run
+DEBUG_HEADER = 'X-Debug-Phases'
+# paths with their own metrics endpoint label; other API paths are labelled 'other'
+METRIC_ENDPOINTS = (
+    '/healthz', '/readyz', '/api/connect', '/api/tables', '/api/analytics', '/api/results', '/api/customer',
+    '/api/cache', '/api/cache/invalidate', '/api/metrics', '/api/jobs', '/api/jobs/{id}',
+    '/api/jobs/{id}/results', '/api/summary/refresh', '/api/batch', '/api/history',
+)
+# Compressed static files keyed by (path, mtime, size, encoding)
+compressed_files = {}
+COMPRESSED_FILES_MAX = 64
+
+# Startup state reported by /readyz: 'loading', 'connecting', 'preloading', 'ready' or 'failed'
+startup_phase = 'loading'
+startup_errors = []
+ready = threading.Event()
+backend_loaded = False
+_backend_lock = threading.Lock()
+
+
+def load_backend():
+    """Import the analytics modules and create the globals that need them; later calls return at once.
+
+    Request handlers call this before any API work, so requests that
+    arrive while the warmup thread is still importing wait for it.
+    """
+    global backend_loaded, result_store, snapshot_cache
+    global PoolError, create_pool, get_tables, get_table_fingerprint
+    global LIGHT_ANALYSES, analysis_plan, perform_analytics, perform_customer_lookup
+    global perform_recency_analytics, project_records, is_internal_table, run_batch, parse_as_of
+    global MAX_HISTORY_CUTOFFS, perform_segment_history
+    global perform_incremental_analytics, perform_parallel_analytics, parse_engine, parse_workers
+    global lookup_summary, read_meta, read_summary, refresh_summary, summary_table_name
+    if backend_loaded:
+        return
+    with _backend_lock:
+        if backend_loaded:
+            return
+        from db_connector import PoolError, create_pool, get_tables, get_table_fingerprint
+        from analytics import (
+            LIGHT_ANALYSES, analysis_plan, perform_analytics, perform_customer_lookup,
+            perform_recency_analytics, project_records, parse_as_of,
+        )
+        from batch import is_internal_table, run_batch
+        from history import MAX_HISTORY_CUTOFFS, perform_segment_history
+        from incremental import perform_incremental_analytics
+        from parallel import parse_engine, parse_workers, perform_parallel_analytics
+        from materialize import lookup_summary, read_meta, read_summary, refresh_summary, summary_table_name
+        from results_store import ResultStore
+        from snapshots import SnapshotCache
+        result_store = ResultStore()
+        snapshot_cache = SnapshotCache()
+        backend_loaded = True
+
+
+def warmup():
+    """Load the backend, optionally connect and precompute hot tables, then mark the server ready.
+
+    When NYLA_DB_HOST, NYLA_DB_USER and NYLA_DB_SCHEMA (plus NYLA_DB_PORT
+    and NYLA_DB_PASSWORD) are set, the connection pool is created, which
+    opens all of its connections, and becomes the current session. The
+    tables listed in NYLA_HOT_TABLES (comma-separated) are then analyzed
+    into the result cache. Connection and table failures are logged and
+    reported by /readyz; they do not keep the server from becoming ready.
+    """
+    global startup_phase, current_pool, current_schema, current_server
+    started = time.perf_counter()
+    try:
+        load_backend()
+    except Exception as e:
+        startup_phase = 'failed'
+        startup_errors.append(f"Could not load the analytics modules: {e}")
+        print(f"✗ {startup_errors[-1]}")
+        return
+    print(f"Analytics modules loaded in {time.perf_counter() - started:.2f}s")
+
+    host = os.environ.get('NYLA_DB_HOST')
+    user = os.environ.get('NYLA_DB_USER')
+    schema = os.environ.get('NYLA_DB_SCHEMA')
+    if host and user and schema:
+        startup_phase = 'connecting'
+        port = int(os.environ.get('NYLA_DB_PORT', 3306))
+        server = f"{host}:{port}"
+        pool = create_pool(host, port, user, os.environ.get('NYLA_DB_PASSWORD', ''), schema)
+        if pool is None:
+            startup_errors.append(f"Could not connect to {schema} at {server}")
+        else:
+            with session_lock:
+                current_pool, current_schema, current_server = pool, schema, server
+            tables = [t.strip() for t in os.environ.get('NYLA_HOT_TABLES', '').split(',') if t.strip()]
+            if tables:
+                startup_phase = 'preloading'
+                results = run_batch(pool, tables, lambda table: run_analytics(pool, schema, server, {'table': table}))
+                for r in results:
+                    if r['status'] != 'success':
+                        startup_errors.append(f"Could not preload {r['table']}: {r.get('error')}")
+                print(f"Preloaded {sum(r['status'] == 'success' for r in results)} of {len(tables)} hot tables")
+
+    startup_phase = 'ready'
+    ready.set()
+    print(f"Ready after {time.perf_counter() - started:.2f}s")
+
+
+def run_analytics(pool, schema, server, data, progress=None, timer=None):
+    """Compute (or fetch from cache) analytics for a request body; return (records, cached)
+
+    An ``analysis_type`` limits the records to the columns that analysis
+    displays. They are projected from cached full results when there are
+    any; otherwise light analyses run their own cheaper plan, and the rest
+    compute (and cache) full results.
+    A table with a materialized summary is answered from it as last
+    refreshed; only ``materialize`` refreshes (or creates) it first.
+    An ``as_of`` date computes the results as they stood then; summaries,
+    incremental state and the parallel engine only hold current results,
+    so those runs use ``perform_analytics`` and are cached under their own
+    key but not kept as the table's latest results.
+    Phase timings go to ``timer`` (a PhaseTimer) if given, and to ``metrics``.
+    """
+    table_name = data['table']
+    # checked here, not only by perform_analytics, so a cached table rejects a bad engine too
+    engine = parse_engine(data.get('engine'))
+    analysis, columns = analysis_plan(data.get('analysis_type'))
+    as_of = parse_as_of(data.get('as_of'))
+    incremental = data.get('incremental') and as_of is None
+    key = (server, schema, table_name)
+    if as_of is not None:
+        key = key + ('as_of', as_of.isoformat())
+    timer = timer or PhaseTimer()
+    report = timer.wrap(progress)
+    try:
+        report('checkout')
+        with pool.connection() as connection:
+            report('fingerprint')
+            fingerprint = get_table_fingerprint(connection, table_name)
+            # a refresh was asked for, so results read from the summary earlier won't do
+            materialize = as_of is None and data.get('materialize')
+            # a light analysis may go on to its own key, so only that lookup's outcome is counted
+            probe = analysis in LIGHT_ANALYSES
+            results = None if materialize else result_cache.get(key, fingerprint, count_miss=not probe)
+            cached = results is not None
+            light = False
+            if not cached:
+                # only "materialize": true writes to the summary; otherwise an existing one is just read
+                summarized = materialize or (as_of is None and read_meta(connection, table_name) is not None)
+                # a summary is already cheap to read, and incremental state needs full runs
+                light = analysis in LIGHT_ANALYSES and not summarized and not incremental
+                if probe and not light and not materialize:
+                    result_cache.record_miss()
+            if light:
+                key = key + (analysis,)
+                results = result_cache.get(key, fingerprint)
+                cached = results is not None
+                if not cached:
+                    results = perform_recency_analytics(connection, table_name, progress=report, as_of=as_of)
+            elif not cached:
+                if materialize:
+                    results, _ = refresh_summary(
+                        connection, table_name, rebuild=bool(data.get('rebuild')),
+                        engine=engine if engine != 'parallel' else 'auto', progress=report
+                    )
+                elif summarized:
+                    # None only if the table was emptied and its summary dropped since read_meta
+                    results = read_summary(connection, table_name, progress=report) or []
+                elif incremental:
+                    results = perform_incremental_analytics(
+                        connection, table_name, key, rebuild=bool(data.get('rebuild')), progress=report
+                    )
+                elif engine == 'parallel' and as_of is None:
+                    results = perform_parallel_analytics(
+                        connection, table_name, workers=data.get('workers'),
+                        connect_params=pool.connect_params, progress=report
+                    )
+                else:
+                    snapshot = snapshot_cache.bind(key[:3], fingerprint) if data.get('snapshot') else None
+                    results = perform_analytics(connection, table_name,
+                                                engine=engine if engine != 'parallel' else 'auto',
+                                                progress=report, snapshot=snapshot, as_of=as_of)
+        report('storing')
+        if not cached:
+            result_cache.put(key, fingerprint, results)
+        if as_of is None:
+            result_store.put(key[:3], results, partial=light)
+    finally:
+        timer.stop()
+    metrics.observe_run(table_name, timer, cached)
+    return project_records(results, columns), cached
+
+
+def metrics_endpoint(path):
+    """Collapse a request path to one of a fixed set of endpoint labels"""
+    parts = path.rstrip('/').split('/')
+    if len(parts) >= 4 and parts[1:3] == ['api', 'jobs']:
+        parts[3] = '{id}'
+    endpoint = '/'.join(parts)
+    if endpoint in METRIC_ENDPOINTS:
+        return endpoint
+    return 'other' if path.startswith('/api/') else 'static'
 
 
 class DataAnalyticsHandler(http.server.SimpleHTTPRequestHandler):
+    # HTTP/1.1 allows chunked streaming of large results and keep-alive;
+    # every response therefore carries Content-Length or chunked encoding
+    protocol_version = 'HTTP/1.1'
+
     def __init__(self, *args, **kwargs):
         super().__init__(*args, directory=FRONTEND_DIR, **kwargs)
 
+    def handle_one_request(self):
+        """Handle one request and record its latency by endpoint and table"""
+        self.request_started = time.perf_counter()
+        self.response_status = None
+        self.metrics_table = ''
+        super().handle_one_request()
+        if self.response_status is None or not getattr(self, 'command', None):
+            return
+        elapsed = time.perf_counter() - self.request_started
+        endpoint = metrics_endpoint(urlparse(self.path).path)
+        # a table name from a failed request may not exist, so only successes carry one
+        table = self.metrics_table if self.response_status < 400 else ''
+        metrics.observe('http_request_duration_seconds',
+                        {'method': self.command, 'endpoint': endpoint, 'table': table}, elapsed)
+        metrics.inc('http_requests_total',
+                    {'method': self.command, 'endpoint': endpoint, 'status': str(self.response_status)})
+
+    def send_response(self, code, message=None):
+        self.response_status = code
+        super().send_response(code, message)
+
     def do_GET(self):
         """Handle GET requests"""
         parsed_path = urlparse(self.path)
         path = parsed_path.path
         
         print(f"GET {self.path}")
-        
+
+        # liveness answers as soon as the port is bound; readiness once warmup has finished
+        if path == '/healthz':
+            self.send_json_response({'status': 'ok'})
+            return
+        if path == '/readyz':
+            self.send_json_response({
+                'status': 'ready' if ready.is_set() else startup_phase,
+                'errors': startup_errors,
+            }, 200 if ready.is_set() else 503)
+            return
+        if path.startswith('/api/') and path != '/api/metrics' and not self.require_backend():
+            return
+
         # API endpoints
         if path == '/api/tables':
             self.handle_get_tables()
             return
+        if path == '/api/cache':
+            self.send_json_response({
+                'status': 'success', 'cache': result_cache.stats(), 'snapshots': snapshot_cache.stats()
+            })
+            return
+        if path == '/api/metrics':
+            self.send_text_response(metrics.render(), 'text/plain; version=0.0.4; charset=utf-8')
+            return
+        if path.startswith('/api/jobs/'):
+            self.handle_get_job(path, parse_qs(parsed_path.query))
+            return
+        if path == '/api/results':
+            self.handle_query_results(parse_qs(parsed_path.query))
+            return
+        if path == '/api/customer':
+            self.handle_get_customer(parse_qs(parsed_path.query))
+            return
         
         # Strip query parameters
         path = path.split('?')[0]
@@ -75,8 +356,8 @@ class DataAnalyticsHandler(http.server.SimpleHTTPRequestHandler):
     def serve_file_from_path(self, file_path):
         """Serve a file from a full path"""
         try:
-            with open(file_path, 'rb') as f:
-                content = f.read()
+            stat = os.stat(file_path)
+            encoding = None
             
             # Determine content type
             content_type = 'text/plain'
@@ -97,9 +378,39 @@ class DataAnalyticsHandler(http.server.SimpleHTTPRequestHandler):
             elif file_path.endswith('.svg'):
                 content_type = 'image/svg+xml'
             
+            if is_compressible(content_type) and stat.st_size >= COMPRESS_MIN_BYTES:
+                encoding = negotiate_encoding(self.headers.get('Accept-Encoding'))
+
+            # the ETag changes with the file and differs per encoded representation
+            etag = f'"{stat.st_mtime_ns:x}-{stat.st_size:x}' + (f'-{encoding}"' if encoding else '"')
+            if etag in [t.strip() for t in self.headers.get('If-None-Match', '').split(',')]:
+                self.send_response(304)
+                self.send_header('ETag', etag)
+                self.send_header('Vary', 'Accept-Encoding')
+                self.send_header('Access-Control-Allow-Origin', '*')
+                self.end_headers()
+                return
+
+            if encoding:
+                cache_key = (file_path, stat.st_mtime_ns, stat.st_size, encoding)
+                content = compressed_files.get(cache_key)
+                if content is None:
+                    with open(file_path, 'rb') as f:
+                        content = compress(f.read(), encoding)
+                    if len(compressed_files) >= COMPRESSED_FILES_MAX:
+                        compressed_files.clear()
+                    compressed_files[cache_key] = content
+            else:
+                with open(file_path, 'rb') as f:
+                    content = f.read()
+
             self.send_response(200)
             self.send_header('Content-type', content_type)
             self.send_header('Content-Length', len(content))
+            self.send_header('ETag', etag)
+            self.send_header('Vary', 'Accept-Encoding')
+            if encoding:
+                self.send_header('Content-Encoding', encoding)
             self.send_header('Access-Control-Allow-Origin', '*')
             self.end_headers()
             self.wfile.write(content)
@@ -121,17 +432,48 @@ class DataAnalyticsHandler(http.server.SimpleHTTPRequestHandler):
         except json.JSONDecodeError:
             self.send_error_response(400, "Invalid JSON")
             return
+        if not self.require_backend():
+            return
 
         if parsed_path.path == '/api/connect':
             self.handle_connect(data)
         elif parsed_path.path == '/api/analytics':
             self.handle_analytics(data)
+        elif parsed_path.path == '/api/cache/invalidate':
+            self.handle_cache_invalidate(data)
+        elif parsed_path.path == '/api/jobs':
+            self.handle_submit_job(data)
+        elif parsed_path.path == '/api/summary/refresh':
+            self.handle_refresh_summary(data)
+        elif parsed_path.path == '/api/batch':
+            self.handle_batch(data)
+        elif parsed_path.path == '/api/history':
+            self.handle_segment_history(data)
         else:
             self.send_error_response(404, "Endpoint not found")
 
+    def do_DELETE(self):
+        """Handle DELETE requests"""
+        parsed_path = urlparse(self.path)
+        print(f"DELETE {self.path}")
+
+        if parsed_path.path.startswith('/api/jobs/'):
+            self.handle_cancel_job(parsed_path.path)
+        else:
+            self.send_error_response(404, "Endpoint not found")
+
+    def require_backend(self):
+        """Load the analytics modules if needed; send a 503 and return False if they cannot be loaded"""
+        try:
+            load_backend()
+        except ImportError as e:
+            self.send_error_response(503, f"Analytics backend unavailable: {str(e)}")
+            return False
+        return True
+
     def handle_connect(self, data):
         """Handle database connection"""
-        global current_connection, current_schema
+        global current_pool, current_schema, current_server
         
         try:
             host = data.get('host', '').strip()
@@ -150,11 +492,16 @@ class DataAnalyticsHandler(http.server.SimpleHTTPRequestHandler):
             print(f"Username: {username}")
             print(f"Schema: {schema}")
 
-            connection = connect_to_db(host, port, username, password, schema)
+            pool = create_pool(host, port, username, password, schema)
             
-            if connection:
-                current_connection = connection
-                current_schema = schema
+            if pool:
+                with session_lock:
+                    previous_pool = current_pool
+                    current_pool = pool
+                    current_schema = schema
+                    current_server = f"{host}:{port}"
+                if previous_pool is not None:
+                    previous_pool.close()
                 msg = f'Successfully connected to {schema} database at {host}:{port}'
                 print(f"✓ {msg}\n")
                 self.send_json_response({'status': 'success', 'message': msg})
@@ -169,58 +516,458 @@ class DataAnalyticsHandler(http.server.SimpleHTTPRequestHandler):
             print(f"✗ {error_msg}\n")
             self.send_error_response(500, error_msg)
 
+    def get_session(self):
+        """Return the (pool, schema, server) triple of the current connection"""
+        with session_lock:
+            return current_pool, current_schema, current_server
+
     def handle_get_tables(self):
         """Handle table retrieval"""
-        global current_connection
+        pool, _, _ = self.get_session()
         
-        if not current_connection:
+        if not pool:
             self.send_error_response(400, "Not connected to database")
             return
 
         try:
-            tables = get_tables(current_connection)
+            with pool.connection() as connection:
+                tables = get_tables(connection)
             self.send_json_response({'status': 'success', 'tables': tables})
         except Exception as e:
             self.send_error_response(500, f"Error retrieving tables: {str(e)}")
 
     def handle_analytics(self, data):
         """Handle analytics request"""
-        global current_connection
+        pool, schema, server = self.get_session()
         
-        if not current_connection:
+        if not pool:
             self.send_error_response(400, "Not connected to database")
             return
 
+        timer = PhaseTimer()
         try:
             table_name = data.get('table')
             if not table_name:
                 self.send_error_response(400, "Table name required")
                 return
+            self.metrics_table = table_name
 
-            results = perform_analytics(current_connection, table_name)
-            self.send_json_response({'status': 'success', 'data': results})
+            fmt = self.response_format(data.get('format'))
+            if fmt is None:
+                return
+            try:
+                analysis_plan(data.get('analysis_type'))
+                parse_as_of(data.get('as_of'))
+                parse_engine(data.get('engine'))
+                parse_workers(data.get('workers'))
+            except ValueError as e:
+                self.send_error_response(400, str(e))
+                return
+
+            results, cached = run_analytics(pool, schema, server, data, timer=timer)
         except Exception as e:
             self.send_error_response(500, f"Analytics error: {str(e)}")
+            return
+
+        meta = {'status': 'success', 'cached': cached}
+        headers = {}
+        # encoding happens while the body streams, so it is only in /api/metrics
+        if data.get('debug') or self.headers.get(DEBUG_HEADER):
+            meta['phases'] = timer.phases()
+            headers['Server-Timing'] = timer.server_timing()
+        started = time.perf_counter()
+        self.send_records_response(meta, results, fmt, headers)
+        metrics.observe('analytics_phase_seconds', {'table': table_name, 'phase': 'encoding'},
+                        time.perf_counter() - started)
+
+    def handle_query_results(self, params):
+        """Return one page of the latest results for a table, filtered and sorted server-side"""
+        def param(name, default=None):
+            values = params.get(name)
+            return values[0] if values else default
+
+        table_name = param('table')
+        if not table_name:
+            self.send_error_response(400, "Table name required")
+            return
+        self.metrics_table = table_name
+
+        _, schema, server = self.get_session()
+        result_set = result_store.get((server, schema, table_name))
+        if result_set is None:
+            self.send_error_response(404, f"No analytics results for {table_name}; run analytics first")
+            return
+
+        try:
+            churn = param('churn')
+            page = result_set.query(
+                offset=int(param('offset', 0)),
+                limit=int(param('limit', 100)),
+                sort=param('sort'),
+                descending=param('order', 'asc').lower() == 'desc',
+                segment=param('segment'),
+                churn=int(churn) if churn not in (None, '') else None,
+                search=param('search'),
+                match=param('match', 'substring'),
+            )
+        except ValueError as e:
+            self.send_error_response(400, f"Invalid query parameter: {str(e)}")
+            return
+        self.send_json_response({'status': 'success', 'customers': len(result_set), **page})
+
+    def handle_get_customer(self, params):
+        """Return one customer's analytics by id, or every customer with a name"""
+        table_name = params.get('table', [None])[0]
+        customer_id = params.get('id', [None])[0]
+        name = params.get('name', [None])[0]
+        if not table_name:
+            self.send_error_response(400, "Table name required")
+            return
+        if customer_id in (None, '') and name in (None, ''):
+            self.send_error_response(400, "Customer id or name required")
+            return
+        self.metrics_table = table_name
+        if customer_id == '':
+            customer_id = None
+
+        pool, schema, server = self.get_session()
+        # the index over the last full results answers without touching the database
+        result_set = result_store.get((server, schema, table_name))
+        records, source = None, None
+        if result_set is not None and not result_set.partial:
+            records, source = result_set.lookup(customer_id=customer_id, name=name), 'index'
+        # customers added since the last run are not in the index, so a miss asks the database
+        if not records and not pool:
+            if source is None:
+                self.send_error_response(400, "Not connected to database")
+                return
+        elif not records:
+            try:
+                with pool.connection() as connection:
+                    records, source = None, 'summary'
+                    if customer_id is not None:
+                        records = lookup_summary(connection, table_name, customer_id)
+                    if not records:
+                        # customers newer than the summary are computed from their own orders
+                        records = perform_customer_lookup(connection, table_name, customer_id=customer_id, name=name)
+                        source = 'query'
+            except Exception as e:
+                self.send_error_response(500, f"Lookup error: {str(e)}")
+                return
+        if not records:
+            self.send_error_response(404, "Customer not found")
+            return
+        self.send_json_response({'status': 'success', 'source': source, 'customers': records})
+
+    def handle_submit_job(self, data):
+        """Queue an analytics run and return its job id"""
+        pool, schema, server = self.get_session()
+
+        if not pool:
+            self.send_error_response(400, "Not connected to database")
+            return
+
+        table_name = data.get('table')
+        if not table_name:
+            self.send_error_response(400, "Table name required")
+            return
+        self.metrics_table = table_name
+
+        try:
+            analysis, _ = analysis_plan(data.get('analysis_type'))
+            as_of = parse_as_of(data.get('as_of'))
+            engine = parse_engine(data.get('engine'))
+            workers = parse_workers(data.get('workers'))
+        except ValueError as e:
+            self.send_error_response(400, str(e))
+            return
+
+        # identical in-flight requests share one job
+        key = (server, schema, table_name, analysis, engine, workers,
+               bool(data.get('incremental')), bool(data.get('materialize')), bool(data.get('snapshot')),
+               bool(data.get('rebuild')), as_of)
+        job, deduplicated = job_manager.submit(
+            key, lambda report: run_analytics(pool, schema, server, data, progress=report)
+        )
+        self.send_json_response({'status': 'success', 'job': job.to_dict(), 'deduplicated': deduplicated}, 202)
+
+    def handle_get_job(self, path, params):
+        """Return a job's status, or its results for /api/jobs/<id>/results"""
+        parts = path.strip('/').split('/')
+        if len(parts) not in (3, 4) or (len(parts) == 4 and parts[3] != 'results'):
+            self.send_error_response(404, "Endpoint not found")
+            return
+
+        job = job_manager.get(parts[2])
+        if job is None:
+            self.send_error_response(404, "Job not found")
+            return
+
+        if len(parts) == 3:
+            self.send_json_response({'status': 'success', 'job': job.to_dict()})
+        elif job.status == 'done':
+            fmt = self.response_format(params.get('format', [None])[0])
+            if fmt is None:
+                return
+            results, cached = job.result
+            self.send_records_response({'status': 'success', 'cached': cached}, results, fmt)
+        elif job.status == 'failed':
+            self.send_error_response(500, f"Analytics error: {job.error}")
+        elif job.status == 'cancelled':
+            self.send_error_response(410, "Job was cancelled")
+        else:
+            self.send_error_response(409, f"Job is still {job.status}")
+
+    def handle_cancel_job(self, path):
+        """Cancel a queued or running job"""
+        parts = path.strip('/').split('/')
+        job = job_manager.cancel(parts[2]) if len(parts) == 3 else None
+        if job is None:
+            self.send_error_response(404, "Job not found")
+            return
+        self.send_json_response({'status': 'success', 'job': job.to_dict()})
+
+    def handle_refresh_summary(self, data):
+        """Build or refresh a table's materialized summary"""
+        pool, schema, server = self.get_session()
+
+        if not pool:
+            self.send_error_response(400, "Not connected to database")
+            return
+
+        table_name = data.get('table')
+        if not table_name:
+            self.send_error_response(400, "Table name required")
+            return
+        self.metrics_table = table_name
+
+        try:
+            with pool.connection() as connection:
+                records, outcome = refresh_summary(connection, table_name, rebuild=bool(data.get('rebuild')))
+        except Exception as e:
+            self.send_error_response(500, f"Summary refresh error: {str(e)}")
+            return
+        # cached results may have been read from the summary before this refresh
+        result_cache.invalidate(server=server, schema=schema, table=table_name)
+        result_store.put((server, schema, table_name), records)
+        self.send_json_response({
+            'status': 'success',
+            'outcome': outcome,
+            'summary_table': summary_table_name(table_name),
+            'customers': len(records),
+        })
+
+    def handle_batch(self, data):
+        """Run analytics on several tables and return a summary per table"""
+        pool, schema, server = self.get_session()
+
+        if not pool:
+            self.send_error_response(400, "Not connected to database")
+            return
+
+        try:
+            parse_as_of(data.get('as_of'))
+            parse_engine(data.get('engine'))
+        except ValueError as e:
+            self.send_error_response(400, str(e))
+            return
+
+        tables = data.get('tables', 'all')
+        detect = tables == 'all'
+        if detect:
+            try:
+                with pool.connection() as connection:
+                    tables = [t for t in get_tables(connection) if not is_internal_table(t)]
+            except PoolError as e:
+                # every pooled connection is busy; the client can retry
+                self.send_error_response(503, f"Error retrieving tables: {str(e)}")
+                return
+            except Exception as e:
+                self.send_error_response(500, f"Error retrieving tables: {str(e)}")
+                return
+        elif not isinstance(tables, list) or not all(isinstance(t, str) and t for t in tables):
+            self.send_error_response(400, "tables must be a list of table names or \"all\"")
+            return
+
+        # every other field (engine, snapshot, ...) applies to each table
+        # summaries need every column, so analysis_type is ignored
+        options = {k: v for k, v in data.items() if k not in ('tables', 'workers', 'analysis_type')}
+        try:
+            results = run_batch(
+                pool, list(dict.fromkeys(tables)),
+                lambda table: run_analytics(pool, schema, server, {**options, 'table': table}),
+                workers=data.get('workers'), detect=detect,
+            )
+        except (TypeError, ValueError) as e:
+            self.send_error_response(400, f"Invalid batch request: {str(e)}")
+            return
+        counts = {status: sum(1 for r in results if r['status'] == status)
+                  for status in ('success', 'failed', 'skipped')}
+        self.send_json_response({'status': 'success', 'tables': results, 'counts': counts})
+
+    def handle_segment_history(self, data):
+        """Return segment counts at several as_of dates and the migrations between them"""
+        pool, schema, server = self.get_session()
+
+        if not pool:
+            self.send_error_response(400, "Not connected to database")
+            return
+
+        table_name = data.get('table')
+        if not table_name:
+            self.send_error_response(400, "Table name required")
+            return
+        self.metrics_table = table_name
+
+        cutoffs = data.get('as_of')
+        if not isinstance(cutoffs, list) or not cutoffs:
+            self.send_error_response(400, "as_of must be a non-empty list of ISO-8601 dates")
+            return
+        if len(cutoffs) > MAX_HISTORY_CUTOFFS:
+            self.send_error_response(400, f"At most {MAX_HISTORY_CUTOFFS} as_of dates are allowed")
+            return
+        try:
+            cutoffs = [parse_as_of(c) for c in cutoffs]
+        except ValueError as e:
+            self.send_error_response(400, str(e))
+            return
+        if None in cutoffs:
+            self.send_error_response(400, "as_of dates must not be empty")
+            return
+        cutoffs = sorted(set(cutoffs))
+
+        key = (server, schema, table_name, 'history', tuple(c.isoformat() for c in cutoffs))
+        timer = PhaseTimer()
+        report = timer.wrap()
+        try:
+            report('checkout')
+            with pool.connection() as connection:
+                report('fingerprint')
+                fingerprint = get_table_fingerprint(connection, table_name)
+                # cached as a one-record list so the cache sizes it like any records
+                entry = result_cache.get(key, fingerprint)
+                cached = entry is not None
+                if cached:
+                    history = entry[0]
+                else:
+                    history = perform_segment_history(connection, table_name, cutoffs, progress=report)
+                    result_cache.put(key, fingerprint, [history])
+        except Exception as e:
+            self.send_error_response(500, f"Segment history error: {str(e)}")
+            return
+        finally:
+            timer.stop()
+        metrics.observe_run(table_name, timer, cached)
+        self.send_json_response({'status': 'success', 'table': table_name, 'cached': cached, **history})
+
+    def handle_cache_invalidate(self, data):
+        """Drop cached analytics results for one table, or for the current schema"""
+        table_name = data.get('table')
+        _, schema, server = self.get_session()
+        removed = result_cache.invalidate(server=server, schema=schema, table=table_name)
+        removed_snapshots = snapshot_cache.invalidate(server=server, schema=schema, table=table_name)
+        self.send_json_response({
+            'status': 'success',
+            'removed': removed,
+            'removed_snapshots': removed_snapshots,
+            'cache': result_cache.stats(),
+            'snapshots': snapshot_cache.stats(),
+        })
 
     def send_json_response(self, data, status_code=200):
         """Send JSON response"""
+        body = dumps(data)
+        encoding = None
+        if len(body) >= COMPRESS_MIN_BYTES:
+            encoding = negotiate_encoding(self.headers.get('Accept-Encoding'))
+            if encoding:
+                body = compress(body, encoding)
         self.send_response(status_code)
         self.send_header('Content-type', 'application/json')
+        self.send_header('Content-Length', len(body))
+        self.send_header('Vary', 'Accept-Encoding')
+        if encoding:
+            self.send_header('Content-Encoding', encoding)
+        self.send_header('Access-Control-Allow-Origin', '*')
+        self.send_header('Access-Control-Allow-Methods', 'GET, POST, DELETE, OPTIONS')
+        self.send_header('Access-Control-Allow-Headers', 'Content-Type')
+        self.end_headers()
+        self.wfile.write(body)
+
+    def send_records_response(self, meta, records, fmt='json', headers=None):
+        """Stream a result set with chunked transfer encoding, compressed if the client accepts it"""
+        pieces = iter_encoded(meta, records, fmt)
+        # the envelope and the first batch of records are encoded before the headers go out,
+        # so setup errors and bad values in small results still get a status
+        try:
+            head = list(itertools.islice(pieces, 2))
+        except (TypeError, ValueError) as e:
+            self.send_error_response(500, f"Could not encode results: {str(e)}")
+            return
+        encoding = negotiate_encoding(self.headers.get('Accept-Encoding'))
+        compressor = StreamCompressor(encoding)
+        self.send_response(200)
+        self.send_header('Content-type', FORMAT_CONTENT_TYPES[fmt])
+        self.send_header('Transfer-Encoding', 'chunked')
+        self.send_header('Vary', 'Accept-Encoding')
+        if encoding:
+            self.send_header('Content-Encoding', encoding)
+        for name, value in (headers or {}).items():
+            self.send_header(name, value)
         self.send_header('Access-Control-Allow-Origin', '*')
-        self.send_header('Access-Control-Allow-Methods', 'GET, POST, OPTIONS')
+        self.send_header('Access-Control-Allow-Methods', 'GET, POST, DELETE, OPTIONS')
         self.send_header('Access-Control-Allow-Headers', 'Content-Type')
         self.end_headers()
-        self.wfile.write(json.dumps(data).encode('utf-8'))
+        try:
+            for piece in itertools.chain(head, pieces):
+                self.write_chunk(compressor.compress(piece))
+        except (TypeError, ValueError) as e:
+            # the 200 is already out: close without the last chunk so the client sees the
+            # body as incomplete rather than as a shorter, well-formed result
+            print(f"Could not encode results: {e}")
+            self.close_connection = True
+            return
+        self.write_chunk(compressor.flush())
+        self.wfile.write(b'0\r\n\r\n')
+
+    def send_text_response(self, text, content_type='text/plain; charset=utf-8', status_code=200):
+        """Send a plain-text response"""
+        body = text.encode('utf-8')
+        self.send_response(status_code)
+        self.send_header('Content-type', content_type)
+        self.send_header('Content-Length', len(body))
+        self.send_header('Access-Control-Allow-Origin', '*')
+        self.end_headers()
+        self.wfile.write(body)
+
+    def write_chunk(self, data):
+        """Write one HTTP/1.1 chunk; empty data is skipped since it would end the body"""
+        if data:
+            self.wfile.write(f"{len(data):X}\r\n".encode('ascii') + data + b'\r\n')
+
+    def response_format(self, fmt):
+        """Validate a requested result format, sending a 400 and returning None if unknown"""
+        fmt = fmt or 'json'
+        if fmt not in RESPONSE_FORMATS:
+            self.send_error_response(400, f"Unknown format '{fmt}'; expected one of {', '.join(RESPONSE_FORMATS)}")
+            return None
+        unavailable = format_unavailable(fmt)
+        if unavailable:
+            self.send_error_response(400, unavailable)
+            return None
+        return fmt
 
     def send_error_response(self, status_code, message):
         """Send error response"""
+        body = dumps({'status': 'error', 'message': message})
         self.send_response(status_code)
         self.send_header('Content-type', 'application/json')
+        self.send_header('Content-Length', len(body))
         self.send_header('Access-Control-Allow-Origin', '*')
-        self.send_header('Access-Control-Allow-Methods', 'GET, POST, OPTIONS')
+        self.send_header('Access-Control-Allow-Methods', 'GET, POST, DELETE, OPTIONS')
         self.send_header('Access-Control-Allow-Headers', 'Content-Type')
         self.end_headers()
-        self.wfile.write(json.dumps({'status': 'error', 'message': message}).encode('utf-8'))
+        self.wfile.write(body)
 
     def end_headers(self):
         """Override to add CORS headers - but call parent to actually send"""
@@ -229,17 +976,28 @@ class DataAnalyticsHandler(http.server.SimpleHTTPRequestHandler):
     def do_OPTIONS(self):
         """Handle CORS preflight requests"""
         self.send_response(200)
+        self.send_header('Content-Length', 0)
         self.send_header('Access-Control-Allow-Origin', '*')
-        self.send_header('Access-Control-Allow-Methods', 'GET, POST, OPTIONS')
-        self.send_header('Access-Control-Allow-Headers', 'Content-Type')
+        self.send_header('Access-Control-Allow-Methods', 'GET, POST, DELETE, OPTIONS')
+        self.send_header('Access-Control-Allow-Headers', f'Content-Type, {DEBUG_HEADER}')
         self.end_headers()
 
 
+class ThreadingServer(socketserver.ThreadingMixIn, socketserver.TCPServer):
+    """TCP server that handles each request in a daemon thread"""
+    daemon_threads = True
+
+
 def run_server():
     """Start the HTTP server"""
+    if not LAZY_STARTUP:
+        warmup()
+    server_class = ThreadingServer if THREADED else socketserver.TCPServer
     # allow rapid restarts during development
-    socketserver.TCPServer.allow_reuse_address = True
-    with socketserver.TCPServer(("", PORT), DataAnalyticsHandler) as httpd:
+    server_class.allow_reuse_address = True
+    with server_class(("", PORT), DataAnalyticsHandler) as httpd:
+        if LAZY_STARTUP:
+            threading.Thread(target=warmup, name='warmup', daemon=True).start()
         print(f"Server running at http://localhost:{PORT}")
         print(f"Serving frontend from: {FRONTEND_DIR}")
         print("Press Ctrl+C to stop the server")
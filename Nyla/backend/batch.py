@@ -0,0 +1,79 @@
+import statistics
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from analytics import _detect_sample_columns
+from materialize import SUMMARY_META_TABLE, SUMMARY_SUFFIX
+
+
+# tables one batch request analyzes at the same time (each holds a pool connection)
+BATCH_WORKERS = 4
+
+
+def summarize_records(records):
+    """Reduce one table's analytics records to segment counts, churn rate and median gap."""
+    segments = {}
+    churned = 0
+    gaps = []
+    for record in records:
+        segment = record.get('customer_classification')
+        segments[segment] = segments.get(segment, 0) + 1
+        churned += record.get('churn_flag') or 0
+        if record.get('avg_order_gap') is not None:
+            gaps.append(record['avg_order_gap'])
+    return {
+        'customers': len(records),
+        'segments': segments,
+        'churn_rate': round(churned / len(records), 4) if records else None,
+        'median_gap': round(statistics.median(gaps), 2) if gaps else None,
+    }
+
+
+def is_internal_table(table_name):
+    """Return True for the summary and bookkeeping tables the backend creates itself."""
+    return table_name == SUMMARY_META_TABLE or table_name.endswith(SUMMARY_SUFFIX)
+
+
+def _analyzable(pool, table_name):
+    """Return True if a date and a customer column are detected in the table."""
+    with pool.connection() as connection:
+        try:
+            return _detect_sample_columns(connection, table_name) is not None
+        except ValueError:
+            return False
+
+
+def _run_one(pool, table_name, analyze, detect):
+    started = time.perf_counter()
+    try:
+        if detect and not _analyzable(pool, table_name):
+            return {'table': table_name, 'status': 'skipped',
+                    'reason': 'no date and customer columns detected'}
+        records, cached = analyze(table_name)
+    except Exception as e:
+        print(f"Batch analytics failed for {table_name}: {e}")
+        return {'table': table_name, 'status': 'failed', 'error': str(e)}
+    return {
+        'table': table_name,
+        'status': 'success',
+        'cached': cached,
+        'seconds': round(time.perf_counter() - started, 3),
+        **summarize_records(records),
+    }
+
+
+def run_batch(pool, tables, analyze, workers=None, detect=False):
+    """Analyze several tables concurrently and summarize each one.
+
+    ``analyze(table)`` returns ``(records, cached)`` as ``app.run_analytics``
+    does. At most ``workers`` tables (capped at BATCH_WORKERS) run at once.
+    With ``detect``, tables without a detectable date and customer column
+    are skipped instead of failing. A failure affects only its own table;
+    entries come back in the order of ``tables``.
+    """
+    if not tables:
+        return []
+    workers = max(1, min(int(workers or BATCH_WORKERS), BATCH_WORKERS, len(tables)))
+    with ThreadPoolExecutor(max_workers=workers, thread_name_prefix='batch') as executor:
+        futures = [executor.submit(_run_one, pool, table, analyze, detect) for table in tables]
+        return [future.result() for future in futures]
@@ -0,0 +1,105 @@
+import json
+import threading
+from collections import OrderedDict
+
+
+# upper bound on the estimated size of all cached results
+CACHE_MAX_BYTES = 256 * 1024 * 1024
+# records serialized to estimate the size of a cached result
+SIZE_SAMPLE_RECORDS = 100
+
+
+def estimate_records_bytes(records):
+    """Estimate the serialized size of a list of records from a small sample."""
+    if not records:
+        return 0
+    sample = records[:SIZE_SAMPLE_RECORDS]
+    sample_bytes = len(json.dumps(sample, default=str))
+    return sample_bytes * len(records) // len(sample)
+
+
+class ResultCache:
+    """In-process LRU cache of analytics results, bounded by estimated size.
+
+    Entries are keyed by ``(server, schema, table)``, plus the analysis type
+    for results of a partial plan, and carry the table fingerprint they were
+    computed from; a lookup with a different fingerprint counts as a miss
+    and drops the stale entry.
+    """
+
+    def __init__(self, max_bytes=CACHE_MAX_BYTES):
+        self.max_bytes = max_bytes
+        self.hits = 0
+        self.misses = 0
+        self._entries = OrderedDict()
+        self._bytes = 0
+        self._lock = threading.Lock()
+
+    def get(self, key, fingerprint, count_miss=True):
+        """Return cached records for ``key`` if computed at ``fingerprint``, else None.
+
+        With ``count_miss`` False a miss is not counted, for a probe whose
+        caller goes on to another lookup (see ``record_miss``).
+        """
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None or fingerprint is None or entry['fingerprint'] != fingerprint:
+                if entry is not None:
+                    self._remove(key)
+                if count_miss:
+                    self.misses += 1
+                return None
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return entry['records']
+
+    def record_miss(self):
+        """Count a miss for a lookup made with ``count_miss=False``."""
+        with self._lock:
+            self.misses += 1
+
+    def put(self, key, fingerprint, records):
+        """Store records for ``key``, evicting least recently used entries as needed."""
+        if fingerprint is None:
+            return
+        size = estimate_records_bytes(records)
+        if size > self.max_bytes:
+            return
+        with self._lock:
+            if key in self._entries:
+                self._remove(key)
+            self._entries[key] = {'fingerprint': fingerprint, 'records': records, 'bytes': size}
+            self._bytes += size
+            while self._bytes > self.max_bytes and self._entries:
+                self._remove(next(iter(self._entries)))
+
+    def invalidate(self, server=None, schema=None, table=None):
+        """Drop entries matching the given server, schema and table; all entries if none given."""
+        with self._lock:
+            removed = 0
+            for key in list(self._entries):
+                key_server, key_schema, key_table = key[:3]
+                if server is not None and key_server != server:
+                    continue
+                if schema is not None and key_schema != schema:
+                    continue
+                if table is not None and key_table != table:
+                    continue
+                self._remove(key)
+                removed += 1
+            return removed
+
+    def stats(self):
+        """Return hit/miss counters and current size."""
+        with self._lock:
+            return {
+                'hits': self.hits,
+                'misses': self.misses,
+                'entries': len(self._entries),
+                'bytes': self._bytes,
+                'max_bytes': self.max_bytes,
+            }
+
+    def _remove(self, key):
+        entry = self._entries.pop(key)
+        self._bytes -= entry['bytes']
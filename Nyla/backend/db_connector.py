@@ -1,6 +1,17 @@
+import threading
+from contextlib import contextmanager
+
 import mysql.connector
 from mysql.connector import Error
+from mysql.connector.errors import PoolError
+
 
+# connections kept per pool
+POOL_SIZE = 8
+# seconds a request waits for a free pooled connection
+POOL_CHECKOUT_TIMEOUT = 30
+# reconnect attempts when a checked-out connection fails its ping
+POOL_RECONNECT_ATTEMPTS = 3
 
 def connect_to_db(host, port, user, password, schema):
     """Establish connection to MySQL database"""
@@ -28,6 +39,104 @@ def connect_to_db(host, port, user, password, schema):
         return None
 
 
+class ConnectionPool:
+    """Bounded pool of MySQL connections with per-request checkout.
+
+    Requests wait up to ``checkout_timeout`` seconds for a free connection
+    and every checked-out connection is pinged first, reconnecting it if the
+    server dropped it while idle, and has its session state reset. All
+    ``size`` connections are opened up front. After ``close`` idle
+    connections are closed at once and checked-out ones when released.
+    """
+
+    def __init__(self, host, port, user, password, schema, size=POOL_SIZE,
+                 checkout_timeout=POOL_CHECKOUT_TIMEOUT):
+        self.size = max(1, size)
+        self.checkout_timeout = checkout_timeout
+        self._slots = threading.BoundedSemaphore(self.size)
+        self._lock = threading.Lock()
+        self._idle = []
+        self._closed = False
+        # kept so worker processes can open their own connections
+        self.connect_params = {
+            'host': host,
+            'port': port,
+            'user': user,
+            'password': password,
+            'database': schema,
+            'autocommit': True,
+            'auth_plugin': 'mysql_native_password',
+        }
+        try:
+            for _ in range(self.size):
+                self._idle.append(mysql.connector.connect(**self.connect_params))
+        except Exception:
+            self.close()
+            raise
+
+    @contextmanager
+    def connection(self):
+        """Check out a healthy connection for the duration of a ``with`` block."""
+        if not self._slots.acquire(timeout=self.checkout_timeout):
+            raise PoolError("Timed out waiting for a free database connection")
+        with self._lock:
+            if self._closed:
+                self._slots.release()
+                raise PoolError("The connection pool is closed")
+            # a free slot means an idle connection: every connection holds a slot while out
+            cnx = self._idle.pop()
+        try:
+            cnx.ping(reconnect=True, attempts=POOL_RECONNECT_ATTEMPTS, delay=1)
+            cnx.reset_session()
+            yield cnx
+        finally:
+            try:
+                self._release(cnx)
+            finally:
+                self._slots.release()
+
+    def _release(self, cnx):
+        """Return a checked-out connection to the idle list, or close it if the pool is closed."""
+        with self._lock:
+            closed = self._closed
+            if not closed:
+                self._idle.append(cnx)
+        if closed:
+            _close_quietly(cnx)
+
+    def close(self):
+        """Close idle connections now and checked-out ones as they are released."""
+        with self._lock:
+            self._closed = True
+            idle, self._idle = self._idle, []
+        for cnx in idle:
+            _close_quietly(cnx)
+
+
+def _close_quietly(cnx):
+    try:
+        cnx.close()
+    except Exception as e:
+        print(f"Error closing pooled connection: {e}")
+
+
+def create_pool(host, port, user, password, schema, size=POOL_SIZE):
+    """Create a connection pool for the schema, or None if the connection fails"""
+    try:
+        print(f"Creating pool of {size} connections to {host}:{port} with user '{user}' to schema '{schema}'")
+        pool = ConnectionPool(host, port, user, password, schema, size=size)
+        with pool.connection() as connection:
+            if connection.is_connected():
+                print(f"Successfully connected to {schema} database")
+                return pool
+    except Error as e:
+        print(f"Connection Error: {e}")
+        return None
+    except Exception as e:
+        print(f"Unexpected Error: {e}")
+        return None
+
+
 def get_tables(connection):
     """Retrieve all table names from the connected database"""
     try:
@@ -39,3 +148,36 @@ def get_tables(connection):
     except Error as e:
         print(f"Error retrieving tables: {e}")
         return []
+
+
+def get_table_fingerprint(connection, table_name):
+    """Return a cheap change fingerprint for a table, or None if unavailable.
+
+    Uses UPDATE_TIME, TABLE_ROWS and DATA_LENGTH from information_schema.
+    UPDATE_TIME is NULL for engines that do not track it, for partitioned
+    InnoDB tables, and for InnoDB after a restart until the first write.
+    The fingerprint is then None, so results are not cached: the only
+    exact alternative, CHECKSUM TABLE, reads the whole table on every
+    request.
+    """
+    try:
+        cursor = connection.cursor()
+        try:
+            # MySQL 8 caches table statistics for a day by default
+            cursor.execute("SET SESSION information_schema_stats_expiry = 0")
+        except Error:
+            pass
+        cursor.execute(
+            "SELECT UPDATE_TIME, TABLE_ROWS, DATA_LENGTH FROM information_schema.TABLES "
+            "WHERE TABLE_SCHEMA = DATABASE() AND TABLE_NAME = %s",
+            (table_name,)
+        )
+        row = cursor.fetchone()
+        cursor.close()
+        if row is None or row[0] is None:
+            return None
+        update_time, table_rows, data_length = row
+        return f"{update_time}|{table_rows}|{data_length}"
+    except Error as e:
+        print(f"Error reading table fingerprint: {e}")
+        return None
@@ -0,0 +1,181 @@
+import importlib.util
+import io
+import json
+import zlib
+
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+
+# response bodies smaller than this are sent uncompressed
+COMPRESS_MIN_BYTES = 1024
+# records encoded per write when streaming a result set
+STREAM_BATCH_RECORDS = 1000
+# zlib level used for responses: low to favour speed over ratio (level 6 takes about twice as long)
+COMPRESS_LEVEL = 3
+# record layouts a client can ask for with ``format``
+RESPONSE_FORMATS = ('json', 'ndjson', 'columnar', 'arrow')
+# Content-Type of each response format
+FORMAT_CONTENT_TYPES = {
+    'json': 'application/json',
+    'ndjson': 'application/x-ndjson',
+    'columnar': 'application/json',
+    'arrow': 'application/vnd.apache.arrow.stream',
+}
+
+COMPRESSIBLE_TYPES = ('text/', 'application/json', 'application/javascript', 'application/x-ndjson', 'image/svg+xml')
+
+# zlib window bits for each supported Content-Encoding
+_WBITS = {'gzip': 16 + zlib.MAX_WBITS, 'deflate': zlib.MAX_WBITS}
+
+
+def dumps(obj):
+    """Encode ``obj`` as UTF-8 JSON bytes, with orjson when it is installed."""
+    if orjson is not None:
+        try:
+            return orjson.dumps(obj, option=orjson.OPT_NON_STR_KEYS)
+        except TypeError:
+            # values orjson rejects (e.g. integers beyond 64 bits) take the json path
+            pass
+    return json.dumps(obj).encode('utf-8')
+
+
+def format_unavailable(fmt):
+    """Return why a known response format cannot be produced here, or None if it can."""
+    # pyarrow is slow to import, so it is only looked up here and imported on first use
+    if fmt == 'arrow' and importlib.util.find_spec('pyarrow') is None:
+        return "The arrow format requires pyarrow, which is not installed"
+    return None
+
+
+def negotiate_encoding(accept_encoding):
+    """Pick 'gzip', 'deflate' or None from an Accept-Encoding header."""
+    if not accept_encoding:
+        return None
+    offered = {}
+    for part in accept_encoding.split(','):
+        pieces = part.strip().split(';')
+        name = pieces[0].strip().lower()
+        quality = 1.0
+        for param in pieces[1:]:
+            key, _, value = param.strip().partition('=')
+            if key.strip() == 'q':
+                try:
+                    quality = float(value)
+                except ValueError:
+                    quality = 0.0
+        offered[name] = quality
+    for name in ('gzip', 'deflate'):
+        quality = offered.get(name, offered.get('*', 0.0))
+        if quality > 0:
+            return name
+    return None
+
+
+def is_compressible(content_type):
+    """Return True if responses of this content type are worth compressing."""
+    return any(content_type.startswith(prefix) for prefix in COMPRESSIBLE_TYPES)
+
+
+def compress(body, encoding):
+    """Compress a whole body with the given Content-Encoding."""
+    compressor = zlib.compressobj(COMPRESS_LEVEL, zlib.DEFLATED, _WBITS[encoding])
+    return compressor.compress(body) + compressor.flush()
+
+
+class StreamCompressor:
+    """Incremental compressor; passes data through when ``encoding`` is None."""
+
+    def __init__(self, encoding=None):
+        self._compressor = None
+        if encoding:
+            self._compressor = zlib.compressobj(COMPRESS_LEVEL, zlib.DEFLATED, _WBITS[encoding])
+
+    def compress(self, data):
+        if self._compressor is None:
+            return data
+        return self._compressor.compress(data)
+
+    def flush(self):
+        if self._compressor is None:
+            return b''
+        return self._compressor.flush()
+
+
+def _batches(items, size=STREAM_BATCH_RECORDS):
+    for start in range(0, len(items), size):
+        yield items[start:start + size]
+
+
+def _drain(buffer):
+    data = buffer.getvalue()
+    buffer.seek(0)
+    buffer.truncate()
+    return data
+
+
+def _iter_arrow(meta, records):
+    """Yield an Arrow IPC stream of the records, one record batch at a time.
+
+    ``meta`` travels as JSON in the schema metadata under ``nyla``. The
+    table is built before the first piece, so type errors surface early.
+    """
+    import pyarrow
+    import pyarrow.ipc
+
+    table = pyarrow.Table.from_pylist(records) if records else pyarrow.table({})
+    table = table.replace_schema_metadata({'nyla': json.dumps(meta)})
+    buffer = io.BytesIO()
+    writer = pyarrow.ipc.new_stream(buffer, table.schema)
+    yield _drain(buffer)
+    for batch in table.to_batches(max_chunksize=STREAM_BATCH_RECORDS):
+        writer.write_batch(batch)
+        yield _drain(buffer)
+    writer.close()
+    yield _drain(buffer)
+
+
+def iter_encoded(meta, records, fmt='json'):
+    """Yield the response body for ``meta`` plus ``records`` in pieces.
+
+    ``json`` writes ``{...meta, "data": [record, ...]}``; ``columnar``
+    writes ``{...meta, "columns": [...], "data": [[value, ...], ...]}`` so
+    keys are sent once; ``ndjson`` writes the meta object on the first
+    line and then one record object per line; ``arrow`` writes an Arrow
+    IPC stream (see ``_iter_arrow``). Each batch of records is encoded in
+    one call, by orjson when it is installed.
+    """
+    if fmt not in RESPONSE_FORMATS:
+        raise ValueError(f"Unknown response format '{fmt}'")
+    unavailable = format_unavailable(fmt)
+    if unavailable:
+        raise ValueError(unavailable)
+
+    if fmt == 'arrow':
+        yield from _iter_arrow(meta, records)
+        return
+
+    if fmt == 'ndjson':
+        yield dumps(meta) + b'\n'
+        for batch in _batches(records):
+            yield b''.join(dumps(record) + b'\n' for record in batch)
+        return
+
+    head = dict(meta)
+    if fmt == 'columnar':
+        # every record carries the same keys
+        columns = list(records[0]) if records else []
+        head['columns'] = columns
+    # meta is small; splice the streamed array in place of its closing brace
+    prefix = json.dumps(head)[:-1]
+    yield (prefix + (', ' if head else '') + '"data": [').encode('utf-8')
+    first = True
+    for batch in _batches(records):
+        if fmt == 'columnar':
+            batch = [list(map(record.get, columns)) for record in batch]
+        # the batch as a JSON array, without its brackets
+        yield (b', ' if not first else b'') + dumps(batch)[1:-1]
+        first = False
+    yield b']}'
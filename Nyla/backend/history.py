@@ -0,0 +1,142 @@
+import numpy as np
+import pandas as pd
+
+from analytics import (
+    CHURN_SEGMENTS,
+    _as_of_filter,
+    _classify_segments,
+    _detect_sample_columns,
+    _load_projected,
+    _naive,
+    _report,
+    _until,
+)
+
+
+# most cutoffs one history request may ask for
+MAX_HISTORY_CUTOFFS = 120
+# migration source for customers with no orders at the previous cutoff
+NEW_CUSTOMER = '(new)'
+
+_DAY_NS = 86400 * 10 ** 9
+
+
+def _iso(value):
+    return pd.Timestamp(value).isoformat()
+
+
+def perform_segment_history(connection, table_name, cutoffs, progress=None):
+    """Segment counts at each of several ``as_of`` cutoffs, from a single read of the table.
+
+    ``cutoffs`` are naive datetimes (see ``analytics.parse_as_of``); they
+    are sorted and deduplicated. Each snapshot classifies customers exactly
+    as ``perform_analytics(..., as_of=cutoff)`` would. Orders are read once
+    (up to the last cutoff) and sorted by customer and date; every order is
+    then bucketed by the first cutoff it precedes, so walking the cutoffs in
+    order only adds each bucket's orders to running per-customer counts
+    instead of re-aggregating the table. Gap sums come from one cumulative
+    sum over the sorted orders.
+
+    Returns ``{'snapshots': [...], 'migrations': [...]}``: per cutoff the
+    customer count, segment counts and churn rate, and between consecutive
+    cutoffs how many customers moved from each segment to each other one
+    (NEW_CUSTOMER for customers without orders at the earlier cutoff).
+    """
+    cutoffs = sorted(set(pd.Timestamp(c) for c in cutoffs))
+    if not cutoffs:
+        return {'snapshots': [], 'migrations': []}
+
+    _report(progress, 'detecting')
+    detected = _detect_sample_columns(connection, table_name)
+    if detected is None:
+        return {'snapshots': [_empty_snapshot(c) for c in cutoffs], 'migrations': []}
+    date_col, customer_col, _, native_dates = detected
+
+    _report(progress, 'loading')
+    where, params = _as_of_filter(date_col, native_dates, cutoffs[-1].to_pydatetime())
+    df = _load_projected(connection, table_name, date_col, customer_col, where=where,
+                         progress=progress, params=params)
+    df = _until(df, date_col, cutoffs[-1])
+    df = df.loc[df[customer_col].notna().to_numpy()]
+
+    _report(progress, 'aggregating', len(df))
+    codes, customers = pd.factorize(df[customer_col], sort=True)
+    dates = _naive(df[date_col]).to_numpy(dtype='datetime64[ns]').view('int64')
+    order = np.lexsort((dates, codes))
+    codes, dates = codes[order], dates[order]
+    count = len(customers)
+    starts = np.searchsorted(codes, np.arange(count))
+
+    # whole-day gap to the previous order of the same customer, 0 for first orders
+    gaps = np.zeros(len(dates), dtype='int64')
+    gaps[1:] = np.diff(dates) // _DAY_NS
+    gaps[starts] = 0
+    gap_totals = np.cumsum(gaps)
+
+    # bucket j holds the orders after cutoff j-1 and at or before cutoff j
+    cutoff_ns = np.array([c.value for c in cutoffs], dtype='int64')
+    buckets = np.searchsorted(cutoff_ns, dates, side='left')
+    by_bucket = np.argsort(buckets, kind='stable')
+    bounds = np.searchsorted(buckets[by_bucket], np.arange(len(cutoffs) + 1))
+
+    _report(progress, 'classifying')
+    orders = np.zeros(count, dtype='int64')
+    snapshots = []
+    migrations = []
+    previous = None
+    for j, cutoff in enumerate(cutoffs):
+        orders += np.bincount(codes[by_bucket[bounds[j]:bounds[j + 1]]], minlength=count)
+        present = orders > 0
+        segments = np.full(count, None, dtype=object)
+        if present.any():
+            segments[present] = _classify_at(orders[present], starts[present], dates, gap_totals, cutoff)
+        snapshots.append(_snapshot(cutoff, segments[present]))
+        if previous is not None:
+            migrations.append({
+                'from': _iso(cutoffs[j - 1]),
+                'to': _iso(cutoff),
+                'flows': _flows(previous[present], segments[present]),
+            })
+        previous = segments
+
+    _report(progress, 'formatting')
+    return {'snapshots': snapshots, 'migrations': migrations}
+
+
+def _classify_at(orders, starts, dates, gap_totals, cutoff):
+    """Classify customers from their first ``orders`` sorted orders, as of ``cutoff``."""
+    last = starts + orders - 1
+    later = orders > 1
+    gap_sum = (gap_totals[last] - gap_totals[starts]).astype(float)
+    stats = pd.DataFrame({
+        'total_orders': orders,
+        'first_order_date': dates[starts].view('datetime64[ns]'),
+        'last_order_date': dates[last].view('datetime64[ns]'),
+        'avg_order_gap': np.where(later, gap_sum / np.maximum(orders - 1, 1), np.nan),
+    })
+    return _classify_segments(stats, cutoff.to_pydatetime())
+
+
+def _snapshot(cutoff, segments):
+    counts = pd.Series(segments, dtype=object).value_counts()
+    churned = int(counts.reindex(list(CHURN_SEGMENTS)).fillna(0).sum())
+    return {
+        'as_of': _iso(cutoff),
+        'customers': len(segments),
+        'segments': {segment: int(n) for segment, n in counts.items()},
+        'churn_rate': round(churned / len(segments), 4) if len(segments) else None,
+    }
+
+
+def _empty_snapshot(cutoff):
+    return {'as_of': _iso(cutoff), 'customers': 0, 'segments': {}, 'churn_rate': None}
+
+
+def _flows(before, after):
+    """Count customers by (segment before, segment after), nested as ``{before: {after: n}}``."""
+    before = np.where(pd.isna(before), NEW_CUSTOMER, before)
+    pairs = pd.DataFrame({'before': before, 'after': after}).value_counts(sort=False)
+    flows = {}
+    for (source, target), n in pairs.items():
+        flows.setdefault(source, {})[target] = int(n)
+    return flows
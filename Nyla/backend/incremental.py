@@ -0,0 +1,160 @@
+import hashlib
+import os
+import pickle
+import tempfile
+
+import pandas as pd
+
+from analytics import (
+    _column_types,
+    _detect_sample_columns,
+    _finalize_results,
+    _fold_partials,
+    _fold_stream,
+    _partials_to_orders,
+    _report,
+    _quote_ident,
+    _stream_query,
+)
+
+
+# where per-table incremental state is persisted between runs
+STATE_DIR = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'state', 'incremental')
+# bump when the saved state layout changes so old files are rebuilt
+STATE_VERSION = 1
+
+
+def _state_path(state_key, state_dir=None):
+    """Return the state file path for a (server, schema, table) key."""
+    digest = hashlib.sha1(repr(tuple(state_key)).encode('utf-8')).hexdigest()
+    return os.path.join(state_dir or STATE_DIR, f"{digest}.pkl")
+
+
+def load_state(state_key, state_dir=None):
+    """Load saved incremental state for a key, or None if missing or unreadable."""
+    path = _state_path(state_key, state_dir)
+    try:
+        with open(path, 'rb') as f:
+            saved = pickle.load(f)
+    except FileNotFoundError:
+        return None
+    except Exception as e:
+        print(f"Ignoring unreadable incremental state {path}: {e}")
+        return None
+    if saved.get('version') != STATE_VERSION or saved.get('key') != tuple(state_key):
+        return None
+    return saved
+
+
+def save_state(state_key, saved, state_dir=None):
+    """Atomically write incremental state for a key."""
+    path = _state_path(state_key, state_dir)
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    # a unique temp file keeps concurrent runs on the same table from clobbering each other
+    fd, tmp_path = tempfile.mkstemp(dir=os.path.dirname(path), suffix='.tmp')
+    try:
+        with os.fdopen(fd, 'wb') as f:
+            pickle.dump(saved, f, protocol=pickle.HIGHEST_PROTOCOL)
+        os.replace(tmp_path, path)
+    except Exception:
+        os.remove(tmp_path)
+        raise
+
+
+def clear_state(state_key, state_dir=None):
+    """Delete saved incremental state for a key, if any."""
+    try:
+        os.remove(_state_path(state_key, state_dir))
+    except FileNotFoundError:
+        pass
+
+
+def _rows_up_to(connection, table_name, date_col, customer_col, watermark):
+    """Count rows the saved state should already cover: dated up to the watermark, or undated."""
+    cust = _quote_ident(customer_col)
+    date = _quote_ident(date_col)
+    cursor = connection.cursor()
+    cursor.execute(
+        f"SELECT COUNT(*) FROM {_quote_ident(table_name)} "
+        f"WHERE {cust} IS NOT NULL AND ({date} IS NULL OR {date} <= %s)",
+        (watermark,)
+    )
+    count = cursor.fetchone()[0]
+    cursor.close()
+    return int(count)
+
+
+def _is_valid(saved, connection, table_name, columns):
+    """Return True if saved state can be extended instead of rebuilt."""
+    if saved is None or saved['columns'] != columns or saved['watermark'] is None:
+        return False
+    date_col, customer_col, _ = columns
+    try:
+        covered = _rows_up_to(connection, table_name, date_col, customer_col, saved['watermark'])
+    except Exception as e:
+        print(f"Incremental watermark check failed, rebuilding: {e}")
+        return False
+    # fewer rows means deletes or a shrunk table; more means back-dated or undated inserts
+    return covered == saved['rows']
+
+
+def _snapshot(state_key, columns, state):
+    """Build the persisted form of a folded state."""
+    watermark = state['last_order_date'].max()
+    return {
+        'version': STATE_VERSION,
+        'key': tuple(state_key),
+        'columns': columns,
+        'watermark': None if pd.isna(watermark) else pd.Timestamp(watermark).to_pydatetime(),
+        'rows': int(state['rows'].sum()),
+        'state': state,
+    }
+
+
+def perform_incremental_analytics(connection, table_name, state_key, rebuild=False, state_dir=None,
+                                  progress=None):
+    """Run analytics by folding only orders newer than the last run into saved state.
+
+    ``state_key`` identifies the table across connections, e.g.
+    ``(server, schema, table)``. Per-customer state and a high-water mark on
+    the detected date column are persisted under ``STATE_DIR``. The state is
+    rebuilt from a full scan when ``rebuild`` is set, when the detected
+    columns change, or when the row count up to the watermark no longer
+    matches (rows deleted, table shrunk, back-dated or undated inserts).
+    ``progress`` is called as in ``perform_analytics``.
+    """
+    _report(progress, 'detecting')
+    detected = _detect_sample_columns(connection, table_name)
+    if detected is None:
+        clear_state(state_key, state_dir)
+        return []
+    date_col, customer_col, name_col, native_dates = detected
+    columns = (date_col, customer_col, name_col)
+    types = _column_types(connection, table_name)
+    if not native_dates:
+        raise ValueError(f"Incremental analytics requires a native DATE/DATETIME column; '{date_col}' is not one.")
+
+    saved = None if rebuild else load_state(state_key, state_dir)
+    if _is_valid(saved, connection, table_name, columns):
+        where = f"{_quote_ident(date_col)} > %s"
+        query = _stream_query(table_name, date_col, customer_col, name_col, where=where, types=types)
+        new_rows = _fold_stream(connection, query, date_col, customer_col, name_col,
+                                params=(saved['watermark'],), progress=progress)
+        state = saved['state']
+        if new_rows is not None and not new_rows.empty:
+            # every new order is later than the watermark, so it extends each history in date order
+            state = _fold_partials([state, new_rows])
+            save_state(state_key, _snapshot(state_key, columns, state), state_dir)
+    else:
+        query = _stream_query(table_name, date_col, customer_col, name_col, types=types)
+        state = _fold_stream(connection, query, date_col, customer_col, name_col, progress=progress)
+        if state is None or state.empty:
+            clear_state(state_key, state_dir)
+            return []
+        save_state(state_key, _snapshot(state_key, columns, state), state_dir)
+
+    results = _partials_to_orders(state)
+    if results['last_order_date'].isna().all():
+        raise ValueError(f"Detected date column '{date_col}' could not be parsed as dates.")
+    _report(progress, 'classifying')
+    return _finalize_results(results, progress)
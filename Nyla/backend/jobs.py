@@ -0,0 +1,152 @@
+import threading
+import time
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+
+
+# analytics jobs that may run at the same time
+JOB_WORKERS = 2
+# seconds finished jobs (and their results) are kept for polling
+JOB_RETENTION_SECONDS = 3600
+
+
+class JobCancelled(Exception):
+    """Raised inside a job's progress callback once the job has been cancelled."""
+
+
+class Job:
+    """A submitted analytics run and its progress."""
+
+    def __init__(self, key):
+        self.id = uuid.uuid4().hex
+        self.key = key
+        self.status = 'queued'
+        self.phase = 'queued'
+        self.rows_processed = None
+        self.result = None
+        self.error = None
+        self.created_at = time.time()
+        self.started_at = None
+        self.finished_at = None
+        self.future = None
+        # clients sharing this job; it is cancelled once every one of them has cancelled
+        self.subscribers = 1
+        self._cancel = threading.Event()
+
+    @property
+    def finished(self):
+        return self.status in ('done', 'failed', 'cancelled')
+
+    def report(self, phase, rows=None):
+        """Progress callback for the analytics engine; raises once cancelled."""
+        if self._cancel.is_set():
+            raise JobCancelled()
+        self.phase = phase
+        if rows is not None:
+            self.rows_processed = rows
+
+    def to_dict(self):
+        """Return the job status as a JSON-safe dict (without results)."""
+        return {
+            'job_id': self.id,
+            'status': self.status,
+            'phase': self.phase,
+            'rows_processed': self.rows_processed,
+            'error': self.error,
+            'created_at': self.created_at,
+            'started_at': self.started_at,
+            'finished_at': self.finished_at,
+            'subscribers': self.subscribers,
+            'cancel_requested': self._cancel.is_set(),
+        }
+
+
+class JobManager:
+    """Runs analytics jobs on a bounded worker pool.
+
+    Submitting a job whose key matches a queued or running job returns the
+    existing job instead of starting a duplicate, and adds a subscriber to
+    it. ``cancel`` removes one subscriber; the job is only cancelled when
+    none remain, so one client leaving does not cancel it for the others.
+    A job being cancelled no longer matches new submissions. Cancellation
+    takes effect immediately for queued jobs and at the next progress
+    report for running ones.
+    """
+
+    def __init__(self, workers=JOB_WORKERS, retention=JOB_RETENTION_SECONDS):
+        self.retention = retention
+        self._executor = ThreadPoolExecutor(max_workers=workers, thread_name_prefix='analytics-job')
+        self._jobs = {}
+        self._in_flight = {}
+        self._lock = threading.Lock()
+
+    def submit(self, key, fn):
+        """Submit ``fn(report)`` under ``key``; return ``(job, deduplicated)``."""
+        with self._lock:
+            self._prune()
+            existing = self._in_flight.get(key)
+            if existing is not None and not existing.finished:
+                existing.subscribers += 1
+                return existing, True
+            job = Job(key)
+            self._jobs[job.id] = job
+            self._in_flight[key] = job
+            job.future = self._executor.submit(self._run, job, fn)
+            return job, False
+
+    def get(self, job_id):
+        """Return the job with this id, or None."""
+        with self._lock:
+            return self._jobs.get(job_id)
+
+    def cancel(self, job_id):
+        """Drop one subscriber, cancelling the job when it was the last; return the job, or None if unknown."""
+        with self._lock:
+            job = self._jobs.get(job_id)
+            if job is None or job.finished or job._cancel.is_set():
+                return job
+            job.subscribers -= 1
+            if job.subscribers > 0:
+                return job
+            job._cancel.set()
+            # a resubmitted request must start afresh rather than join a doomed job
+            if self._in_flight.get(job.key) is job:
+                del self._in_flight[job.key]
+            if job.future is not None and job.future.cancel():
+                self._finish(job, 'cancelled')
+            return job
+
+    def _run(self, job, fn):
+        job.status = 'running'
+        job.started_at = time.time()
+        try:
+            job.report('starting')
+            result = fn(job.report)
+        except JobCancelled:
+            with self._lock:
+                self._finish(job, 'cancelled')
+            return
+        except Exception as e:
+            job.error = str(e)
+            with self._lock:
+                self._finish(job, 'failed')
+            return
+        with self._lock:
+            if job._cancel.is_set():
+                self._finish(job, 'cancelled')
+            else:
+                job.result = result
+                self._finish(job, 'done')
+
+    def _finish(self, job, status):
+        job.status = status
+        job.phase = status
+        job.finished_at = time.time()
+        if self._in_flight.get(job.key) is job:
+            del self._in_flight[job.key]
+
+    def _prune(self):
+        cutoff = time.time() - self.retention
+        for job_id, job in list(self._jobs.items()):
+            if job.finished and job.finished_at < cutoff:
+                del self._jobs[job_id]
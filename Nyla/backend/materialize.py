@@ -0,0 +1,416 @@
+import argparse
+import getpass
+import hashlib
+import os
+import threading
+import uuid
+from datetime import datetime
+
+import pandas as pd
+
+from analytics import (
+    BINARY_TYPES,
+    STRING_TYPES,
+    _aggregate_frame,
+    _aggregate_table,
+    _as_text,
+    _detect_sample_columns,
+    _finalize_results,
+    _load_projected,
+    _quote_ident,
+    _report,
+)
+from incremental import _rows_up_to
+
+
+# bookkeeping table listing each materialized source table and its high-water mark
+SUMMARY_META_TABLE = 'nyla_summaries'
+# appended to the source table name to name its summary table
+SUMMARY_SUFFIX = '__summary'
+# rows per REPLACE statement; the connector folds each batch into one multi-row statement
+MATERIALIZE_BATCH_ROWS = 1000
+# source column types that cannot be a primary key as-is
+_UNKEYABLE_TYPES = {'tinytext', 'text', 'mediumtext', 'longtext', 'tinyblob', 'blob', 'mediumblob',
+                    'longblob', 'json'}
+# summary key type for text and binary ids: compared byte for byte, so ids differing only in
+# case, accents or trailing spaces stay apart, and short enough for an InnoDB key on any row format
+TEXT_KEY_TYPE = 'VARBINARY(767)'
+_UNNAMEABLE_TYPES = {'tinyblob', 'blob', 'mediumblob', 'longblob', 'binary', 'varbinary', 'json'}
+
+# one lock per source table name, so refreshes and rebuilds in this process never overlap
+_table_locks = {}
+_table_locks_guard = threading.Lock()
+
+SUMMARY_COLUMNS = (
+    'customer_id', 'customer_name', 'total_orders', 'first_order_date', 'last_order_date',
+    'avg_order_gap', 'predicted_next_order_date', 'customer_classification', 'churn_flag',
+)
+
+
+def summary_table_name(table_name):
+    """Return the summary table name for a source table, within MySQL's 64-character limit."""
+    # leave room for the 8-character staging suffixes used while swapping in a rebuild
+    if len(table_name) + len(SUMMARY_SUFFIX) <= 56:
+        return f"{table_name}{SUMMARY_SUFFIX}"
+    digest = hashlib.sha1(table_name.encode('utf-8')).hexdigest()[:8]
+    return f"{table_name[:56 - len(SUMMARY_SUFFIX) - 9]}_{digest}{SUMMARY_SUFFIX}"
+
+
+def _table_lock(table_name):
+    with _table_locks_guard:
+        return _table_locks.setdefault(table_name, threading.RLock())
+
+
+def _staging_name(summary):
+    """A table name for one rebuild's staging or retired copy, unique per call."""
+    return f"{summary}__{uuid.uuid4().hex[:6]}"
+
+
+def _execute(connection, statement, params=()):
+    cursor = connection.cursor()
+    try:
+        cursor.execute(statement, params)
+    finally:
+        cursor.close()
+
+
+def _source_column_types(connection, table_name):
+    """Return ``{column: (data_type, column_type)}`` from information_schema, or {} if unavailable."""
+    cursor = connection.cursor()
+    try:
+        cursor.execute(
+            "SELECT COLUMN_NAME, DATA_TYPE, COLUMN_TYPE FROM information_schema.COLUMNS "
+            "WHERE TABLE_SCHEMA = DATABASE() AND TABLE_NAME = %s",
+            (table_name,)
+        )
+        rows = cursor.fetchall()
+    except Exception:
+        return {}
+    finally:
+        cursor.close()
+    return {_as_text(name): (_as_text(data_type).lower(), _as_text(column_type)) for name, data_type, column_type in rows}
+
+
+def _summary_ddl(summary, types, customer_col, name_col):
+    """CREATE TABLE statement for a summary table keyed like the source customer column."""
+    data_type, column_type = types.get(customer_col, ('text', None))
+    customer_type = column_type
+    if not column_type or data_type in _UNKEYABLE_TYPES | STRING_TYPES | BINARY_TYPES:
+        customer_type = TEXT_KEY_TYPE
+    data_type, column_type = types.get(name_col, ('text', None)) if name_col else ('text', None)
+    name_type = column_type if column_type and data_type not in _UNNAMEABLE_TYPES else 'TEXT'
+    return (
+        f"CREATE TABLE {_quote_ident(summary)} ("
+        f"customer_id {customer_type} NOT NULL PRIMARY KEY, "
+        f"customer_name {name_type} NULL, "
+        "total_orders INT NOT NULL, "
+        "first_order_date DATETIME(6) NULL, "
+        "last_order_date DATETIME(6) NULL, "
+        "avg_order_gap DOUBLE NULL, "
+        "predicted_next_order_date DATETIME(6) NULL, "
+        "customer_classification VARCHAR(32) NOT NULL, "
+        "churn_flag TINYINT NOT NULL)"
+    )
+
+
+def _ensure_meta_table(connection):
+    _execute(
+        connection,
+        f"CREATE TABLE IF NOT EXISTS {_quote_ident(SUMMARY_META_TABLE)} ("
+        "source_table VARCHAR(64) NOT NULL PRIMARY KEY, "
+        "summary_table VARCHAR(64) NOT NULL, "
+        "date_col VARCHAR(64) NOT NULL, "
+        "customer_col VARCHAR(64) NOT NULL, "
+        "name_col VARCHAR(64) NULL, "
+        "watermark DATETIME(6) NULL, "
+        "source_rows BIGINT NOT NULL, "
+        "refreshed_at DATETIME NOT NULL)"
+    )
+
+
+def read_meta(connection, table_name):
+    """Return the summary bookkeeping row for a source table, or None if it was never materialized."""
+    cursor = connection.cursor()
+    try:
+        cursor.execute(
+            "SELECT summary_table, date_col, customer_col, name_col, watermark, source_rows, refreshed_at "
+            f"FROM {_quote_ident(SUMMARY_META_TABLE)} WHERE source_table = %s",
+            (table_name,)
+        )
+        row = cursor.fetchone()
+    except Exception:
+        # no bookkeeping table yet, or no privilege to read it
+        return None
+    finally:
+        cursor.close()
+    if row is None:
+        return None
+    summary, date_col, customer_col, name_col, watermark, source_rows, refreshed_at = row
+    return {
+        'summary_table': _as_text(summary),
+        'columns': (_as_text(date_col), _as_text(customer_col), None if name_col is None else _as_text(name_col)),
+        'watermark': None if watermark is None else pd.Timestamp(watermark).to_pydatetime(),
+        'source_rows': int(source_rows),
+        'refreshed_at': refreshed_at,
+    }
+
+
+def _write_meta(connection, table_name, summary, columns, watermark, source_rows):
+    date_col, customer_col, name_col = columns
+    _execute(
+        connection,
+        f"REPLACE INTO {_quote_ident(SUMMARY_META_TABLE)} "
+        "(source_table, summary_table, date_col, customer_col, name_col, watermark, source_rows, refreshed_at) "
+        "VALUES (%s, %s, %s, %s, %s, %s, %s, %s)",
+        (table_name, summary, date_col, customer_col, name_col, watermark, source_rows,
+         datetime.now().replace(microsecond=0))
+    )
+
+
+def _drop_summary(connection, table_name):
+    """Drop a source table's summary and its bookkeeping row, if any."""
+    meta = read_meta(connection, table_name)
+    if meta is None:
+        return
+    _execute(connection, f"DROP TABLE IF EXISTS {_quote_ident(meta['summary_table'])}")
+    _execute(connection, f"DELETE FROM {_quote_ident(SUMMARY_META_TABLE)} WHERE source_table = %s", (table_name,))
+    connection.commit()
+
+
+def _summary_rows(records, gaps, indexes):
+    """Summary table rows for ``records[i]`` in ``indexes``.
+
+    Records carry avg_order_gap rounded for display; the summary keeps the
+    exact gap from ``gaps`` so a refresh predicts and segments like a full run.
+    """
+    for i in indexes:
+        row = [records[i][c] for c in SUMMARY_COLUMNS]
+        row[SUMMARY_COLUMNS.index('avg_order_gap')] = None if pd.isna(gaps[i]) else float(gaps[i])
+        yield tuple(row)
+
+
+def _upsert(connection, summary, rows):
+    """Write summary rows with batched REPLACE statements."""
+    statement = (
+        f"REPLACE INTO {_quote_ident(summary)} ({', '.join(SUMMARY_COLUMNS)}) "
+        f"VALUES ({', '.join(['%s'] * len(SUMMARY_COLUMNS))})"
+    )
+    rows = list(rows)
+    cursor = connection.cursor()
+    try:
+        for start in range(0, len(rows), MATERIALIZE_BATCH_ROWS):
+            cursor.executemany(statement, rows[start:start + MATERIALIZE_BATCH_ROWS])
+    finally:
+        cursor.close()
+    connection.commit()
+
+
+def _watermark(records):
+    """Latest last_order_date among JSON-safe records, or None."""
+    dates = [r['last_order_date'] for r in records if r['last_order_date']]
+    return max(pd.Timestamp(d) for d in dates).to_pydatetime() if dates else None
+
+
+def _as_text_key(value):
+    """Decode a TEXT_KEY_TYPE customer id; numeric ids pass through."""
+    return value.decode('utf-8') if isinstance(value, (bytes, bytearray)) else value
+
+
+def _read_summary_frame(connection, summary, customer_id=None):
+    """Load a summary table (or one customer's row) into the per-customer stats frame analytics finalizes."""
+    columns = ('customer_id', 'total_orders', 'first_order_date', 'last_order_date',
+               'customer_name', 'avg_order_gap', 'customer_classification')
+    query = f"SELECT {', '.join(columns)} FROM {_quote_ident(summary)}"
+    params = None
+    if customer_id is not None:
+        query += " WHERE customer_id = %s"
+        params = (customer_id,)
+    df = pd.read_sql(query, connection, params=params)
+    df['customer_id'] = df['customer_id'].map(_as_text_key)
+    for c in ('first_order_date', 'last_order_date'):
+        df[c] = pd.to_datetime(df[c], errors='coerce')
+    df['avg_order_gap'] = df['avg_order_gap'].astype(float)
+    df['customer_name'] = df['customer_name'].astype(object).where(df['customer_name'].notna(), None)
+    return df.sort_values('customer_id', kind='stable', ignore_index=True)
+
+
+def read_summary(connection, table_name, progress=None):
+    """Return the table's records from its summary as of the last refresh, or None without one.
+
+    Nothing is written. Recency and segments are recomputed for the
+    current time, but order stats only include orders up to the last
+    refresh (``refresh_summary``, /api/summary/refresh or the command line).
+    """
+    meta = read_meta(connection, table_name)
+    if meta is None:
+        return None
+    _report(progress, 'loading')
+    df = _read_summary_frame(connection, meta['summary_table'])
+    if df.empty:
+        return []
+    _report(progress, 'classifying')
+    return _finalize_results(df.drop(columns='customer_classification'), progress)
+
+
+def lookup_summary(connection, table_name, customer_id):
+    """Return one customer's records from the table's summary by primary key.
+
+    Recency and segment are recomputed for the current time. Returns None
+    when the table has no summary, and [] when the customer is not in it.
+    """
+    meta = read_meta(connection, table_name)
+    if meta is None:
+        return None
+    df = _read_summary_frame(connection, meta['summary_table'], customer_id)
+    if df.empty:
+        return []
+    return _finalize_results(df.drop(columns='customer_classification'))
+
+
+def build_summary(connection, table_name, engine='auto', progress=None):
+    """Run analytics on the whole table and materialize the result as its summary table.
+
+    The summary is written to a new table and swapped in with one RENAME,
+    so readers never see a half-written summary. Returns the records.
+    Staging tables are named per call, and builds and refreshes of one
+    table are serialized within the process.
+    """
+    with _table_lock(table_name):
+        return _build_summary(connection, table_name, engine, progress)
+
+
+def _build_summary(connection, table_name, engine='auto', progress=None):
+    _report(progress, 'detecting')
+    detected = _detect_sample_columns(connection, table_name)
+    if detected is None:
+        _drop_summary(connection, table_name)
+        return []
+    date_col, customer_col, name_col, native_dates = detected
+    if not native_dates:
+        raise ValueError(f"Materialized summaries require a native DATE/DATETIME column; '{date_col}' is not one.")
+
+    results = _aggregate_table(connection, table_name, engine, progress=progress)
+    if results is None:
+        _drop_summary(connection, table_name)
+        return []
+    gaps = results['avg_order_gap'].to_numpy(dtype=float, copy=True)
+    _report(progress, 'classifying')
+    records = _finalize_results(results, progress)
+
+    _report(progress, 'materializing')
+    summary = summary_table_name(table_name)
+    staging = _staging_name(summary)
+    _ensure_meta_table(connection)
+    _execute(connection, _summary_ddl(staging, _source_column_types(connection, table_name), customer_col, name_col))
+    try:
+        _upsert(connection, staging, _summary_rows(records, gaps, range(len(records))))
+    except Exception:
+        # staging names are never reused, so a failed build cleans up after itself
+        _execute(connection, f"DROP TABLE IF EXISTS {_quote_ident(staging)}")
+        raise
+    if read_meta(connection, table_name) is None:
+        _execute(connection, f"DROP TABLE IF EXISTS {_quote_ident(summary)}")
+        _execute(connection, f"RENAME TABLE {_quote_ident(staging)} TO {_quote_ident(summary)}")
+    else:
+        retired = _staging_name(summary)
+        _execute(connection, f"RENAME TABLE {_quote_ident(summary)} TO {_quote_ident(retired)}, "
+                             f"{_quote_ident(staging)} TO {_quote_ident(summary)}")
+        _execute(connection, f"DROP TABLE {_quote_ident(retired)}")
+
+    watermark = _watermark(records)
+    rows = _rows_up_to(connection, table_name, date_col, customer_col, watermark) if watermark else 0
+    _write_meta(connection, table_name, summary, (date_col, customer_col, name_col), watermark, rows)
+    connection.commit()
+    return records
+
+
+def refresh_summary(connection, table_name, rebuild=False, engine='auto', progress=None):
+    """Bring a table's summary up to date and return ``(records, outcome)``.
+
+    Only customers with orders after the summary's high-water mark are
+    recomputed, from all of their orders, and written back; customers whose
+    segment has drifted since the last refresh are rewritten too. The
+    summary is rebuilt from a full analytics run (``outcome`` 'rebuilt')
+    when ``rebuild`` is set, when there is none yet, when the detected
+    columns changed, or when the row count up to the mark no longer matches
+    (deleted, back-dated or undated rows). Otherwise ``outcome`` is
+    'refreshed', or 'unchanged' when no customer had new orders. Runs
+    under the same per-table lock as ``build_summary``.
+    """
+    with _table_lock(table_name):
+        return _refresh_summary(connection, table_name, rebuild, engine, progress)
+
+
+def _refresh_summary(connection, table_name, rebuild=False, engine='auto', progress=None):
+    meta = None if rebuild else read_meta(connection, table_name)
+    if meta is None or meta['watermark'] is None:
+        return build_summary(connection, table_name, engine=engine, progress=progress), 'rebuilt'
+
+    _report(progress, 'detecting')
+    detected = _detect_sample_columns(connection, table_name)
+    if detected is None or tuple(detected[:3]) != meta['columns']:
+        return build_summary(connection, table_name, engine=engine, progress=progress), 'rebuilt'
+    date_col, customer_col, name_col = meta['columns']
+    covered = _rows_up_to(connection, table_name, date_col, customer_col, meta['watermark'])
+    if covered != meta['source_rows']:
+        return build_summary(connection, table_name, engine=engine, progress=progress), 'rebuilt'
+
+    _report(progress, 'loading')
+    cust = _quote_ident(customer_col)
+    where = (f"{cust} IN (SELECT {cust} FROM {_quote_ident(table_name)} "
+             f"WHERE {_quote_ident(date_col)} > %s)")
+    df = _load_projected(connection, table_name, date_col, customer_col, name_col, where=where,
+                         progress=progress, params=(meta['watermark'],))
+    summary = _read_summary_frame(connection, meta['summary_table'])
+    stored = dict(zip(summary['customer_id'], summary['customer_classification']))
+    summary = summary.drop(columns='customer_classification')
+    changed = set()
+    if not df.empty:
+        _report(progress, 'aggregating', len(df))
+        updated = _aggregate_frame(df, date_col, customer_col, name_col, check_dates=False, progress=progress)
+        changed = set(updated['customer_id'])
+        summary = pd.concat([summary[~summary['customer_id'].isin(changed)], updated], ignore_index=True)
+        summary = summary.sort_values('customer_id', kind='stable', ignore_index=True)
+
+    gaps = summary['avg_order_gap'].to_numpy(dtype=float, copy=True)
+    _report(progress, 'classifying')
+    records = _finalize_results(summary, progress)
+
+    _report(progress, 'materializing')
+    stale = [i for i, r in enumerate(records)
+             if r['customer_id'] in changed or stored.get(r['customer_id']) != r['customer_classification']]
+    _upsert(connection, meta['summary_table'], _summary_rows(records, gaps, stale))
+    if changed:
+        watermark = _watermark(records)
+        rows = _rows_up_to(connection, table_name, date_col, customer_col, watermark)
+        _write_meta(connection, table_name, meta['summary_table'], meta['columns'], watermark, rows)
+        connection.commit()
+    return records, 'refreshed' if changed else 'unchanged'
+
+
+def main():
+    """Command-line refresh: ``python materialize.py --host ... --user ... --schema ... TABLE``."""
+    parser = argparse.ArgumentParser(description="Build or refresh a table's materialized customer summary.")
+    parser.add_argument('table')
+    parser.add_argument('--host', default='localhost')
+    parser.add_argument('--port', type=int, default=3306)
+    parser.add_argument('--user', required=True)
+    parser.add_argument('--schema', required=True)
+    parser.add_argument('--rebuild', action='store_true', help='recompute every customer')
+    args = parser.parse_args()
+
+    from db_connector import connect_to_db
+
+    password = os.environ.get('NYLA_DB_PASSWORD') or getpass.getpass('MySQL password: ')
+    connection = connect_to_db(args.host, args.port, args.user, password, args.schema)
+    if connection is None:
+        raise SystemExit(1)
+    try:
+        records, outcome = refresh_summary(connection, args.table, rebuild=args.rebuild)
+    finally:
+        connection.close()
+    print(f"{args.table}: {outcome}, {len(records)} customers in {summary_table_name(args.table)}")
+
+
+if __name__ == '__main__':
+    main()
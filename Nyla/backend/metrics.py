@@ -0,0 +1,150 @@
+import threading
+import time
+
+
+# histogram bucket upper bounds in seconds
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60, 120, 300)
+# prefix of every exported metric name
+METRIC_PREFIX = 'nyla_'
+
+_HELP = {
+    'http_request_duration_seconds': ('histogram', 'Time to handle an HTTP request, by endpoint and table.'),
+    'http_requests_total': ('counter', 'HTTP requests handled, by endpoint and status.'),
+    'analytics_phase_seconds': ('histogram', 'Time spent in each analytics phase, by table.'),
+    'analytics_runs_total': ('counter', 'Analytics runs, by table and whether the cache answered.'),
+    'analytics_rows_total': ('counter', 'Source rows read by analytics runs, by table.'),
+}
+
+
+class PhaseTimer:
+    """Times the phases of one analytics run.
+
+    Pass ``timer.wrap(progress)`` to the engine as its progress callback:
+    each report of a new phase ends the previous one. ``phases()`` returns
+    seconds per phase in the order they first ran.
+    """
+
+    def __init__(self):
+        self._durations = {}
+        self._phase = None
+        self._started = None
+        self.rows = None
+
+    def mark(self, phase, rows=None):
+        """Start ``phase`` (ending the current one); repeated reports of a phase keep it running."""
+        now = time.perf_counter()
+        if rows is not None:
+            self.rows = rows
+        if phase == self._phase:
+            return
+        self._close(now)
+        self._phase = phase
+        self._started = now
+
+    def stop(self):
+        """End the current phase."""
+        self._close(time.perf_counter())
+        self._phase = None
+
+    def _close(self, now):
+        if self._phase is not None:
+            self._durations[self._phase] = self._durations.get(self._phase, 0.0) + now - self._started
+
+    def wrap(self, progress=None):
+        """Return a progress callback that times phases, then forwards to ``progress``."""
+        def report(phase, rows=None):
+            self.mark(phase, rows)
+            if progress is not None:
+                progress(phase, rows)
+        return report
+
+    def phases(self):
+        return dict(self._durations)
+
+    def server_timing(self):
+        """The phases as a Server-Timing header value (milliseconds)."""
+        return ', '.join(f"{phase};dur={seconds * 1000:.1f}" for phase, seconds in self._durations.items())
+
+
+class _Histogram:
+    def __init__(self, buckets):
+        self.counts = [0] * len(buckets)
+        self.sum = 0.0
+        self.count = 0
+
+
+class Metrics:
+    """Thread-safe counters and latency histograms exported in Prometheus text format."""
+
+    def __init__(self, buckets=LATENCY_BUCKETS):
+        self.buckets = tuple(buckets)
+        self._counters = {}
+        self._histograms = {}
+        self._lock = threading.Lock()
+
+    def inc(self, name, labels, value=1):
+        """Add ``value`` to the counter ``name`` with the given labels."""
+        key = (name, tuple(sorted(labels.items())))
+        with self._lock:
+            self._counters[key] = self._counters.get(key, 0) + value
+
+    def observe(self, name, labels, seconds):
+        """Record one duration in the histogram ``name`` with the given labels."""
+        key = (name, tuple(sorted(labels.items())))
+        with self._lock:
+            histogram = self._histograms.get(key)
+            if histogram is None:
+                histogram = self._histograms[key] = _Histogram(self.buckets)
+            for i, bound in enumerate(self.buckets):
+                if seconds <= bound:
+                    histogram.counts[i] += 1
+            histogram.sum += seconds
+            histogram.count += 1
+
+    def observe_run(self, table, timer, cached):
+        """Record a finished analytics run timed by ``timer``."""
+        for phase, seconds in timer.phases().items():
+            self.observe('analytics_phase_seconds', {'table': table, 'phase': phase}, seconds)
+        self.inc('analytics_runs_total', {'table': table, 'cached': 'true' if cached else 'false'})
+        if timer.rows and not cached:
+            self.inc('analytics_rows_total', {'table': table}, timer.rows)
+
+    def render(self):
+        """Return all metrics in the Prometheus text exposition format."""
+        with self._lock:
+            counters = dict(self._counters)
+            histograms = {
+                key: (list(h.counts), h.sum, h.count) for key, h in self._histograms.items()
+            }
+        lines = []
+        for name in sorted({key[0] for key in counters} | {key[0] for key in histograms}):
+            kind, help_text = _HELP.get(name, ('untyped', name))
+            full = METRIC_PREFIX + name
+            lines.append(f"# HELP {full} {help_text}")
+            lines.append(f"# TYPE {full} {kind}")
+            for (metric, labels), value in sorted(counters.items()):
+                if metric == name:
+                    lines.append(f"{full}{_labels(labels)} {value}")
+            for (metric, labels), (counts, total, count) in sorted(histograms.items()):
+                if metric != name:
+                    continue
+                for bound, bucket_count in zip(self.buckets, counts):
+                    lines.append(f"{full}_bucket{_labels(labels + (('le', _number(bound)),))} {bucket_count}")
+                lines.append(f"{full}_bucket{_labels(labels + (('le', '+Inf'),))} {count}")
+                lines.append(f"{full}_sum{_labels(labels)} {total}")
+                lines.append(f"{full}_count{_labels(labels)} {count}")
+        return '\n'.join(lines) + '\n'
+
+
+def _number(value):
+    return repr(float(value))
+
+
+def _labels(labels):
+    if not labels:
+        return ''
+    escaped = (
+        (name, str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n'))
+        for name, value in labels
+    )
+    return '{' + ','.join(f'{name}="{value}"' for name, value in escaped) + '}'
@@ -0,0 +1,195 @@
+import multiprocessing
+import os
+import threading
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from concurrent.futures.process import BrokenProcessPool
+
+import mysql.connector
+import pandas as pd
+
+from analytics import (
+    ENGINES,
+    _aggregate_frame,
+    _detect_sample_columns,
+    _finalize_results,
+    _load_projected,
+    _quote_ident,
+    _report,
+    perform_analytics,
+)
+
+
+# worker processes used when a request doesn't say, and the most a request may ask for
+PARALLEL_WORKERS = max(1, min(8, os.cpu_count() or 1))
+# tables with fewer rows than this run single-process; start-up would dominate
+PARALLEL_MIN_ROWS = 200000
+
+_executor_instance = None
+_executor_lock = threading.Lock()
+
+
+def parse_engine(value):
+    """Return a requested engine name, 'auto' when not given.
+
+    Raises ValueError unless it is one of ``analytics.ENGINES`` or 'parallel'.
+    """
+    engine = 'auto' if value is None else value
+    if engine != 'parallel' and engine not in ENGINES:
+        raise ValueError(f"Unknown analytics engine {engine!r}; expected one of {', '.join(ENGINES)}, parallel")
+    return engine
+
+
+def parse_workers(value):
+    """Return a requested worker count capped at PARALLEL_WORKERS, or None when not given.
+
+    Raises ValueError unless ``value`` is a positive whole number (or its
+    string form).
+    """
+    if value is None:
+        return None
+    try:
+        if isinstance(value, bool) or not isinstance(value, (int, str)):
+            raise ValueError
+        workers = int(value)
+    except ValueError:
+        raise ValueError(f"workers must be a positive whole number, not {value!r}") from None
+    if workers < 1:
+        raise ValueError(f"workers must be a positive whole number, not {value!r}")
+    return min(workers, PARALLEL_WORKERS)
+
+
+def _executor():
+    """Return the process pool of PARALLEL_WORKERS processes that every parallel run shares.
+
+    Workers are spawned rather than forked because the server is
+    multi-threaded, and forking a threaded process can deadlock the child.
+    """
+    global _executor_instance
+    with _executor_lock:
+        if _executor_instance is None:
+            _executor_instance = ProcessPoolExecutor(max_workers=PARALLEL_WORKERS,
+                                                     mp_context=multiprocessing.get_context('spawn'))
+        return _executor_instance
+
+
+def _discard_executor(executor):
+    global _executor_instance
+    with _executor_lock:
+        if _executor_instance is executor:
+            _executor_instance = None
+    executor.shutdown(wait=False, cancel_futures=True)
+
+
+def _estimate_rows(connection, table_name):
+    """Return the approximate row count from information_schema, falling back to COUNT(*)."""
+    cursor = connection.cursor()
+    try:
+        cursor.execute(
+            "SELECT TABLE_ROWS FROM information_schema.TABLES "
+            "WHERE TABLE_SCHEMA = DATABASE() AND TABLE_NAME = %s",
+            (table_name,)
+        )
+        row = cursor.fetchone()
+        if row and row[0] is not None:
+            return int(row[0])
+    except Exception:
+        pass
+    finally:
+        cursor.close()
+    cursor = connection.cursor()
+    cursor.execute(f"SELECT COUNT(*) FROM {_quote_ident(table_name)}")
+    count = cursor.fetchone()[0]
+    cursor.close()
+    return int(count)
+
+
+def _aggregate_sql_shard(connect_params, table_name, date_col, customer_col, name_col, shards, shard):
+    """Fetch and aggregate one hash shard of customers on its own connection.
+
+    Runs in a worker process; returns ``(per-customer frame, rows read)``.
+    """
+    connection = mysql.connector.connect(**connect_params)
+    try:
+        where = f"MOD(CRC32({_quote_ident(customer_col)}), {int(shards)}) = {int(shard)}"
+        df = _load_projected(connection, table_name, date_col, customer_col, name_col, where=where)
+    finally:
+        connection.close()
+    if df.empty:
+        return None, 0
+    return _aggregate_frame(df, date_col, customer_col, name_col, check_dates=False), len(df)
+
+
+def _aggregate_frame_shard(df, date_col, customer_col, name_col):
+    """Aggregate one in-memory shard; runs in a worker process."""
+    return _aggregate_frame(df, date_col, customer_col, name_col, check_dates=False), len(df)
+
+
+def perform_parallel_analytics(connection, table_name, workers=None, connect_params=None,
+                               min_rows=PARALLEL_MIN_ROWS, progress=None):
+    """Perform customer analytics with customers sharded across worker processes.
+
+    Customers are partitioned by a hash of their id, so each customer's
+    orders land in exactly one shard and shard results can simply be
+    concatenated. With ``connect_params`` (MySQL connection keyword
+    arguments) every worker fetches its own shard with
+    ``WHERE MOD(CRC32(customer), N) = k``; otherwise the projected table is
+    loaded once and split in memory. Tables under ``min_rows`` rows, or a
+    single worker, fall back to the single-process pandas engine.
+    ``workers`` is capped at PARALLEL_WORKERS, the size of the shared pool.
+    """
+    workers = PARALLEL_WORKERS if workers is None else parse_workers(workers)
+    if workers == 1 or _estimate_rows(connection, table_name) < min_rows:
+        return perform_analytics(connection, table_name, engine='pandas', progress=progress)
+
+    _report(progress, 'detecting')
+    detected = _detect_sample_columns(connection, table_name)
+    if detected is None:
+        return []
+    date_col, customer_col, name_col, _ = detected
+
+    executor = _executor()
+    try:
+        if connect_params:
+            _report(progress, 'loading')
+            futures = [
+                executor.submit(_aggregate_sql_shard, connect_params, table_name,
+                                date_col, customer_col, name_col, workers, shard)
+                for shard in range(workers)
+            ]
+        else:
+            _report(progress, 'loading')
+            df = _load_projected(connection, table_name, date_col, customer_col, name_col, progress=progress)
+            if df.empty:
+                return []
+            _report(progress, 'aggregating', len(df))
+            shard_of = pd.util.hash_pandas_object(df[customer_col], index=False) % workers
+            futures = [
+                executor.submit(_aggregate_frame_shard, df[shard_of.to_numpy() == shard],
+                                date_col, customer_col, name_col)
+                for shard in range(workers)
+            ]
+
+        parts = []
+        rows = 0
+        try:
+            for future in as_completed(futures):
+                part, shard_rows = future.result()
+                rows += shard_rows
+                _report(progress, 'aggregating', rows)
+                if part is not None and not part.empty:
+                    parts.append(part)
+        finally:
+            for future in futures:
+                future.cancel()
+    except BrokenProcessPool:
+        _discard_executor(executor)
+        raise
+
+    if not parts:
+        return []
+    results = pd.concat(parts, ignore_index=True).sort_values('customer_id', kind='stable', ignore_index=True)
+    if results['last_order_date'].isna().all():
+        raise ValueError(f"Detected date column '{date_col}' could not be parsed as dates.")
+
+    _report(progress, 'classifying')
+    return _finalize_results(results, progress)
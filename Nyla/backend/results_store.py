@@ -0,0 +1,215 @@
+import bisect
+import re
+import threading
+from collections import OrderedDict
+
+import numpy as np
+
+
+# result sets kept server-side for paging, least recently used dropped first
+RESULT_SETS_MAX = 16
+# distinct searches whose match masks are remembered per result set
+SEARCH_CACHE_SIZE = 32
+# largest page a client may request
+MAX_PAGE_SIZE = 1000
+
+
+class ResultSet:
+    """Analytics records with lazily built indexes for paging, sorting and search.
+
+    Sort orders are computed once per column, segment and churn masks once
+    per result set, and search runs over a single lower-cased haystack of
+    ``name<TAB>id`` lines (substring) or sorted key lists (prefix). Point
+    lookups use hash indexes on the id and on the normalized name, built
+    up front so no lookup pays for a scan of the records.
+    ``partial`` marks records holding only some columns (a light analysis).
+    """
+
+    def __init__(self, records, partial=False):
+        self.records = records
+        self.partial = partial
+        self._lock = threading.Lock()
+        self._orders = {}
+        self._segments = None
+        self._churn = None
+        self._haystack = None
+        self._line_starts = None
+        self._prefix_keys = None
+        self._searches = OrderedDict()
+        self._by_id = dict(zip((normalize_id(r.get('customer_id')) for r in records), range(len(records))))
+        self._by_name = {}
+        for i, value in enumerate(r.get('customer_name') for r in records):
+            if value is not None:
+                self._by_name.setdefault(normalize_name(value), []).append(i)
+
+    def __len__(self):
+        return len(self.records)
+
+    def query(self, offset=0, limit=100, sort=None, descending=False, segment=None,
+              churn=None, search=None, match='substring'):
+        """Return one page of records plus the total number of matches."""
+        limit = max(0, min(int(limit), MAX_PAGE_SIZE))
+        offset = max(0, int(offset))
+        with self._lock:
+            mask = np.ones(len(self.records), dtype=bool)
+            if segment:
+                mask &= self._segment_mask(segment)
+            if churn is not None:
+                mask &= self._churn_flags() == int(churn)
+            if search:
+                mask &= self._search_mask(search.lower(), match)
+
+            order = self._order(sort, descending) if sort else np.arange(len(self.records))
+            matches = order[mask[order]]
+        page = [self.records[i] for i in matches[offset:offset + limit]]
+        return {'total': int(len(matches)), 'offset': offset, 'limit': limit, 'rows': page}
+
+    def lookup(self, customer_id=None, name=None):
+        """Return the records for a customer id, or for every customer with this name."""
+        # the indexes are never modified, so lookups don't wait for paging queries
+        if customer_id is not None:
+            found = self._by_id.get(normalize_id(customer_id))
+            matches = [] if found is None else [found]
+        else:
+            matches = self._by_name.get(normalize_name(name), [])
+        return [self.records[i] for i in matches]
+
+    def _order(self, column, descending):
+        key = (column, descending)
+        if key not in self._orders:
+            values = [r.get(column) for r in self.records]
+            present = [i for i, v in enumerate(values) if v is not None]
+            missing = [i for i, v in enumerate(values) if v is None]
+            try:
+                present.sort(key=values.__getitem__, reverse=descending)
+            except TypeError:
+                present.sort(key=lambda i: str(values[i]), reverse=descending)
+            # missing values go last in either direction
+            self._orders[key] = np.array(present + missing, dtype=np.int64)
+        return self._orders[key]
+
+    def _segment_mask(self, segment):
+        if self._segments is None:
+            labels = np.array([str(r.get('customer_classification')).lower() for r in self.records], dtype=object)
+            self._segments = {label: labels == label for label in set(labels)}
+        return self._segments.get(segment.lower(), np.zeros(len(self.records), dtype=bool))
+
+    def _churn_flags(self):
+        if self._churn is None:
+            self._churn = np.array([r.get('churn_flag') or 0 for r in self.records], dtype=np.int8)
+        return self._churn
+
+    def _search_mask(self, term, match):
+        key = (term, match)
+        if key in self._searches:
+            self._searches.move_to_end(key)
+            return self._searches[key]
+        if match == 'prefix':
+            mask = self._prefix_mask(term)
+        else:
+            mask = self._substring_mask(term)
+        self._searches[key] = mask
+        if len(self._searches) > SEARCH_CACHE_SIZE:
+            self._searches.popitem(last=False)
+        return mask
+
+    def _substring_mask(self, term):
+        if self._haystack is None:
+            lines = [
+                f"{_search_text(r.get('customer_name'))}\t{_search_text(r.get('customer_id'))}"
+                for r in self.records
+            ]
+            starts = []
+            position = 0
+            for line in lines:
+                starts.append(position)
+                position += len(line) + 1
+            self._haystack = '\n'.join(lines)
+            self._line_starts = starts
+        mask = np.zeros(len(self.records), dtype=bool)
+        if '\n' in term or '\t' in term:
+            return mask
+        for found in re.finditer(re.escape(term), self._haystack):
+            mask[bisect.bisect_right(self._line_starts, found.start()) - 1] = True
+        return mask
+
+    def _prefix_mask(self, term):
+        if self._prefix_keys is None:
+            keys = []
+            for i, r in enumerate(self.records):
+                keys.append((_search_text(r.get('customer_name')), i))
+                keys.append((_search_text(r.get('customer_id')), i))
+            keys.sort()
+            self._prefix_keys = keys
+        mask = np.zeros(len(self.records), dtype=bool)
+        start = bisect.bisect_left(self._prefix_keys, (term, -1))
+        for key, i in self._prefix_keys[start:]:
+            if not key.startswith(term):
+                break
+            mask[i] = True
+        return mask
+
+
+def normalize_id(value):
+    """Text key for an id lookup; whole floats (ids read from nullable integer columns) drop their '.0'."""
+    if isinstance(value, float) and value.is_integer():
+        return str(int(value))
+    return str(value)
+
+
+def normalize_name(value):
+    """Case-folded name with runs of whitespace collapsed, for name lookups."""
+    return ' '.join(str(value).split()).casefold()
+
+
+def _search_text(value):
+    """Lower-cased text used for searching a name or id, with separators removed."""
+    if value is None:
+        return ''
+    return str(value).lower().replace('\n', ' ').replace('\t', ' ')
+
+
+def _keeps(existing, records, partial):
+    """Return True if ``existing`` should stay in place of a new set of ``records``."""
+    return existing is not None and (existing.records is records or (partial and not existing.partial))
+
+
+class ResultStore:
+    """The latest analytics results per (server, schema, table), for paging."""
+
+    def __init__(self, max_sets=RESULT_SETS_MAX):
+        self.max_sets = max_sets
+        self._sets = OrderedDict()
+        self._lock = threading.Lock()
+
+    def put(self, key, records, partial=False):
+        """Store records for a table, keeping existing indexes if they are unchanged.
+
+        ``partial`` records (a light analysis) never replace a full set, which
+        paging and point lookups need all columns of.
+        """
+        with self._lock:
+            existing = self._sets.get(key)
+            if _keeps(existing, records, partial):
+                self._sets.move_to_end(key)
+                return existing
+        # the lookup indexes are built here, outside the lock, rather than by the first lookup
+        result_set = ResultSet(records, partial)
+        with self._lock:
+            existing = self._sets.get(key)
+            # another run may have stored its set meanwhile
+            if _keeps(existing, records, partial):
+                return existing
+            self._sets[key] = result_set
+            self._sets.move_to_end(key)
+            while len(self._sets) > self.max_sets:
+                self._sets.popitem(last=False)
+            return result_set
+
+    def get(self, key):
+        """Return the stored result set for a table, or None."""
+        with self._lock:
+            result_set = self._sets.get(key)
+            if result_set is not None:
+                self._sets.move_to_end(key)
+            return result_set
@@ -0,0 +1,217 @@
+import hashlib
+import json
+import os
+import shutil
+import tempfile
+import threading
+import time
+
+import numpy as np
+import pandas as pd
+
+
+# where projected source columns are snapshotted between runs
+SNAPSHOT_DIR = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'state', 'snapshots')
+# upper bound on the size of all snapshots on disk
+SNAPSHOT_MAX_BYTES = 2 * 1024 * 1024 * 1024
+# bump when the on-disk layout changes so old snapshots are ignored
+SNAPSHOT_VERSION = 1
+
+
+def _save_column(directory, index, values):
+    """Write one column as .npy files and return its description.
+
+    Datetimes, numbers and categorical codes are stored as plain arrays that
+    load memory-mapped; string categories as a fixed-width unicode array.
+    Anything else (mixed objects) falls back to a pickled array.
+    """
+    base = os.path.join(directory, str(index))
+    if isinstance(values.dtype, pd.CategoricalDtype):
+        np.save(base + '.codes.npy', values.cat.codes.to_numpy())
+        np.save(base + '.categories.npy', np.asarray(values.cat.categories, dtype=str))
+        return {'kind': 'category'}
+    if pd.api.types.is_datetime64_any_dtype(values) and getattr(values.dtype, 'tz', None) is None:
+        np.save(base + '.npy', values.to_numpy(dtype='datetime64[ns]'))
+        return {'kind': 'datetime'}
+    if pd.api.types.is_numeric_dtype(values) and not pd.api.types.is_extension_array_dtype(values):
+        np.save(base + '.npy', values.to_numpy())
+        return {'kind': 'array'}
+    np.save(base + '.npy', values.to_numpy(dtype=object), allow_pickle=True)
+    return {'kind': 'object'}
+
+
+def _load_column(directory, index, kind):
+    base = os.path.join(directory, str(index))
+    if kind == 'category':
+        codes = np.load(base + '.codes.npy', mmap_mode='r')
+        categories = np.load(base + '.categories.npy').astype(object)
+        return pd.Categorical.from_codes(codes, categories=categories)
+    if kind == 'object':
+        return np.load(base + '.npy', allow_pickle=True)
+    return np.load(base + '.npy', mmap_mode='r')
+
+
+def _directory_bytes(directory):
+    return sum(entry.stat().st_size for entry in os.scandir(directory) if entry.is_file())
+
+
+class SnapshotCache:
+    """On-disk snapshots of projected source columns, memory-mapped on load.
+
+    Entries are keyed by ``(server, schema, table)`` and carry the table
+    fingerprint they were taken at; a lookup with a different fingerprint
+    is a miss and removes the stale snapshot. Least recently used snapshots
+    are evicted once the total exceeds ``max_bytes``. Each snapshot is a
+    directory of ``.npy`` files plus ``meta.json``, written to a temporary
+    directory and renamed into place.
+    """
+
+    def __init__(self, directory=None, max_bytes=SNAPSHOT_MAX_BYTES):
+        self.directory = directory or SNAPSHOT_DIR
+        self.max_bytes = max_bytes
+        self.hits = 0
+        self.misses = 0
+        self._entries = None
+        self._lock = threading.Lock()
+
+    def _path(self, key):
+        return os.path.join(self.directory, hashlib.sha1(repr(tuple(key)).encode('utf-8')).hexdigest())
+
+    def _index(self):
+        """Entries by key, read from disk on first use so snapshots survive restarts."""
+        if self._entries is None:
+            self._entries = {}
+            if os.path.isdir(self.directory):
+                for entry in os.scandir(self.directory):
+                    if entry.name.startswith('.'):
+                        # staging directory left by an interrupted write
+                        shutil.rmtree(entry.path, ignore_errors=True)
+                        continue
+                    try:
+                        with open(os.path.join(entry.path, 'meta.json')) as f:
+                            meta = json.load(f)
+                    except (OSError, ValueError):
+                        continue
+                    if meta.get('version') == SNAPSHOT_VERSION:
+                        meta['key'] = tuple(meta['key'])
+                        self._entries[meta['key']] = meta
+        return self._entries
+
+    def get(self, key, fingerprint, columns):
+        """Return the snapshot frame for ``key`` if taken at ``fingerprint`` with ``columns``, else None."""
+        key = tuple(key)
+        with self._lock:
+            meta = self._index().get(key)
+            if meta is None or fingerprint is None or meta['fingerprint'] != fingerprint \
+                    or not set(columns) <= set(c['name'] for c in meta['columns']):
+                if meta is not None and fingerprint is not None and meta['fingerprint'] != fingerprint:
+                    self._remove(key)
+                self.misses += 1
+                return None
+            meta['last_used'] = time.time()
+            self.hits += 1
+        path = self._path(key)
+        try:
+            data = {c['name']: _load_column(path, i, c['kind']) for i, c in enumerate(meta['columns'])}
+        except OSError as e:
+            print(f"Ignoring unreadable snapshot {path}: {e}")
+            with self._lock:
+                self._remove(key)
+            return None
+        return pd.DataFrame(data, copy=False)[list(columns)]
+
+    def put(self, key, fingerprint, df):
+        """Snapshot ``df`` for ``key``, evicting least recently used snapshots as needed."""
+        if fingerprint is None:
+            return
+        key = tuple(key)
+        with self._lock:
+            # the first index read removes staging directories, so it must not see this one
+            self._index()
+        os.makedirs(self.directory, exist_ok=True)
+        staging = tempfile.mkdtemp(dir=self.directory, prefix='.tmp-')
+        try:
+            columns = []
+            for i, name in enumerate(df.columns):
+                columns.append({'name': name, **_save_column(staging, i, df[name])})
+            meta = {
+                'version': SNAPSHOT_VERSION,
+                'key': list(key),
+                'fingerprint': fingerprint,
+                'columns': columns,
+                'rows': len(df),
+                'bytes': _directory_bytes(staging),
+                'last_used': time.time(),
+            }
+            with open(os.path.join(staging, 'meta.json'), 'w') as f:
+                json.dump(meta, f)
+        except Exception:
+            shutil.rmtree(staging, ignore_errors=True)
+            raise
+        if meta['bytes'] > self.max_bytes:
+            shutil.rmtree(staging, ignore_errors=True)
+            return
+        meta['key'] = key
+        with self._lock:
+            if key in self._index():
+                self._remove(key)
+            os.replace(staging, self._path(key))
+            self._entries[key] = meta
+            total = sum(m['bytes'] for m in self._entries.values())
+            for old in sorted(self._entries.values(), key=lambda m: m['last_used']):
+                if total <= self.max_bytes:
+                    break
+                total -= old['bytes']
+                self._remove(old['key'])
+
+    def bind(self, key, fingerprint):
+        """Return a handle for one table at one fingerprint, as ``perform_analytics`` takes it."""
+        return TableSnapshot(self, key, fingerprint)
+
+    def invalidate(self, server=None, schema=None, table=None):
+        """Remove snapshots matching the given server, schema and table; all if none given."""
+        with self._lock:
+            removed = 0
+            for key in list(self._index()):
+                key_server, key_schema, key_table = key
+                if server is not None and key_server != server:
+                    continue
+                if schema is not None and key_schema != schema:
+                    continue
+                if table is not None and key_table != table:
+                    continue
+                self._remove(key)
+                removed += 1
+            return removed
+
+    def stats(self):
+        """Return hit/miss counters and current size."""
+        with self._lock:
+            entries = self._index()
+            return {
+                'hits': self.hits,
+                'misses': self.misses,
+                'entries': len(entries),
+                'bytes': sum(m['bytes'] for m in entries.values()),
+                'max_bytes': self.max_bytes,
+            }
+
+    def _remove(self, key):
+        self._index().pop(key, None)
+        # open memory maps keep working on POSIX; elsewhere the directory is left for the next eviction
+        shutil.rmtree(self._path(key), ignore_errors=True)
+
+
+class TableSnapshot:
+    """One table's snapshot at a given fingerprint; see ``SnapshotCache.bind``."""
+
+    def __init__(self, cache, key, fingerprint):
+        self.cache = cache
+        self.key = key
+        self.fingerprint = fingerprint
+
+    def load(self, columns):
+        return self.cache.get(self.key, self.fingerprint, columns)
+
+    def save(self, df):
+        self.cache.put(self.key, self.fingerprint, df)
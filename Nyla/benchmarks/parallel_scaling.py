@@ -0,0 +1,48 @@
+"""Time the parallel analytics engine against worker count.
+
+Builds a synthetic orders table in a temporary SQLite file and runs
+``perform_parallel_analytics`` (in-memory split, as the stand-in pool has
+no connection parameters for workers) with 1, 2, 4 and 8 workers, up to
+``PARALLEL_WORKERS``, printing wall time and speed-up.
+
+    python Nyla/benchmarks/parallel_scaling.py [rows] [customers]
+"""
+import os
+import sys
+import tempfile
+import time
+
+BENCH_DIR = os.path.dirname(os.path.abspath(__file__))
+sys.path.insert(0, BENCH_DIR)
+sys.path.insert(0, os.path.join(os.path.dirname(BENCH_DIR), 'backend'))
+
+from parallel import PARALLEL_WORKERS, perform_parallel_analytics
+from standin import StandinConnection
+from synthetic import build_sqlite
+
+
+WORKER_COUNTS = (1, 2, 4, 8)
+
+
+def main():
+    rows = int(sys.argv[1]) if len(sys.argv) > 1 else 1000000
+    customers = int(sys.argv[2]) if len(sys.argv) > 2 else rows // 20
+    with tempfile.TemporaryDirectory() as tmp:
+        path = os.path.join(tmp, 'orders.db')
+        build_sqlite(path, customers, max(1, rows // customers))
+        connection = StandinConnection(path)
+        print(f"{rows} rows, {customers} customers, {os.cpu_count()} CPUs")
+        baseline = None
+        for workers in (w for w in WORKER_COUNTS if w <= PARALLEL_WORKERS):
+            # one untimed run per worker count so process start-up isn't measured
+            perform_parallel_analytics(connection, 'orders', workers=workers, min_rows=0)
+            started = time.perf_counter()
+            perform_parallel_analytics(connection, 'orders', workers=workers, min_rows=0)
+            elapsed = time.perf_counter() - started
+            baseline = baseline or elapsed
+            print(f"workers={workers}: {elapsed:.2f}s  speed-up x{baseline / elapsed:.2f}")
+        connection.close()
+
+
+if __name__ == '__main__':
+    main()
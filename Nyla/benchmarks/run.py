@@ -0,0 +1,207 @@
+"""Timed analytics benchmarks against a SQLite stand-in.
+
+Each scenario builds a synthetic order table (see ``synthetic.py``) and
+times every target on it in a fresh process, so peak RSS is per run:
+
+- ``pandas``, ``stream``, ``auto`` - ``perform_analytics`` with that engine
+- ``parallel`` - ``perform_parallel_analytics`` (in-memory split)
+- ``http`` - ``POST /api/analytics`` through the real request handler
+
+Wall time, peak RSS and rows per second are written as JSON, and
+``--baseline`` prints the change against an earlier results file.
+
+    python Nyla/benchmarks/run.py --scenarios 10k,1m --targets pandas,stream,http
+"""
+import argparse
+import json
+import os
+import platform
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+import urllib.request
+
+BENCH_DIR = os.path.dirname(os.path.abspath(__file__))
+sys.path.insert(0, BENCH_DIR)
+sys.path.insert(0, os.path.join(os.path.dirname(BENCH_DIR), 'backend'))
+
+from synthetic import build_sqlite
+
+
+# rows = customers * orders_per_customer
+SCENARIOS = {
+    '10k': {'customers': 500, 'orders_per_customer': 20},
+    '1m': {'customers': 50000, 'orders_per_customer': 20},
+    '10m': {'customers': 500000, 'orders_per_customer': 20},
+}
+TARGETS = ('pandas', 'stream', 'auto', 'parallel', 'http')
+DEFAULT_TARGETS = ('pandas', 'stream', 'http')
+RESULTS_DIR = os.path.join(BENCH_DIR, 'results')
+
+
+def _peak_rss_bytes():
+    """Peak resident set size of this process, or None where unavailable."""
+    try:
+        import resource
+    except ImportError:
+        return None
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # kilobytes on Linux, bytes on macOS
+    return peak if sys.platform == 'darwin' else peak * 1024
+
+
+def _run_http(app, pool, table):
+    app.current_pool, app.current_schema, app.current_server = pool, 'benchmark', 'standin'
+    server = app.ThreadingServer(('127.0.0.1', 0), app.DataAnalyticsHandler)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    try:
+        request = urllib.request.Request(
+            f"http://127.0.0.1:{server.server_address[1]}/api/analytics",
+            data=json.dumps({'table': table}).encode('utf-8'),
+            headers={'Content-Type': 'application/json'},
+        )
+        with urllib.request.urlopen(request) as response:
+            body = json.loads(response.read())
+        return len(body['data'])
+    finally:
+        server.shutdown()
+        server.server_close()
+
+
+def run_target(target, db_path, table='orders'):
+    """Time one target on one database; runs in the child process."""
+    # imports stay outside the timed region
+    import app
+    from analytics import perform_analytics
+    from parallel import perform_parallel_analytics
+    from standin import StandinPool
+
+    app.load_backend()
+    pool = StandinPool(db_path)
+    started = time.perf_counter()
+    if target == 'http':
+        customers = _run_http(app, pool, table)
+    else:
+        with pool.connection() as connection:
+            if target == 'parallel':
+                results = perform_parallel_analytics(connection, table, min_rows=0)
+            else:
+                results = perform_analytics(connection, table, engine=target)
+        customers = len(results)
+    return {'wall_seconds': time.perf_counter() - started, 'customers': customers,
+            'peak_rss_bytes': _peak_rss_bytes()}
+
+
+def _child(target, db_path):
+    # keep the handler's request logging out of the result line
+    real_stdout = sys.stdout
+    sys.stdout = sys.stderr
+    try:
+        result = run_target(target, db_path)
+    finally:
+        sys.stdout = real_stdout
+    print(json.dumps(result))
+
+
+def _spawn(target, db_path):
+    completed = subprocess.run(
+        [sys.executable, os.path.abspath(__file__), '--child', target, db_path],
+        capture_output=True, text=True,
+    )
+    if completed.returncode != 0:
+        return {'error': completed.stderr.strip().splitlines()[-1] if completed.stderr.strip() else 'failed'}
+    return json.loads(completed.stdout.strip().splitlines()[-1])
+
+
+def _environment():
+    import numpy
+    import pandas
+    return {
+        'python': platform.python_version(),
+        'pandas': pandas.__version__,
+        'numpy': numpy.__version__,
+        'platform': platform.platform(),
+        'cpus': os.cpu_count(),
+    }
+
+
+def compare(results, baseline):
+    """Print wall-time and peak-RSS ratios against a baseline results dict."""
+    previous = {(r['scenario'], r['target']): r for r in baseline.get('results', [])}
+    for r in results['results']:
+        before = previous.get((r['scenario'], r['target']))
+        if before is None or 'error' in r or 'error' in before:
+            continue
+        line = f"{r['scenario']:>4} {r['target']:<9} time x{r['wall_seconds'] / before['wall_seconds']:.2f}"
+        if r.get('peak_rss_bytes') and before.get('peak_rss_bytes'):
+            line += f"  rss x{r['peak_rss_bytes'] / before['peak_rss_bytes']:.2f}"
+        print(line)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--scenarios', default=','.join(SCENARIOS), help='comma-separated, from ' + ', '.join(SCENARIOS))
+    parser.add_argument('--targets', default=','.join(DEFAULT_TARGETS), help='comma-separated, from ' + ', '.join(TARGETS))
+    parser.add_argument('--skew', type=float, default=1.0, help='Zipf exponent of orders per customer (0 = uniform)')
+    parser.add_argument('--null-rate', type=float, default=0.01, help='share of blank ids, names and dates')
+    parser.add_argument('--naming', default='snake', help='column naming style (see synthetic.COLUMN_STYLES)')
+    parser.add_argument('--date-type', default='datetime', help="'datetime' or 'text' (the stream target needs 'datetime')")
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--data-dir', help='keep generated databases here instead of a temporary directory')
+    parser.add_argument('--output', help='results file (default: results/<timestamp>.json)')
+    parser.add_argument('--baseline', help='earlier results file to compare against')
+    parser.add_argument('--child', nargs=2, metavar=('TARGET', 'DB'), help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.child:
+        _child(*args.child)
+        return
+
+    scenarios = [s for s in args.scenarios.split(',') if s]
+    targets = [t for t in args.targets.split(',') if t]
+    unknown = [s for s in scenarios if s not in SCENARIOS] + [t for t in targets if t not in TARGETS]
+    if unknown:
+        parser.error(f"unknown scenario or target: {', '.join(unknown)}")
+
+    results = {
+        'started_at': time.strftime('%Y-%m-%dT%H:%M:%S'),
+        'environment': _environment(),
+        'options': {'skew': args.skew, 'null_rate': args.null_rate, 'naming': args.naming,
+                    'date_type': args.date_type, 'seed': args.seed},
+        'results': [],
+    }
+    with tempfile.TemporaryDirectory() as tmp:
+        data_dir = args.data_dir or tmp
+        os.makedirs(data_dir, exist_ok=True)
+        for scenario in scenarios:
+            db_path = os.path.join(data_dir, f"orders_{scenario}.db")
+            print(f"Generating {scenario} ...", flush=True)
+            rows = build_sqlite(db_path, naming=args.naming, date_type=args.date_type, skew=args.skew,
+                                null_rate=args.null_rate, seed=args.seed, **SCENARIOS[scenario])
+            for target in targets:
+                run = {'scenario': scenario, 'target': target, 'rows': rows, **_spawn(target, db_path)}
+                if 'error' in run:
+                    print(f"{scenario:>4} {target:<9} error: {run['error']}")
+                else:
+                    run['rows_per_second'] = rows / run['wall_seconds']
+                    rss = run['peak_rss_bytes']
+                    print(f"{scenario:>4} {target:<9} {run['wall_seconds']:8.2f}s  "
+                          f"{run['rows_per_second']:>12,.0f} rows/s  "
+                          f"peak RSS {rss / 2 ** 20 if rss else float('nan'):,.0f} MB")
+                results['results'].append(run)
+
+    output = args.output or os.path.join(RESULTS_DIR, f"{time.strftime('%Y%m%d-%H%M%S')}.json")
+    os.makedirs(os.path.dirname(os.path.abspath(output)), exist_ok=True)
+    with open(output, 'w') as f:
+        json.dump(results, f, indent=2)
+    print(f"Results written to {output}")
+
+    if args.baseline:
+        with open(args.baseline) as f:
+            compare(results, json.load(f))
+
+
+if __name__ == '__main__':
+    main()
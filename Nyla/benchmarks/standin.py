@@ -0,0 +1,234 @@
+"""A SQLite stand-in for the MySQL connection the backend expects.
+
+``StandinConnection`` accepts the MySQL dialect the analytics code emits:
+``%s`` placeholders, backtick identifiers, ``SET SESSION``, ``SHOW
+TABLES``, multi-table ``RENAME TABLE``, ``VARBINARY`` columns, ``UNHEX()``
+and the ``information_schema.COLUMNS`` / ``TABLES`` lookups used for
+column detection, size estimates and cache fingerprints.
+``StandinPool`` mimics ``db_connector.ConnectionPool`` so the HTTP layer can
+be driven without a MySQL server. Window-function pushdown is reported as
+unsupported unless ``pushdown=True``; the stand-in then reports a MySQL 8
+version and runs the pushdown query, translating ``TIMESTAMPDIFF(DAY, ...)``
+and dropping ``CONVERT(... USING utf8mb4) COLLATE utf8mb4_bin`` (SQLite's
+default collation already compares text by code point).
+"""
+import os
+import re
+import sqlite3
+import zlib
+from contextlib import contextmanager
+from datetime import datetime
+
+
+# store datetimes as MySQL-style text (the sqlite3 default adapter is deprecated)
+sqlite3.register_adapter(datetime, lambda value: value.isoformat(' '))
+
+
+_INFO_SCHEMA = re.compile(r"SELECT\s+(.+?)\s+FROM\s+information_schema\.(\w+)", re.IGNORECASE | re.DOTALL)
+_BINARY_COLLATE = re.compile(r"CONVERT\((`[^`]+`|\w+) USING utf8mb4\) COLLATE utf8mb4_bin", re.IGNORECASE)
+_TIMESTAMPDIFF_DAY = re.compile(r"TIMESTAMPDIFF\(DAY,", re.IGNORECASE)
+
+
+def _mysql_type(declared):
+    """Map a SQLite declared column type to an information_schema DATA_TYPE."""
+    declared = (declared or '').lower()
+    for sqlite_name, mysql_name in (('datetime', 'datetime'), ('timestamp', 'timestamp'), ('date', 'date'),
+                                    ('int', 'int'), ('varbinary', 'varbinary'), ('binary', 'binary'),
+                                    ('char', 'varchar'), ('text', 'text'),
+                                    ('blob', 'blob'), ('real', 'double'), ('floa', 'double'),
+                                    ('doub', 'double')):
+        if sqlite_name in declared:
+            return mysql_name
+    return 'varchar'
+
+
+def _unhex(value):
+    """MySQL UNHEX(): NULL for NULL or anything that is not hex digits."""
+    try:
+        return None if value is None else bytes.fromhex(str(value))
+    except ValueError:
+        return None
+
+
+def _days_between(unit, start, end):
+    """MySQL TIMESTAMPDIFF(DAY, start, end): whole days, truncated toward zero."""
+    if start is None or end is None:
+        return None
+    delta = datetime.fromisoformat(str(end)) - datetime.fromisoformat(str(start))
+    return int(delta.total_seconds() / 86400)
+
+
+class _Result:
+    """A cursor over precomputed rows."""
+
+    def __init__(self, columns, rows):
+        self.description = [(c, None, None, None, None, None, None) for c in columns]
+        self.rowcount = len(rows)
+        self._rows = list(rows)
+
+    def fetchone(self):
+        return self._rows.pop(0) if self._rows else None
+
+    def fetchmany(self, size=1):
+        rows, self._rows = self._rows[:size], self._rows[size:]
+        return rows
+
+    def fetchall(self):
+        rows, self._rows = self._rows, []
+        return rows
+
+    def close(self):
+        pass
+
+
+class StandinCursor:
+    """Cursor that translates the MySQL statements the backend issues."""
+
+    def __init__(self, connection):
+        self._connection = connection
+        self._cursor = connection.sqlite.cursor()
+        self._result = None
+
+    @property
+    def description(self):
+        return (self._result or self._cursor).description
+
+    @property
+    def rowcount(self):
+        return (self._result or self._cursor).rowcount
+
+    def execute(self, query, params=()):
+        self._result = None
+        params = tuple(params or ())
+        stripped = query.strip()
+        if re.match(r"SET\s", stripped, re.IGNORECASE):
+            self._result = _Result([], [])
+        elif re.match(r"SHOW\s+TABLES", stripped, re.IGNORECASE):
+            self._result = _Result(['Tables'], self._connection.sqlite.execute(
+                "SELECT name FROM sqlite_master WHERE type = 'table' ORDER BY name").fetchall())
+        elif re.match(r"RENAME\s+TABLE", stripped, re.IGNORECASE):
+            # SQLite renames one table per statement
+            for old, new in re.findall(r"(`[^`]+`|\w+)\s+TO\s+(`[^`]+`|\w+)", stripped[len('RENAME TABLE'):]):
+                self._cursor.execute(f"ALTER TABLE {old} RENAME TO {new}")
+            self._result = _Result([], [])
+        elif re.match(r"CHECKSUM\s+TABLE", stripped, re.IGNORECASE):
+            self._result = _Result(['Table', 'Checksum'], [(stripped.split()[-1], None)])
+        elif re.match(r"CREATE\s+TABLE", stripped, re.IGNORECASE):
+            # a declared VARBINARY would get NUMERIC affinity and turn '00123' into 123
+            self._cursor.execute(re.sub(r"VARBINARY\(\d+\)", "BLOB", query, flags=re.IGNORECASE), params)
+        elif _INFO_SCHEMA.match(stripped):
+            fields, view = _INFO_SCHEMA.match(stripped).groups()
+            self._result = self._connection.information_schema(view, [f.strip() for f in fields.split(',')],
+                                                               params[0] if params else None)
+        else:
+            if self._connection.pushdown:
+                query = _TIMESTAMPDIFF_DAY.sub("TIMESTAMPDIFF('DAY',", _BINARY_COLLATE.sub(r"\1", query))
+            self._cursor.execute(query.replace('%s', '?'), params)
+        return self
+
+    def executemany(self, query, seq_of_params):
+        self._result = None
+        self._cursor.executemany(query.replace('%s', '?'), seq_of_params)
+        return self
+
+    def fetchone(self):
+        return (self._result or self._cursor).fetchone()
+
+    def fetchmany(self, size=1):
+        return (self._result or self._cursor).fetchmany(size)
+
+    def fetchall(self):
+        return (self._result or self._cursor).fetchall()
+
+    def close(self):
+        self._cursor.close()
+
+
+class StandinConnection:
+    """A SQLite connection that speaks enough MySQL for the analytics code."""
+
+    def __init__(self, path, pushdown=False):
+        self.path = path
+        self.pushdown = pushdown
+        self.sqlite = sqlite3.connect(path, check_same_thread=False)
+        self.sqlite.create_function('CRC32', 1, lambda v: None if v is None else zlib.crc32(str(v).encode('utf-8')))
+        self.sqlite.create_function('MOD', 2, lambda a, b: None if a is None or b is None else a % b)
+        self.sqlite.create_function('UNHEX', 1, _unhex)
+        self.sqlite.create_function('TIMESTAMPDIFF', 3, _days_between)
+
+    def cursor(self, *args, **kwargs):
+        return StandinCursor(self)
+
+    def get_server_info(self):
+        if self.pushdown:
+            return f"8.0.0-standin (SQLite {sqlite3.sqlite_version})"
+        return f"SQLite {sqlite3.sqlite_version}"
+
+    def is_connected(self):
+        return True
+
+    def commit(self):
+        self.sqlite.commit()
+
+    def rollback(self):
+        self.sqlite.rollback()
+
+    def close(self):
+        self.sqlite.close()
+
+    def information_schema(self, view, fields, table_name):
+        """Answer an information_schema.COLUMNS or TABLES query for one table."""
+        view = view.upper()
+        if view == 'COLUMNS':
+            info = self.sqlite.execute(f'PRAGMA table_info("{table_name}")').fetchall()
+            values = {
+                'COLUMN_NAME': [c[1] for c in info],
+                'DATA_TYPE': [_mysql_type(c[2]) for c in info],
+                'COLUMN_TYPE': [(c[2] or 'text').lower() for c in info],
+            }
+            return _Result(fields, list(zip(*(values[f] for f in fields))))
+        if view == 'TABLES':
+            exists = self.sqlite.execute(
+                "SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = ?", (table_name,)).fetchone()
+            if not exists:
+                return _Result(fields, [])
+            page_count = self.sqlite.execute('PRAGMA page_count').fetchone()[0]
+            page_size = self.sqlite.execute('PRAGMA page_size').fetchone()[0]
+            modified = None
+            if self.path != ':memory:' and os.path.exists(self.path):
+                modified = datetime.fromtimestamp(os.path.getmtime(self.path))
+            values = {
+                'UPDATE_TIME': modified,
+                'TABLE_ROWS': self.sqlite.execute(f'SELECT COUNT(*) FROM "{table_name}"').fetchone()[0],
+                # the whole database file: benchmark files hold a single table
+                'DATA_LENGTH': page_count * page_size,
+            }
+            return _Result(fields, [tuple(values.get(f) for f in fields)])
+        raise sqlite3.OperationalError(f"information_schema.{view} is not emulated")
+
+
+class StandinPool:
+    """Drop-in for ``db_connector.ConnectionPool`` backed by a SQLite file.
+
+    Each checkout opens its own connection, so concurrent requests never
+    share one. ``connect_params`` is None: the parallel engine splits in
+    memory instead of having workers connect themselves. ``pushdown`` is
+    passed to each connection.
+    """
+
+    connect_params = None
+
+    def __init__(self, path, pushdown=False):
+        self.path = path
+        self.pushdown = pushdown
+
+    @contextmanager
+    def connection(self):
+        connection = StandinConnection(self.path, self.pushdown)
+        try:
+            yield connection
+        finally:
+            connection.close()
+
+    def close(self):
+        pass
@@ -0,0 +1,94 @@
+"""Synthetic order tables for benchmarks.
+
+Orders are spread over customers with a Zipf-like skew, order dates are
+uniform over ``span_days`` and the date, name and customer id columns can
+be blanked at a configurable rate. ``naming`` picks one of the column
+naming styles in ``COLUMN_STYLES``, all of which the analytics column
+detection recognises.
+"""
+import os
+import sqlite3
+
+import numpy as np
+
+
+# column names per naming style, in table order: customer id, name, date, order id, amount
+COLUMN_STYLES = {
+    'snake': ('customer_id', 'customer_name', 'order_date', 'order_id', 'amount'),
+    'camel': ('CustomerID', 'CustomerName', 'OrderDate', 'OrderID', 'Amount'),
+    'account': ('account_number', 'account_name', 'created_at', 'txn_id', 'total'),
+}
+# declared SQLite type of the date column; DATETIME is reported as a native date
+DATE_TYPES = ('datetime', 'text')
+# rows generated and inserted per batch
+BATCH_ROWS = 500000
+
+
+def _customer_weights(customers, skew):
+    """Share of orders per customer: uniform at skew 0, heavier head as skew grows."""
+    weights = 1.0 / np.arange(1, customers + 1, dtype=float) ** skew
+    return np.cumsum(weights / weights.sum())
+
+
+def _blank(values, rng, rate):
+    if rate > 0:
+        values[rng.random(len(values)) < rate] = None
+    return values
+
+
+def generate_batches(customers, orders_per_customer, skew=0.0, null_rate=0.0, seed=0,
+                     start='2022-01-01', span_days=730, batch_rows=BATCH_ROWS):
+    """Yield lists of ``(customer_id, name, order_date, order_id, amount)`` tuples.
+
+    ``customers * orders_per_customer`` rows are produced in total.
+    """
+    rng = np.random.default_rng(seed)
+    cdf = _customer_weights(customers, skew)
+    total = customers * orders_per_customer
+    origin = np.datetime64(start, 's')
+    for offset in range(0, total, batch_rows):
+        size = min(batch_rows, total - offset)
+        idx = np.minimum(np.searchsorted(cdf, rng.random(size)), customers - 1).astype(str)
+        ids = np.char.add('C', np.char.zfill(idx, 7)).astype(object)
+        names = np.char.add('Customer ', idx).astype(object)
+        seconds = rng.integers(0, span_days * 86400, size)
+        dates = np.char.replace((origin + seconds).astype(str), 'T', ' ').astype(object)
+        order_ids = np.arange(offset + 1, offset + size + 1).tolist()
+        amounts = np.round(rng.gamma(2.0, 40.0, size), 2).tolist()
+        yield list(zip(
+            _blank(ids, rng, null_rate).tolist(),
+            _blank(names, rng, null_rate).tolist(),
+            _blank(dates, rng, null_rate).tolist(),
+            order_ids,
+            amounts,
+        ))
+
+
+def build_sqlite(path, customers, orders_per_customer, table='orders', naming='snake',
+                 date_type='datetime', **options):
+    """Write a synthetic order table to a SQLite file and return its row count.
+
+    ``options`` are passed to ``generate_batches``. An existing file at
+    ``path`` is replaced.
+    """
+    if naming not in COLUMN_STYLES:
+        raise ValueError(f"Unknown naming style '{naming}'")
+    if date_type not in DATE_TYPES:
+        raise ValueError(f"Unknown date type '{date_type}'")
+    if os.path.exists(path):
+        os.remove(path)
+    customer, name, date, order_id, amount = COLUMN_STYLES[naming]
+    connection = sqlite3.connect(path)
+    try:
+        connection.execute(
+            f'CREATE TABLE "{table}" ("{customer}" TEXT, "{name}" TEXT, "{date}" {date_type.upper()}, '
+            f'"{order_id}" INTEGER, "{amount}" REAL)'
+        )
+        rows = 0
+        for batch in generate_batches(customers, orders_per_customer, **options):
+            connection.executemany(f'INSERT INTO "{table}" VALUES (?, ?, ?, ?, ?)', batch)
+            rows += len(batch)
+        connection.commit()
+    finally:
+        connection.close()
+    return rows
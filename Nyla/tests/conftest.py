@@ -0,0 +1,99 @@
+import http.client
+import json
+import os
+import sqlite3
+import sys
+import threading
+from datetime import datetime
+
+import pytest
+
+# backend modules import each other by bare name, as app.py runs them
+NYLA_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path[:0] = [os.path.join(NYLA_DIR, 'backend'), os.path.join(NYLA_DIR, 'benchmarks')]
+
+NOW = datetime(2024, 6, 30, 12, 0, 0)
+
+
+class FrozenDatetime(datetime):
+    @classmethod
+    def now(cls, tz=None):
+        return NOW
+
+
+@pytest.fixture
+def frozen_now(monkeypatch):
+    """Pin analytics' reference time so records compare across runs."""
+    import analytics
+    monkeypatch.setattr(analytics, 'datetime', FrozenDatetime)
+    return NOW
+
+
+@pytest.fixture
+def orders_db(tmp_path):
+    """A synthetic SQLite order table (``orders``) and a factory for more."""
+    import synthetic
+
+    def build(customers=40, orders_per_customer=5, **options):
+        path = str(tmp_path / f"orders_{len(os.listdir(tmp_path))}.db")
+        options.setdefault('start', '2023-01-01')
+        options.setdefault('span_days', 540)
+        synthetic.build_sqlite(path, customers, orders_per_customer, **options)
+        return path
+    return build
+
+
+@pytest.fixture
+def backend_app(monkeypatch):
+    """``app`` with its analytics modules loaded and empty caches."""
+    import app
+    app.load_backend()
+    from results_store import ResultStore
+    monkeypatch.setattr(app, 'result_cache', app.ResultCache())
+    monkeypatch.setattr(app, 'result_store', ResultStore())
+    return app
+
+
+def _add_orders(path, rows):
+    connection = sqlite3.connect(path)
+    connection.executemany("INSERT INTO orders VALUES (?, ?, ?, ?, ?)", rows)
+    connection.commit()
+    connection.close()
+    # the stand-in's UPDATE_TIME is the file mtime, which may not tick within one test
+    modified = os.path.getmtime(path) + 1
+    os.utime(path, (modified, modified))
+
+
+@pytest.fixture
+def add_orders():
+    """Append ``(customer_id, name, order_date, order_id, amount)`` rows to a database's ``orders``."""
+    return _add_orders
+
+
+@pytest.fixture
+def serve(backend_app, monkeypatch):
+    """Start the HTTP server with ``pool`` as the session; returns ``request(method, path, body, headers)``."""
+    servers = []
+
+    def start(pool, schema='s', server='x'):
+        monkeypatch.setattr(backend_app, 'current_pool', pool)
+        monkeypatch.setattr(backend_app, 'current_schema', schema)
+        monkeypatch.setattr(backend_app, 'current_server', server)
+        httpd = backend_app.ThreadingServer(('127.0.0.1', 0), backend_app.DataAnalyticsHandler)
+        threading.Thread(target=httpd.serve_forever, daemon=True).start()
+        servers.append(httpd)
+
+        def request(method, path, body=None, headers=None):
+            connection = http.client.HTTPConnection('127.0.0.1', httpd.server_address[1], timeout=60)
+            try:
+                connection.request(method, path, None if body is None else json.dumps(body), headers or {})
+                response = connection.getresponse()
+                return response, response.read()
+            finally:
+                connection.close()
+        return request
+
+    yield start
+    for httpd in servers:
+        httpd.shutdown()
+        httpd.server_close()
@@ -0,0 +1,27 @@
+"""Analysis-type plans: light runs and the latest result set per table."""
+from standin import StandinPool
+
+
+def test_light_run_counts_a_single_miss(backend_app, orders_db, frozen_now):
+    pool = StandinPool(orders_db(customers=20, orders_per_customer=3))
+    request = {'table': 'orders', 'analysis_type': 'recency'}
+    records, cached = backend_app.run_analytics(pool, 's', 'x', request)
+    assert not cached and set(records[0]) == {'customer_id', 'last_order_date', 'recency'}
+    assert backend_app.result_cache.stats()['misses'] == 1
+    assert backend_app.run_analytics(pool, 's', 'x', request)[1]
+    assert backend_app.result_cache.stats()['hits'] == 1
+    backend_app.run_analytics(pool, 's', 'x', {'table': 'orders', 'analysis_type': 'segmentation'})
+    assert backend_app.result_cache.stats()['misses'] == 2
+
+
+def test_light_run_keeps_the_full_result_set(backend_app, orders_db, add_orders, frozen_now):
+    path = orders_db(customers=20, orders_per_customer=3)
+    pool = StandinPool(path)
+    full, _ = backend_app.run_analytics(pool, 's', 'x', {'table': 'orders'})
+    add_orders(path, [('C0000001', 'Customer 1', '2024-06-29 09:00:00', 9001, 5.0)])
+    backend_app.run_analytics(pool, 's', 'x', {'table': 'orders', 'analysis_type': 'recency'})
+
+    result_set = backend_app.result_store.get(('x', 's', 'orders'))
+    assert not result_set.partial and result_set.records is full
+    assert result_set.query(segment=full[0]['customer_classification'])['total'] > 0
+    assert result_set.lookup(customer_id=full[0]['customer_id']) == [full[0]]
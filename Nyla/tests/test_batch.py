@@ -0,0 +1,56 @@
+"""POST /api/batch over several tables."""
+import json
+import sqlite3
+from contextlib import contextmanager
+
+from db_connector import PoolError
+from standin import StandinConnection, StandinPool
+
+import materialize
+
+
+class _FailingPool:
+    connect_params = None
+
+    def __init__(self, error):
+        self.error = error
+
+    @contextmanager
+    def connection(self):
+        raise self.error
+        yield
+
+
+def test_batch_all_tables(serve, orders_db, frozen_now):
+    path = orders_db(customers=15, orders_per_customer=3)
+    connection = sqlite3.connect(path)
+    connection.execute("CREATE TABLE products (sku TEXT, price REAL)")
+    connection.execute("INSERT INTO products VALUES ('A1', 2.5)")
+    connection.execute("CREATE TABLE returns AS SELECT customer_id, order_date FROM orders LIMIT 10")
+    connection.commit()
+    connection.close()
+    standin = StandinConnection(path)
+    customers = len(materialize.build_summary(standin, 'orders'))
+    standin.close()
+
+    request = serve(StandinPool(path))
+    response, body = request('POST', '/api/batch', {'tables': 'all'})
+    assert response.status == 200
+    body = json.loads(body)
+    by_table = {t['table']: t for t in body['tables']}
+    assert sorted(by_table) == ['orders', 'products', 'returns']
+    assert by_table['products']['status'] == 'skipped'
+    assert by_table['orders']['status'] == 'success' and by_table['orders']['customers'] == customers
+    assert body['counts'] == {'success': 2, 'failed': 0, 'skipped': 1}
+
+    response, body = request('POST', '/api/batch', {'tables': ['returns', 'missing']})
+    statuses = [(t['table'], t['status']) for t in json.loads(body)['tables']]
+    assert statuses == [('returns', 'success'), ('missing', 'failed')]
+
+
+def test_batch_table_listing_errors_get_a_response(serve):
+    response, body = serve(_FailingPool(PoolError("Timed out waiting for a free database connection")))(
+        'POST', '/api/batch', {'tables': 'all'})
+    assert response.status == 503 and b'Timed out' in body
+    response, body = serve(_FailingPool(RuntimeError("server has gone away")))('POST', '/api/batch', {})
+    assert response.status == 500 and b'gone away' in body
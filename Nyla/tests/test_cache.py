@@ -0,0 +1,79 @@
+"""Result cache keyed by table fingerprint."""
+import json
+
+from cache import ResultCache
+from db_connector import get_table_fingerprint
+from standin import StandinConnection, StandinPool
+
+
+def test_fingerprint_change_is_a_miss_and_drops_the_entry():
+    cache = ResultCache()
+    cache.put(('x', 's', 't'), 'v1', [{'customer_id': 1}])
+    assert cache.get(('x', 's', 't'), 'v1') == [{'customer_id': 1}]
+    assert cache.get(('x', 's', 't'), 'v2') is None
+    assert cache.get(('x', 's', 't'), 'v1') is None
+    assert cache.stats()['hits'] == 1 and cache.stats()['misses'] == 2 and cache.stats()['entries'] == 0
+
+
+def test_unknown_fingerprints_are_never_cached():
+    cache = ResultCache()
+    cache.put(('x', 's', 't'), None, [{'customer_id': 1}])
+    assert cache.stats()['entries'] == 0
+    assert cache.get(('x', 's', 't'), None) is None
+
+
+def test_size_bound_evicts_least_recently_used():
+    records = [{'customer_id': i, 'customer_name': 'x' * 50} for i in range(20)]
+    cache = ResultCache(max_bytes=4000)
+    cache.put(('x', 's', 'a'), 'f', records)
+    cache.put(('x', 's', 'b'), 'f', records)
+    assert cache.get(('x', 's', 'a'), 'f') is not None
+    cache.put(('x', 's', 'c'), 'f', records)
+    assert cache.get(('x', 's', 'b'), 'f') is None
+    assert cache.get(('x', 's', 'a'), 'f') is not None
+    assert cache.stats()['bytes'] <= 4000
+
+
+def test_invalidate_by_table_covers_every_key_of_the_table():
+    cache = ResultCache()
+    for key in (('x', 's', 't'), ('x', 's', 't', 'recency'), ('x', 's', 't', 'as_of', '2024-01-01T00:00:00'),
+                ('x', 's', 'u')):
+        cache.put(key, 'f', [{}])
+    assert cache.invalidate(server='x', schema='s', table='t') == 3
+    assert cache.stats()['entries'] == 1
+
+
+def test_fingerprint_is_none_without_update_time():
+    connection = StandinConnection(':memory:')
+    try:
+        connection.sqlite.execute("CREATE TABLE orders (customer_id TEXT, order_date DATETIME)")
+        assert get_table_fingerprint(connection, 'orders') is None
+    finally:
+        connection.close()
+
+
+def test_changed_table_is_recomputed(backend_app, orders_db, add_orders, frozen_now):
+    path = orders_db(customers=10, orders_per_customer=3)
+    pool = StandinPool(path)
+    first, cached = backend_app.run_analytics(pool, 's', 'x', {'table': 'orders'})
+    assert not cached
+    again, cached = backend_app.run_analytics(pool, 's', 'x', {'table': 'orders'})
+    assert cached and again is first
+
+    add_orders(path, [('CNEW', 'Newcomer', '2024-06-29 09:00:00', 9001, 5.0)])
+    fresh, cached = backend_app.run_analytics(pool, 's', 'x', {'table': 'orders'})
+    assert not cached
+    assert [r['customer_id'] for r in fresh] == sorted([r['customer_id'] for r in first] + ['CNEW'])
+
+
+def test_unknown_engine_is_rejected_even_when_cached(serve, orders_db):
+    request = serve(StandinPool(orders_db(customers=5, orders_per_customer=2)))
+    for _ in range(2):
+        response, body = request('POST', '/api/analytics', {'table': 'orders', 'engine': 'turbo'})
+        assert response.status == 400 and 'turbo' in json.loads(body)['message']
+        response, _ = request('POST', '/api/analytics', {'table': 'orders'})
+        assert response.status == 200
+    response, _ = request('POST', '/api/jobs', {'table': 'orders', 'engine': 'turbo'})
+    assert response.status == 400
+    response, _ = request('POST', '/api/batch', {'tables': ['orders'], 'engine': 'turbo'})
+    assert response.status == 400
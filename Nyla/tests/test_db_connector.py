@@ -0,0 +1,63 @@
+"""The MySQL connection pool, driven with fake connections."""
+import pytest
+
+import db_connector
+from db_connector import ConnectionPool, PoolError
+
+
+class _FakeConnection:
+    def __init__(self, **params):
+        self.params = params
+        self.closed = False
+        self.resets = 0
+
+    def ping(self, reconnect=False, attempts=1, delay=0):
+        assert not self.closed
+
+    def reset_session(self):
+        self.resets += 1
+
+    def close(self):
+        self.closed = True
+
+
+@pytest.fixture
+def opened(monkeypatch):
+    connections = []
+
+    def connect(**params):
+        connections.append(_FakeConnection(**params))
+        return connections[-1]
+    monkeypatch.setattr(db_connector.mysql.connector, 'connect', connect)
+    return connections
+
+
+def test_connections_are_opened_up_front_and_reused(opened):
+    pool = ConnectionPool('h', 3306, 'u', 'p', 's', size=2)
+    assert len(opened) == 2 and opened[0].params['database'] == 's'
+    for _ in range(3):
+        with pool.connection() as first, pool.connection() as second:
+            assert {first, second} == set(opened)
+    assert len(opened) == 2 and all(c.resets == 3 for c in opened)
+
+
+def test_checkout_times_out_when_every_connection_is_busy(opened):
+    pool = ConnectionPool('h', 3306, 'u', 'p', 's', size=1, checkout_timeout=0.05)
+    with pool.connection():
+        with pytest.raises(PoolError, match='Timed out'):
+            with pool.connection():
+                pass
+    with pool.connection() as connection:
+        assert connection is opened[0]
+
+
+def test_close_closes_idle_connections_now_and_checked_out_ones_on_release(opened):
+    pool = ConnectionPool('h', 3306, 'u', 'p', 's', size=2)
+    with pool.connection() as busy:
+        pool.close()
+        idle = [c for c in opened if c is not busy]
+        assert [c.closed for c in idle] == [True] and not busy.closed
+    assert busy.closed
+    with pytest.raises(PoolError, match='closed'):
+        with pool.connection():
+            pass
@@ -0,0 +1,109 @@
+"""Response encoding: formats, compression and errors while streaming."""
+import http.client
+import json
+import os
+import zlib
+
+import pytest
+
+from encoding import _WBITS, iter_encoded, negotiate_encoding
+from standin import StandinPool
+
+
+def _records(count, bad_at=None):
+    records = [{'customer_id': f"C{i:05d}", 'total_orders': i} for i in range(count)]
+    if bad_at is not None:
+        records[bad_at]['total_orders'] = object()
+    return records
+
+
+@pytest.fixture
+def analytics_returning(serve, monkeypatch, backend_app, tmp_path):
+    """Serve /api/analytics answering with the given records."""
+    def start(records):
+        monkeypatch.setattr(backend_app, 'run_analytics', lambda *args, **kwargs: (records, False))
+        return serve(StandinPool(str(tmp_path / 'unused.db')))
+    return start
+
+
+@pytest.mark.parametrize('fmt', ['json', 'ndjson', 'columnar'])
+def test_bad_value_in_first_batch_gets_a_500(analytics_returning, fmt):
+    response, body = analytics_returning(_records(10, bad_at=3))('POST', '/api/analytics',
+                                                                 {'table': 'orders', 'format': fmt})
+    assert response.status == 500
+    assert json.loads(body)['message'].startswith('Could not encode results')
+
+
+@pytest.mark.parametrize('fmt', ['json', 'ndjson', 'columnar'])
+def test_bad_value_after_the_headers_leaves_the_body_incomplete(analytics_returning, fmt):
+    request = analytics_returning(_records(2500, bad_at=2100))
+    with pytest.raises(http.client.IncompleteRead):
+        request('POST', '/api/analytics', {'table': 'orders', 'format': fmt})
+
+
+def _decode(body, fmt):
+    if fmt == 'ndjson':
+        lines = [json.loads(line) for line in body.decode('utf-8').splitlines()]
+        return lines[0], lines[1:]
+    decoded = json.loads(body)
+    records = decoded.pop('data')
+    if fmt == 'columnar':
+        columns = decoded.pop('columns')
+        records = [dict(zip(columns, row)) for row in records]
+    return decoded, records
+
+
+@pytest.mark.parametrize('fmt', ['json', 'ndjson', 'columnar'])
+@pytest.mark.parametrize('count', [0, 1, 2500])
+def test_formats_round_trip(fmt, count):
+    records = _records(count)
+    body = b''.join(iter_encoded({'status': 'success', 'cached': False}, records, fmt))
+    assert _decode(body, fmt) == ({'status': 'success', 'cached': False}, records)
+
+
+def test_unknown_format_is_rejected():
+    with pytest.raises(ValueError):
+        list(iter_encoded({}, [], 'xml'))
+
+
+@pytest.mark.parametrize('header, expected', [
+    (None, None), ('', None), ('identity', None), ('gzip', 'gzip'), ('deflate, gzip;q=0', 'deflate'),
+    ('br;q=1.0, gzip;q=0.5', 'gzip'), ('*', 'gzip'), ('*;q=0', None), ('gzip;q=bad, deflate', 'deflate'),
+])
+def test_negotiate_encoding(header, expected):
+    assert negotiate_encoding(header) == expected
+
+
+@pytest.mark.parametrize('encoding', ['gzip', 'deflate'])
+def test_streamed_results_are_compressed(analytics_returning, encoding):
+    records = _records(2500)
+    response, body = analytics_returning(records)('POST', '/api/analytics', {'table': 'orders'},
+                                                  {'Accept-Encoding': encoding})
+    assert response.status == 200
+    assert response.getheader('Content-Encoding') == encoding
+    assert json.loads(zlib.decompress(body, _WBITS[encoding]))['data'] == records
+
+
+def test_static_files_are_compressed_and_revalidated(serve, backend_app, monkeypatch, tmp_path):
+    page = tmp_path / 'index.html'
+    page.write_text('<p>hello</p>' * 200)
+    monkeypatch.setattr(backend_app, 'FRONTEND_DIR', str(tmp_path))
+    request = serve(StandinPool(str(tmp_path / 'unused.db')))
+
+    plain, body = request('GET', '/')
+    assert plain.getheader('Content-Encoding') is None and body == page.read_bytes()
+    gzipped, body = request('GET', '/', headers={'Accept-Encoding': 'gzip'})
+    assert gzipped.getheader('Content-Encoding') == 'gzip'
+    assert zlib.decompress(body, _WBITS['gzip']) == page.read_bytes()
+    assert gzipped.getheader('ETag') != plain.getheader('ETag')
+
+    response, body = request('GET', '/', headers={'If-None-Match': plain.getheader('ETag')})
+    assert (response.status, body) == (304, b'')
+    response, _ = request('GET', '/', headers={'If-None-Match': plain.getheader('ETag'), 'Accept-Encoding': 'gzip'})
+    assert response.status == 200
+
+    page.write_text('<p>changed</p>' * 200)
+    modified = page.stat().st_mtime + 1
+    os.utime(page, (modified, modified))
+    response, body = request('GET', '/', headers={'If-None-Match': plain.getheader('ETag')})
+    assert response.status == 200 and body == page.read_bytes()
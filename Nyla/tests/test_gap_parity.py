@@ -0,0 +1,212 @@
+"""The vectorized engines must return exactly what the original per-customer loop did."""
+import math
+import random
+import sqlite3
+import uuid
+from datetime import datetime, timedelta
+
+import pandas as pd
+import pytest
+
+import analytics
+from standin import StandinConnection
+
+
+NOW = datetime(2024, 6, 30, 12, 0, 0)
+
+
+class _FrozenDatetime(datetime):
+    @classmethod
+    def now(cls, tz=None):
+        return NOW
+
+
+def _baseline_records(df, date_col, customer_col, name_col, now):
+    """The record building of the original ``perform_analytics``, loop included."""
+    df[date_col] = pd.to_datetime(df[date_col], errors='coerce')
+    df = df.sort_values(by=[customer_col, date_col])
+
+    customer_orders = df.groupby(customer_col).agg({
+        date_col: ['count', 'min', 'max']
+    }).reset_index()
+    customer_orders.columns = ['customer_id', 'total_orders', 'first_order_date', 'last_order_date']
+
+    if name_col and name_col in df.columns:
+        names = (
+            df.groupby(customer_col)[name_col]
+            .apply(lambda s: s.dropna().astype(str).iloc[0] if not s.dropna().empty else None)
+            .reset_index()
+        )
+        names = names.rename(columns={customer_col: 'customer_id', name_col: 'customer_name'})
+        customer_orders = customer_orders.merge(names, on='customer_id', how='left')
+    else:
+        customer_orders['customer_name'] = None
+
+    order_gaps = []
+    for customer_id, group in df.groupby(customer_col):
+        dates = group[date_col].sort_values().tolist()
+        if len(dates) > 1:
+            gaps = [(dates[i + 1] - dates[i]).days for i in range(len(dates) - 1)]
+            avg_gap = float(sum(gaps)) / len(gaps)
+        else:
+            avg_gap = float('nan')
+        order_gaps.append({'customer_id': customer_id, 'avg_order_gap': avg_gap})
+    results = customer_orders.merge(pd.DataFrame(order_gaps), on='customer_id', how='left')
+
+    def _predict_next(row):
+        try:
+            gap = row.get('avg_order_gap', None)
+            if gap is None or (isinstance(gap, float) and math.isnan(gap)):
+                return None
+            gap = float(gap)
+            if gap > 0:
+                last = row['last_order_date']
+                if pd.notna(last):
+                    return last + timedelta(days=round(gap))
+        except Exception:
+            pass
+        return None
+
+    results['predicted_next_order_date'] = results.apply(_predict_next, axis=1)
+    results['recency'] = results['last_order_date'].apply(
+        lambda x: (now - pd.Timestamp(x).replace(tzinfo=None)).days if pd.notna(x) else None)
+    results['customer_classification'] = results.apply(
+        lambda row: analytics._classify_customer_segment(
+            row['total_orders'], row['avg_order_gap'], row['last_order_date'], row['first_order_date'], now=now
+        ),
+        axis=1
+    )
+    results['churn_flag'] = results['customer_classification'].isin(['At Risk', 'Lost']).astype(int)
+
+    def _dt_to_str(v):
+        if pd.isna(v):
+            return None
+        return pd.Timestamp(v).isoformat()
+
+    for c in ('first_order_date', 'last_order_date', 'predicted_next_order_date'):
+        results[c] = results[c].apply(_dt_to_str)
+    results['avg_order_gap'] = results['avg_order_gap'].apply(
+        lambda x: None if x is None or math.isnan(x) else round(float(x), 2))
+
+    records = results.to_dict('records')
+    for record in records:
+        for k, v in list(record.items()):
+            if isinstance(v, float) and math.isnan(v):
+                record[k] = None
+    return records
+
+
+def _build_table(path, date_type, integer_ids, seed):
+    """Orders with NULL and unparseable dates, missing names and single-order customers."""
+    rnd = random.Random(seed)
+    rows = []
+    for c in range(120):
+        customer = c + 1 if integer_ids else f"C{c:04d}"
+        start = NOW - timedelta(days=rnd.randint(0, 700), hours=rnd.randint(0, 23))
+        gap = rnd.choice([1, 3, 7, 14, 30, 60])
+        for i in range(rnd.choice([1, 1, 2, 3, 5, 8, 12])):
+            date = (start + timedelta(days=i * gap + rnd.randint(0, 3), hours=rnd.randint(0, 23)))
+            date = date.strftime('%Y-%m-%d %H:%M:%S')
+            roll = rnd.random()
+            if roll < 0.03:
+                date = None
+            elif roll < 0.05:
+                date = 'not a date'
+            name = None if rnd.random() < 0.1 else f"Customer {c}"
+            rows.append((customer, name, date, rnd.random() * 100))
+    # a customer whose only orders are undated
+    rows += [(999 if integer_ids else 'CNODATE', None, None, 1.0)] * 2
+    rnd.shuffle(rows)
+    connection = sqlite3.connect(path)
+    connection.execute(f"CREATE TABLE orders (customer_id {'INTEGER' if integer_ids else 'TEXT'}, "
+                       f"customer_name TEXT, order_date {date_type}, amount REAL)")
+    connection.executemany("INSERT INTO orders VALUES (?, ?, ?, ?)", rows)
+    connection.commit()
+    connection.close()
+
+
+@pytest.mark.parametrize('seed', [0, 1])
+@pytest.mark.parametrize('integer_ids', [False, True])
+@pytest.mark.parametrize('date_type,engine', [
+    ('DATETIME', 'pandas'), ('DATETIME', 'stream'), ('DATETIME', 'auto'),
+    ('TEXT', 'pandas'), ('TEXT', 'auto'),
+])
+def test_engine_matches_baseline_loop(tmp_path, monkeypatch, seed, integer_ids, date_type, engine):
+    path = str(tmp_path / 'orders.db')
+    _build_table(path, date_type, integer_ids, seed)
+    monkeypatch.setattr(analytics, 'datetime', _FrozenDatetime)
+    monkeypatch.setattr(analytics, 'STREAM_FOLD_EVERY', 3)
+    stream = analytics._aggregate_stream
+    # small chunks so customers straddle chunk boundaries
+    monkeypatch.setattr(analytics, '_aggregate_stream', lambda *a, **k: stream(*a, **{**k, 'chunk_rows': 7}))
+
+    connection = StandinConnection(path)
+    try:
+        expected_frame = pd.read_sql("SELECT * FROM orders", connection)
+        expected = _baseline_records(expected_frame, 'order_date', 'customer_id', 'customer_name', NOW)
+        actual = analytics.perform_analytics(connection, 'orders', engine=engine)
+    finally:
+        connection.close()
+
+    assert len(actual) == len(expected)
+    for got, want in zip(actual, expected):
+        assert got == want
+
+
+def test_text_dates_never_stream(tmp_path, monkeypatch):
+    """MM/DD/YYYY text sorts lexically on the server, so auto must not stream it and stream must refuse."""
+    path = str(tmp_path / 'orders.db')
+    _build_table(path, 'TEXT', False, 0)
+    connection = sqlite3.connect(path)
+    rows = connection.execute("SELECT rowid, order_date FROM orders WHERE order_date LIKE '____-__-__ %'").fetchall()
+    connection.executemany("UPDATE orders SET order_date = ? WHERE rowid = ?",
+                           [(datetime.strptime(d, '%Y-%m-%d %H:%M:%S').strftime('%m/%d/%Y'), r) for r, d in rows])
+    connection.commit()
+    connection.close()
+    monkeypatch.setattr(analytics, 'datetime', _FrozenDatetime)
+
+    connection = StandinConnection(path)
+    try:
+        expected_frame = pd.read_sql("SELECT * FROM orders", connection)
+        expected = _baseline_records(expected_frame, 'order_date', 'customer_id', 'customer_name', NOW)
+        # a 1-byte limit would pick stream for a native date column
+        assert analytics.perform_analytics(connection, 'orders', engine='auto', memory_limit=1) == expected
+        with pytest.raises(ValueError, match='Stream engine requires a native'):
+            analytics.perform_analytics(connection, 'orders', engine='stream')
+    finally:
+        connection.close()
+
+
+@pytest.mark.parametrize('engine', ['pandas', 'stream', 'auto'])
+def test_binary_customer_ids(tmp_path, monkeypatch, engine):
+    """A BINARY(16) customer id is still detected by name and reported as hex text."""
+    path = str(tmp_path / 'orders.db')
+    rnd = random.Random(3)
+    customers = [uuid.UUID(int=rnd.getrandbits(128)).bytes for _ in range(3)]
+    rows = []
+    for order_id in range(1, 10):
+        date = NOW - timedelta(days=rnd.randint(0, 200), hours=rnd.randint(0, 23))
+        rows.append((order_id, customers[order_id % 3], f"Customer {order_id % 3}", date.strftime('%Y-%m-%d %H:%M:%S')))
+    connection = sqlite3.connect(path)
+    connection.execute("CREATE TABLE orders (order_id INTEGER, customer_id BINARY(16), customer_name TEXT, "
+                       "order_date DATETIME)")
+    connection.executemany("INSERT INTO orders VALUES (?, ?, ?, ?)", rows)
+    connection.commit()
+    connection.close()
+    monkeypatch.setattr(analytics, 'datetime', _FrozenDatetime)
+
+    connection = StandinConnection(path)
+    try:
+        assert analytics._detect_sample_columns(connection, 'orders')[:3] == ('order_date', 'customer_id',
+                                                                              'customer_name')
+        expected_frame = pd.read_sql("SELECT * FROM orders", connection)
+        expected_frame['customer_id'] = expected_frame['customer_id'].map(lambda v: v.hex().upper())
+        expected = _baseline_records(expected_frame, 'order_date', 'customer_id', 'customer_name', NOW)
+        actual = analytics.perform_analytics(connection, 'orders', engine=engine)
+        one = analytics.perform_customer_lookup(connection, 'orders', customer_id=customers[1].hex().upper())
+    finally:
+        connection.close()
+
+    assert len(actual) == 3
+    assert actual == expected
+    assert one == [r for r in expected if r['customer_id'] == customers[1].hex().upper()]
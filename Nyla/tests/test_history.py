@@ -0,0 +1,95 @@
+"""as_of runs and segment history must match analytics on a cut-off table."""
+import json
+import shutil
+import sqlite3
+from datetime import datetime
+
+import pytest
+
+import analytics
+import history
+from standin import StandinConnection, StandinPool
+
+CUTOFFS = [datetime(2023, 3, 1), datetime(2023, 9, 15, 12), datetime(2024, 1, 1), datetime(2024, 6, 30, 12)]
+
+
+def _cut(path, tmp_path, as_of):
+    """A copy of the table without the orders after ``as_of`` (undated orders too, as SQL's <= drops them)."""
+    copy = str(tmp_path / 'cut.db')
+    shutil.copyfile(path, copy)
+    connection = sqlite3.connect(copy)
+    dates = connection.execute("SELECT order_date FROM orders").fetchall()
+    late = [d for (d,) in dates if d is None or datetime.fromisoformat(d) > as_of]
+    connection.executemany("DELETE FROM orders WHERE order_date IS ?", [(d,) for d in late])
+    connection.commit()
+    connection.close()
+    return copy
+
+
+def _analytics_at(path, now, monkeypatch, **options):
+    """Analytics on ``path`` with the clock set to ``now``."""
+    class Frozen(datetime):
+        @classmethod
+        def now(cls, tz=None):
+            return now
+    with monkeypatch.context() as patch:
+        patch.setattr(analytics, 'datetime', Frozen)
+        connection = StandinConnection(path)
+        try:
+            return analytics.perform_analytics(connection, 'orders', **options)
+        finally:
+            connection.close()
+
+
+@pytest.mark.parametrize('date_type,engine', [('datetime', 'pandas'), ('datetime', 'stream'),
+                                              ('datetime', 'auto'), ('text', 'pandas')])
+def test_as_of_matches_a_cut_off_table(orders_db, tmp_path, monkeypatch, date_type, engine):
+    path = orders_db(customers=40, orders_per_customer=5, null_rate=0.05, date_type=date_type)
+    as_of = datetime(2023, 9, 15, 12)
+    connection = StandinConnection(path)
+    try:
+        actual = analytics.perform_analytics(connection, 'orders', engine=engine, as_of=as_of)
+    finally:
+        connection.close()
+    assert actual == _analytics_at(_cut(path, tmp_path, as_of), as_of, monkeypatch, engine='pandas')
+
+
+def test_history_matches_per_cutoff_analytics(orders_db, monkeypatch):
+    path = orders_db(customers=60, orders_per_customer=5, skew=1.1, null_rate=0.05)
+    connection = StandinConnection(path)
+    try:
+        result = history.perform_segment_history(connection, 'orders', list(reversed(CUTOFFS)) + [CUTOFFS[0]])
+    finally:
+        connection.close()
+    assert [s['as_of'] for s in result['snapshots']] == [c.isoformat() for c in CUTOFFS]
+
+    segments = []
+    for cutoff, snapshot in zip(CUTOFFS, result['snapshots']):
+        records = _analytics_at(path, cutoff, monkeypatch, engine='pandas', as_of=cutoff)
+        by_customer = {r['customer_id']: r['customer_classification'] for r in records}
+        counts = {}
+        for segment in by_customer.values():
+            counts[segment] = counts.get(segment, 0) + 1
+        assert snapshot['customers'] == len(records)
+        assert snapshot['segments'] == counts
+        segments.append(by_customer)
+
+    for before, after, migration in zip(segments, segments[1:], result['migrations']):
+        flows = {}
+        for customer, segment in after.items():
+            targets = flows.setdefault(before.get(customer, history.NEW_CUSTOMER), {})
+            targets[segment] = targets.get(segment, 0) + 1
+        assert migration['flows'] == flows
+
+
+def test_history_endpoint(serve, orders_db):
+    request = serve(StandinPool(orders_db(customers=20, orders_per_customer=4)))
+    as_of = ['2024-01-01', '2023-06-01T00:00:00+02:00']
+    response, body = request('POST', '/api/history', {'table': 'orders', 'as_of': as_of})
+    assert response.status == 200
+    body = json.loads(body)
+    assert [s['as_of'] for s in body['snapshots']] == ['2023-06-01T00:00:00', '2024-01-01T00:00:00']
+    assert len(body['migrations']) == 1
+
+    for bad in ([], ['yesterday'], [''], '2024-01-01', ['2024-01-01'] * (history.MAX_HISTORY_CUTOFFS + 1)):
+        assert request('POST', '/api/history', {'table': 'orders', 'as_of': bad})[0].status == 400
@@ -0,0 +1,77 @@
+"""Incremental analytics: extending saved state and rebuilding it."""
+import sqlite3
+
+import analytics
+import incremental
+from standin import StandinConnection
+
+KEY = ('test', 'main', 'orders')
+
+
+def _insert(path, rows):
+    connection = sqlite3.connect(path)
+    connection.executemany("INSERT INTO orders VALUES (?, ?, ?, ?, ?)", rows)
+    connection.commit()
+    connection.close()
+
+
+def _spy_folds(monkeypatch):
+    """Record the params of every fold so a test can tell extensions from full scans."""
+    calls = []
+    fold = incremental._fold_stream
+
+    def spy(connection, query, *args, params=None, **kwargs):
+        calls.append(params)
+        return fold(connection, query, *args, params=params, **kwargs)
+
+    monkeypatch.setattr(incremental, '_fold_stream', spy)
+    return calls
+
+
+def test_new_orders_extend_saved_state(orders_db, frozen_now, tmp_path, monkeypatch):
+    path = orders_db(customers=30, orders_per_customer=4)
+    calls = _spy_folds(monkeypatch)
+    connection = StandinConnection(path)
+    try:
+        first = incremental.perform_incremental_analytics(connection, 'orders', KEY, state_dir=tmp_path)
+        assert first == analytics.perform_analytics(connection, 'orders', engine='pandas')
+        rows = incremental.load_state(KEY, tmp_path)['rows']
+
+        _insert(path, [
+            ('C0000001', 'Customer 1', '2024-06-28 09:00:00', 9001, 5.0),
+            ('CNEW', 'Newcomer', '2024-06-29 09:00:00', 9002, 5.0),
+        ])
+        second = incremental.perform_incremental_analytics(connection, 'orders', KEY, state_dir=tmp_path)
+        assert second == analytics.perform_analytics(connection, 'orders', engine='pandas')
+    finally:
+        connection.close()
+    saved = incremental.load_state(KEY, tmp_path)
+    assert saved['rows'] == rows + 2
+    assert str(saved['watermark']).startswith('2024-06-29 09:00:00')
+    assert calls[0] is None and calls[1] is not None
+
+
+def test_back_dated_orders_and_rebuild_flag_rescan(orders_db, frozen_now, tmp_path, monkeypatch):
+    path = orders_db(customers=20, orders_per_customer=3)
+    calls = _spy_folds(monkeypatch)
+    connection = StandinConnection(path)
+    try:
+        incremental.perform_incremental_analytics(connection, 'orders', KEY, state_dir=tmp_path)
+        # below the watermark, so the saved row count no longer matches
+        _insert(path, [('C0000002', 'Customer 2', '2023-02-01 09:00:00', 9003, 5.0)])
+        records = incremental.perform_incremental_analytics(connection, 'orders', KEY, state_dir=tmp_path)
+        assert records == analytics.perform_analytics(connection, 'orders', engine='pandas')
+        incremental.perform_incremental_analytics(connection, 'orders', KEY, rebuild=True, state_dir=tmp_path)
+    finally:
+        connection.close()
+    assert calls == [None, None, None]
+
+
+def test_unreadable_or_foreign_state_is_ignored(tmp_path):
+    incremental.save_state(KEY, {'version': incremental.STATE_VERSION, 'key': ('other',)}, tmp_path)
+    assert incremental.load_state(KEY, tmp_path) is None
+    with open(incremental._state_path(KEY, tmp_path), 'wb') as f:
+        f.write(b'not a pickle')
+    assert incremental.load_state(KEY, tmp_path) is None
+    incremental.clear_state(KEY, tmp_path)
+    incremental.clear_state(KEY, tmp_path)
@@ -0,0 +1,108 @@
+"""Background jobs: dedupe, shared cancellation and the /api/jobs endpoints."""
+import json
+import threading
+import time
+
+import pytest
+
+from jobs import JobManager
+from standin import StandinPool
+
+
+def _wait(job, timeout=10):
+    deadline = time.time() + timeout
+    while not job.finished:
+        assert time.time() < deadline, f"job still {job.status}"
+        time.sleep(0.01)
+
+
+def _blocking(started, release):
+    """A job body that reports progress until ``release`` is set."""
+    def run(report):
+        started.set()
+        while not release.wait(0.01):
+            report('scanning')
+        report('done scanning')
+        return 'result'
+    return run
+
+
+@pytest.fixture
+def manager():
+    manager = JobManager(workers=1)
+    yield manager
+    manager._executor.shutdown(wait=False, cancel_futures=True)
+
+
+def test_identical_submissions_share_a_job(manager):
+    started, release = threading.Event(), threading.Event()
+    job, deduplicated = manager.submit('k', _blocking(started, release))
+    again, again_deduplicated = manager.submit('k', _blocking(started, release))
+    assert not deduplicated and again_deduplicated
+    assert again is job and job.subscribers == 2
+    other, _ = manager.submit('other', lambda report: 'other')
+
+    release.set()
+    _wait(job)
+    _wait(other)
+    assert (job.status, job.result, other.result) == ('done', 'result', 'other')
+    # a finished job no longer absorbs new submissions
+    assert manager.submit('k', lambda report: 'fresh')[1] is False
+
+
+def test_cancel_waits_for_the_last_subscriber(manager):
+    started, release = threading.Event(), threading.Event()
+    job, _ = manager.submit('k', _blocking(started, release))
+    manager.submit('k', _blocking(started, release))
+    assert started.wait(10)
+
+    manager.cancel(job.id)
+    assert job.subscribers == 1 and not job.to_dict()['cancel_requested']
+    manager.cancel(job.id)
+    assert job.to_dict()['cancel_requested']
+    # a cancelling job is not joined by a resubmission
+    fresh, deduplicated = manager.submit('k', lambda report: 'fresh')
+    assert not deduplicated and fresh is not job
+    _wait(job)
+    _wait(fresh)
+    assert job.status == 'cancelled' and job.result is None
+    assert fresh.result == 'fresh'
+
+
+def test_queued_job_cancels_immediately_and_failures_are_kept(manager):
+    started, release = threading.Event(), threading.Event()
+    running, _ = manager.submit('running', _blocking(started, release))
+    assert started.wait(10)
+    queued, _ = manager.submit('queued', lambda report: 'never')
+    manager.cancel(queued.id)
+    assert queued.status == 'cancelled'
+
+    def fail(report):
+        raise ValueError("boom")
+    failed, _ = manager.submit('failed', fail)
+    release.set()
+    _wait(running)
+    _wait(failed)
+    assert (failed.status, failed.error) == ('failed', 'boom')
+    assert manager.cancel('missing') is None
+
+
+def test_jobs_endpoints(serve, orders_db, frozen_now):
+    request = serve(StandinPool(orders_db(customers=10, orders_per_customer=3)))
+    response, body = request('POST', '/api/jobs', {'table': 'orders'})
+    assert response.status == 202
+    job = json.loads(body)['job']
+
+    deadline = time.time() + 30
+    while job['status'] not in ('done', 'failed', 'cancelled'):
+        assert time.time() < deadline
+        time.sleep(0.05)
+        response, body = request('GET', f"/api/jobs/{job['job_id']}")
+        job = json.loads(body)['job']
+    assert job['status'] == 'done'
+
+    response, body = request('GET', f"/api/jobs/{job['job_id']}/results")
+    assert response.status == 200
+    assert len(json.loads(body)['data']) == 10
+    assert request('GET', '/api/jobs/missing')[0].status == 404
+    assert request('DELETE', '/api/jobs/missing')[0].status == 404
@@ -0,0 +1,82 @@
+"""Materialized summaries: keys, refreshes and the read-only path."""
+import sqlite3
+
+import analytics
+import materialize
+from standin import StandinConnection
+
+
+def _insert(path, rows):
+    connection = sqlite3.connect(path)
+    connection.executemany("INSERT INTO orders VALUES (?, ?, ?, ?, ?)", rows)
+    connection.commit()
+    connection.close()
+
+
+def test_text_and_binary_ids_are_keyed_by_bytes():
+    for data_type, column_type in (('varchar', 'varchar(32)'), ('char', 'char(8)'), ('text', 'text'),
+                                   ('binary', 'binary(16)')):
+        ddl = materialize._summary_ddl('s', {'customer_id': (data_type, column_type)}, 'customer_id', None)
+        assert f"customer_id {materialize.TEXT_KEY_TYPE} NOT NULL PRIMARY KEY" in ddl
+    ddl = materialize._summary_ddl('s', {'customer_id': ('int', 'int(11)')}, 'customer_id', None)
+    assert "customer_id int(11) NOT NULL PRIMARY KEY" in ddl
+
+
+def test_ids_differing_in_case_or_trailing_space_stay_apart(orders_db, frozen_now):
+    path = orders_db(customers=3, orders_per_customer=2)
+    _insert(path, [
+        ('abc', 'Lower', '2024-05-01 10:00:00', 101, 1.0),
+        ('ABC', 'Upper', '2024-05-02 10:00:00', 102, 1.0),
+        ('abc ', 'Padded', '2024-05-03 10:00:00', 103, 1.0),
+    ])
+    connection = StandinConnection(path)
+    try:
+        expected = analytics.perform_analytics(connection, 'orders', engine='pandas')
+        assert materialize.build_summary(connection, 'orders') == expected
+        assert materialize.read_summary(connection, 'orders') == expected
+        upper = materialize.lookup_summary(connection, 'orders', 'ABC')
+    finally:
+        connection.close()
+    assert [(r['customer_id'], r['customer_name']) for r in upper] == [('ABC', 'Upper')]
+
+
+def test_refresh_recomputes_new_orders_and_rebuilds_on_history_changes(orders_db, frozen_now):
+    path = orders_db(customers=30, orders_per_customer=4)
+    connection = StandinConnection(path)
+    try:
+        records, outcome = materialize.refresh_summary(connection, 'orders')
+        assert outcome == 'rebuilt'
+        assert records == analytics.perform_analytics(connection, 'orders', engine='pandas')
+        assert materialize.refresh_summary(connection, 'orders')[1] == 'unchanged'
+
+        _insert(path, [
+            ('C0000001', 'Customer 1', '2024-06-28 09:00:00', 9001, 5.0),
+            ('CNEW', 'Newcomer', '2024-06-29 09:00:00', 9002, 5.0),
+        ])
+        records, outcome = materialize.refresh_summary(connection, 'orders')
+        assert outcome == 'refreshed'
+        assert records == analytics.perform_analytics(connection, 'orders', engine='pandas')
+        assert str(materialize.read_meta(connection, 'orders')['watermark']).startswith('2024-06-29 09:00:00')
+
+        # a back-dated order changes history below the mark
+        _insert(path, [('C0000002', 'Customer 2', '2023-02-01 09:00:00', 9003, 5.0)])
+        records, outcome = materialize.refresh_summary(connection, 'orders')
+        assert outcome == 'rebuilt'
+        assert records == analytics.perform_analytics(connection, 'orders', engine='pandas')
+    finally:
+        connection.close()
+
+
+def test_read_summary_is_stale_and_writes_nothing(orders_db, frozen_now):
+    path = orders_db(customers=10, orders_per_customer=3)
+    connection = StandinConnection(path)
+    try:
+        assert materialize.read_summary(connection, 'orders') is None
+        built = materialize.build_summary(connection, 'orders')
+        _insert(path, [('CNEW', 'Newcomer', '2024-06-29 09:00:00', 9002, 5.0)])
+        meta = materialize.read_meta(connection, 'orders')
+        assert materialize.read_summary(connection, 'orders') == built
+        assert materialize.read_meta(connection, 'orders') == meta
+        assert materialize.lookup_summary(connection, 'orders', 'CNEW') == []
+    finally:
+        connection.close()
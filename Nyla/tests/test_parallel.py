@@ -0,0 +1,72 @@
+"""The parallel engine must return what the single-process pandas engine does."""
+import pandas as pd
+import pytest
+
+import analytics
+import parallel
+from standin import StandinConnection
+
+
+@pytest.fixture
+def three_workers(monkeypatch):
+    """A private pool of three worker processes, shut down afterwards."""
+    monkeypatch.setattr(parallel, 'PARALLEL_WORKERS', 3)
+    monkeypatch.setattr(parallel, '_executor_instance', None)
+    yield
+    if parallel._executor_instance is not None:
+        parallel._executor_instance.shutdown(wait=True)
+
+
+def test_in_memory_shards_match_pandas(orders_db, frozen_now, three_workers):
+    phases = []
+    connection = StandinConnection(orders_db(customers=80, orders_per_customer=5, skew=1.1, null_rate=0.05))
+    try:
+        expected = analytics.perform_analytics(connection, 'orders', engine='pandas')
+        actual = parallel.perform_parallel_analytics(connection, 'orders', workers=8, min_rows=0,
+                                                     progress=lambda phase, rows=None: phases.append((phase, rows)))
+    finally:
+        connection.close()
+    assert actual == expected
+    assert parallel._executor_instance is not None
+    assert ('aggregating', 400) in phases
+
+
+def test_sql_shards_cover_every_customer_once(orders_db, frozen_now, monkeypatch):
+    path = orders_db(customers=50, orders_per_customer=4)
+    monkeypatch.setattr(parallel.mysql.connector, 'connect', lambda **params: StandinConnection(params['path']))
+    connection = StandinConnection(path)
+    try:
+        expected = analytics.perform_analytics(connection, 'orders', engine='pandas')
+        date_col, customer_col, name_col, _ = analytics._detect_sample_columns(connection, 'orders')
+    finally:
+        connection.close()
+
+    parts = [parallel._aggregate_sql_shard({'path': path}, 'orders', date_col, customer_col, name_col, 4, shard)
+             for shard in range(4)]
+    assert sum(rows for _, rows in parts) == 200
+    frames = [frame for frame, _ in parts if frame is not None]
+    assert len(frames) > 1
+    results = pd.concat(frames, ignore_index=True).sort_values('customer_id', ignore_index=True)
+    assert analytics._finalize_results(results) == expected
+
+
+def test_small_tables_and_one_worker_run_single_process(orders_db, frozen_now, monkeypatch):
+    monkeypatch.setattr(parallel, '_executor', lambda: pytest.fail("started worker processes"))
+    connection = StandinConnection(orders_db(customers=10, orders_per_customer=3))
+    try:
+        expected = analytics.perform_analytics(connection, 'orders', engine='pandas')
+        assert parallel.perform_parallel_analytics(connection, 'orders', workers=1, min_rows=0) == expected
+        assert parallel.perform_parallel_analytics(connection, 'orders', workers=2) == expected
+    finally:
+        connection.close()
+
+
+@pytest.mark.parametrize('value', [0, -1, 1.5, True, 'two', [2]])
+def test_invalid_worker_counts(value):
+    with pytest.raises(ValueError):
+        parallel.parse_workers(value)
+
+
+def test_worker_counts_are_capped(monkeypatch):
+    monkeypatch.setattr(parallel, 'PARALLEL_WORKERS', 4)
+    assert (parallel.parse_workers(None), parallel.parse_workers('2'), parallel.parse_workers(64)) == (None, 2, 4)
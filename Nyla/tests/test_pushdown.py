@@ -0,0 +1,82 @@
+"""The pushdown query, run by the stand-in, must match the pandas engine."""
+import sqlite3
+import uuid
+from datetime import datetime
+
+import pytest
+
+import analytics
+from standin import StandinConnection, StandinPool
+
+
+def _insert(path, rows):
+    connection = sqlite3.connect(path)
+    connection.executemany("INSERT INTO orders VALUES (?, ?, ?, ?, ?)", rows)
+    connection.commit()
+    connection.close()
+
+
+def _both(path, **options):
+    plain, pushdown = StandinConnection(path), StandinConnection(path, pushdown=True)
+    try:
+        return (analytics.perform_analytics(plain, 'orders', engine='pandas', **options),
+                analytics.perform_analytics(pushdown, 'orders', engine='pushdown', **options))
+    finally:
+        plain.close()
+        pushdown.close()
+
+
+@pytest.mark.parametrize('options', [{}, {'skew': 1.2, 'seed': 3}, {'null_rate': 0.1, 'seed': 5}])
+def test_pushdown_matches_pandas(orders_db, frozen_now, options):
+    expected, actual = _both(orders_db(customers=60, orders_per_customer=6, **options))
+    assert actual == expected
+
+
+def test_case_and_accent_variants_stay_separate_customers(orders_db, frozen_now):
+    path = orders_db(customers=5, orders_per_customer=2)
+    _insert(path, [
+        ('abc', 'Lower', '2024-05-01 10:00:00', 101, 1.0),
+        ('abc', None, '2024-05-11 23:00:00', 102, 1.0),
+        ('ABC', 'Upper', '2024-05-02 10:00:00', 103, 1.0),
+        ('ABC', 'Upper', '2024-05-02 09:00:00', 104, 1.0),
+        ('abé', 'Accent', '2024-05-03 10:00:00', 105, 1.0),
+        ('nameless', None, '2024-04-03 10:00:00', 106, 1.0),
+        ('undated', 'Undated', None, 107, 1.0),
+        ('undated', 'Undated', '2024-01-01 00:00:00', 108, 1.0),
+    ])
+    expected, actual = _both(path)
+    assert actual == expected
+    assert {'abc', 'ABC', 'abé'} <= {r['customer_id'] for r in actual}
+
+
+def test_pushdown_respects_as_of(orders_db, frozen_now):
+    expected, actual = _both(orders_db(customers=40, orders_per_customer=5), as_of=datetime(2024, 1, 15))
+    assert actual == expected
+
+
+def test_binary_ids_are_read_as_hex(tmp_path, frozen_now):
+    path = str(tmp_path / 'binary.db')
+    connection = sqlite3.connect(path)
+    connection.execute("CREATE TABLE orders (customer_id BINARY(16), order_date DATETIME, order_id INTEGER)")
+    ids = [uuid.UUID(int=i * 7919).bytes for i in range(1, 6)]
+    connection.executemany("INSERT INTO orders VALUES (?, ?, ?)", [
+        (ids[i % 5], f"2024-0{1 + i % 5}-{10 + i:02d} 12:00:00", i) for i in range(15)
+    ])
+    connection.commit()
+    connection.close()
+    expected, actual = _both(path)
+    assert actual == expected
+    assert {r['customer_id'] for r in actual} == {i.hex().upper() for i in ids}
+
+
+def test_auto_picks_pushdown_when_the_server_supports_it(orders_db, frozen_now, monkeypatch):
+    calls = []
+    aggregate = analytics._aggregate_pushdown
+    monkeypatch.setattr(analytics, '_aggregate_pushdown', lambda *args: calls.append(args) or aggregate(*args))
+    path = orders_db(customers=10, orders_per_customer=3)
+    with StandinPool(path).connection() as connection:
+        analytics.perform_analytics(connection, 'orders')
+    assert calls == []
+    with StandinPool(path, pushdown=True).connection() as connection:
+        analytics.perform_analytics(connection, 'orders')
+    assert len(calls) == 1
@@ -0,0 +1,116 @@
+"""Server-side result sets: paging, search and point lookups."""
+import json
+import threading
+from urllib.parse import quote
+
+from results_store import MAX_PAGE_SIZE, ResultSet, ResultStore
+from standin import StandinPool
+
+SEGMENTS = ('Loyal', 'New', 'Lost', 'At Risk')
+
+
+def _records():
+    return [
+        {'customer_id': 123.0, 'customer_name': 'Ada  Lovelace', 'customer_classification': 'Loyal', 'churn_flag': 0},
+        {'customer_id': 'x7', 'customer_name': 'ada lovelace', 'customer_classification': 'Lost', 'churn_flag': 1},
+        {'customer_id': 'x8', 'customer_name': None, 'customer_classification': 'New', 'churn_flag': 0},
+    ]
+
+
+def _many(n=200):
+    return [
+        {'customer_id': f'c{i:03d}', 'customer_name': f'Name {i % 37}', 'customer_classification': SEGMENTS[i % 4],
+         'churn_flag': i % 3 == 0, 'total_spend': None if i % 11 == 0 else (i * 7919) % 1000}
+        for i in range(n)
+    ]
+
+
+def test_query_matches_a_scan():
+    records = _many()
+    result_set = ResultSet(records)
+    page = result_set.query(offset=5, limit=20, sort='total_spend', descending=True, segment='loyal',
+                            churn=0, search='name 1')
+    expected = [r for r in records if r['customer_classification'] == 'Loyal' and not r['churn_flag']
+                and 'name 1' in r['customer_name'].lower()]
+    present = sorted((r for r in expected if r['total_spend'] is not None),
+                     key=lambda r: r['total_spend'], reverse=True)
+    expected = present + [r for r in expected if r['total_spend'] is None]
+    assert page['total'] == len(expected)
+    assert page['rows'] == expected[5:25]
+
+    unsorted = result_set.query(limit=10 ** 6)
+    assert unsorted['limit'] == MAX_PAGE_SIZE and unsorted['rows'] == records
+    assert result_set.query(segment='unknown')['total'] == 0
+
+
+def test_prefix_search_matches_names_and_ids():
+    result_set = ResultSet(_many())
+    ids = [r['customer_id'] for r in result_set.query(search='c01', match='prefix', limit=100)['rows']]
+    assert ids == [f'c{i:03d}' for i in range(10, 20)]
+    names = result_set.query(search='name 3', match='prefix', limit=100)['rows']
+    assert {r['customer_name'] for r in names} == {'Name 3'} | {f'Name {i}' for i in range(30, 37)}
+    # substring search finds terms anywhere, prefix search only at the start
+    assert result_set.query(search='ame', match='prefix')['total'] == 0
+    assert result_set.query(search='ame')['total'] == 200
+    assert result_set.query(search='a\tb')['total'] == 0
+
+
+def test_store_keeps_the_latest_sets():
+    store = ResultStore(max_sets=2)
+    first = store.put(('x', 's', 'a'), _records())
+    assert store.put(('x', 's', 'a'), first.records) is first
+    store.put(('x', 's', 'b'), _records())
+    store.get(('x', 's', 'a'))
+    store.put(('x', 's', 'c'), _records())
+    assert store.get(('x', 's', 'b')) is None
+    assert store.get(('x', 's', 'a')) is first
+
+
+def test_lookup_by_normalized_id_and_name():
+    result_set = ResultSet(_records())
+    assert result_set.lookup(customer_id='123') == [_records()[0]]
+    assert result_set.lookup(customer_id=123) == [_records()[0]]
+    assert result_set.lookup(customer_id='x7') == [_records()[1]]
+    assert result_set.lookup(customer_id='nope') == []
+    assert [r['customer_id'] for r in result_set.lookup(name=' ADA lovelace ')] == [123.0, 'x7']
+
+
+def test_lookup_does_not_wait_for_paging_queries():
+    result_set = ResultStore().put(('x', 's', 't'), _records())
+    found = []
+    with result_set._lock:
+        worker = threading.Thread(target=lambda: found.append(result_set.lookup(customer_id='x8')))
+        worker.start()
+        worker.join(timeout=5)
+    assert found == [[_records()[2]]]
+
+
+def test_customer_endpoint_falls_back_to_the_database_on_index_misses(serve, orders_db, add_orders, frozen_now):
+    path = orders_db(customers=10, orders_per_customer=3)
+    request = serve(StandinPool(path))
+    response, body = request('POST', '/api/analytics', {'table': 'orders'})
+    known = json.loads(body)['data'][0]
+    response, body = request('GET', f"/api/customer?table=orders&id={quote(known['customer_id'])}")
+    assert json.loads(body)['source'] == 'index' and json.loads(body)['customers'] == [known]
+
+    add_orders(path, [('CNEW', 'Newcomer', '2024-06-29 09:00:00', 9001, 5.0)])
+    response, body = request('GET', '/api/customer?table=orders&id=CNEW')
+    body = json.loads(body)
+    assert response.status == 200 and body['source'] == 'query'
+    assert [r['customer_id'] for r in body['customers']] == ['CNEW']
+    response, _ = request('GET', '/api/customer?table=orders&id=missing')
+    assert response.status == 404
+
+
+def test_results_endpoint_pages_the_latest_run(serve, orders_db, frozen_now):
+    request = serve(StandinPool(orders_db(customers=25, orders_per_customer=3)))
+    assert request('GET', '/api/results?table=orders')[0].status == 404
+    response, body = request('POST', '/api/analytics', {'table': 'orders'})
+    records = json.loads(body)['data']
+
+    response, body = request('GET', '/api/results?table=orders&sort=customer_id&order=desc&offset=3&limit=5')
+    body = json.loads(body)
+    assert response.status == 200
+    assert (body['customers'], body['total']) == (25, 25)
+    assert body['rows'] == sorted(records, key=lambda r: r['customer_id'], reverse=True)[3:8]
+    assert request('GET', '/api/results?table=orders&offset=x')[0].status == 400
@@ -0,0 +1,50 @@
+"""SEGMENT_RULES must classify exactly like the scalar ``_classify_customer_segment``."""
+import itertools
+from datetime import datetime, timedelta
+
+import numpy as np
+import pandas as pd
+
+import analytics
+
+
+NOW = datetime(2024, 6, 30, 12, 0, 0)
+
+TOTAL_ORDERS = [np.nan, 1, 2, 3, 4, 5, 9, 10, 11]
+# zero, infinity, the 14-day High Value bound and gaps whose 1.5x / 3x multiples land on whole days
+AVG_GAPS = [np.nan, np.inf, 0.0, 1.0, 13.5, 14.0, 14.5, 20.0, 30.0, 60.0]
+# days since the last order; None is an unknown (NaT) last order date
+DAYS_SINCE_LAST = [None, 0, 1, 14, 20, 29, 30, 31, 45, 59, 60, 61, 89, 90, 91, 180]
+# days from first to last order; None is an unknown (NaT) first order date
+LIFETIMES = [None, 0, 29, 30, 31, 400]
+
+
+def _grid():
+    rows = []
+    for total, gap, since, lifetime in itertools.product(TOTAL_ORDERS, AVG_GAPS, DAYS_SINCE_LAST, LIFETIMES):
+        last = pd.NaT if since is None else pd.Timestamp(NOW - timedelta(days=since))
+        if lifetime is None or last is pd.NaT:
+            first = pd.NaT
+        else:
+            first = last - pd.Timedelta(days=lifetime)
+        rows.append({'total_orders': total, 'avg_order_gap': gap,
+                     'last_order_date': last, 'first_order_date': first})
+    return pd.DataFrame(rows)
+
+
+def test_rules_match_scalar_classifier():
+    grid = _grid()
+    expected = [
+        analytics._classify_customer_segment(row.total_orders, row.avg_order_gap, row.last_order_date,
+                                             row.first_order_date, now=NOW)
+        for row in grid.itertuples(index=False)
+    ]
+    actual = analytics._classify_segments(grid, NOW)
+    mismatches = grid.assign(expected=expected, actual=actual.to_numpy())
+    mismatches = mismatches[mismatches['expected'] != mismatches['actual']]
+    assert mismatches.empty, mismatches.head(20).to_string()
+
+
+def test_grid_reaches_every_segment():
+    segments = set(analytics._classify_segments(_grid(), NOW))
+    assert segments == {'One-time buyers', 'New', 'High Value', 'Loyal', 'At Risk', 'Lost'}
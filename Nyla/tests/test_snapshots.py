@@ -0,0 +1,99 @@
+"""Local snapshots of source columns: reuse, invalidation and eviction."""
+import json
+import os
+
+import numpy as np
+import pandas as pd
+
+import analytics
+from snapshots import SnapshotCache
+from standin import StandinConnection, StandinPool
+
+KEY = ('x', 's', 'orders')
+
+
+def _frame(rows=50):
+    return pd.DataFrame({
+        'customer_id': pd.Categorical([f"C{i % 7}" for i in range(rows)]),
+        'order_date': pd.date_range('2024-01-01', periods=rows, freq='D'),
+        'amount': np.arange(rows, dtype=float),
+        'note': [None if i % 5 == 0 else f"n{i}" for i in range(rows)],
+    })
+
+
+def test_columns_round_trip_and_survive_a_restart(tmp_path):
+    df = _frame()
+    SnapshotCache(tmp_path).put(KEY, 'f1', df)
+    restarted = SnapshotCache(tmp_path)
+    loaded = restarted.get(KEY, 'f1', list(df.columns))
+    # datetimes come back at nanosecond resolution
+    pd.testing.assert_frame_equal(loaded, df, check_dtype=False, check_categorical=False)
+    assert isinstance(loaded['customer_id'].dtype, pd.CategoricalDtype)
+    assert list(restarted.get(KEY, 'f1', ['amount']).columns) == ['amount']
+    assert restarted.get(KEY, 'f1', ['missing']) is None
+    assert restarted.stats()['hits'] == 2 and restarted.stats()['misses'] == 1
+
+
+def test_changed_fingerprint_drops_the_snapshot(tmp_path):
+    cache = SnapshotCache(tmp_path)
+    cache.put(KEY, 'f1', _frame())
+    assert cache.get(KEY, None, ['amount']) is None
+    assert cache.stats()['entries'] == 1
+    assert cache.get(KEY, 'f2', ['amount']) is None
+    assert cache.stats()['entries'] == 0
+    assert os.listdir(tmp_path) == []
+    cache.put(KEY, None, _frame())
+    assert cache.stats()['entries'] == 0
+
+
+def test_least_recently_used_snapshots_are_evicted(tmp_path):
+    probe = SnapshotCache(tmp_path / 'probe')
+    probe.put(KEY, 'f', _frame())
+    size = probe.stats()['bytes']
+    cache = SnapshotCache(tmp_path / 'cache', max_bytes=size * 2 + size // 2)
+    for table in ('a', 'b'):
+        cache.put(('x', 's', table), 'f', _frame())
+    cache.get(('x', 's', 'a'), 'f', ['amount'])
+    cache.put(('x', 's', 'c'), 'f', _frame())
+    assert cache.get(('x', 's', 'b'), 'f', ['amount']) is None
+    assert cache.get(('x', 's', 'a'), 'f', ['amount']) is not None
+    assert cache.invalidate(table='a') == 1 and cache.stats()['entries'] == 1
+
+
+def test_second_run_reads_the_snapshot(orders_db, frozen_now, tmp_path, monkeypatch):
+    loads = []
+    load = analytics._load_projected
+    monkeypatch.setattr(analytics, '_load_projected', lambda *a, **k: loads.append(a) or load(*a, **k))
+    cache = SnapshotCache(tmp_path / 'snapshots')
+    connection = StandinConnection(orders_db(customers=20, orders_per_customer=4))
+    try:
+        expected = analytics.perform_analytics(connection, 'orders', engine='pandas')
+        first = analytics.perform_analytics(connection, 'orders', snapshot=cache.bind(KEY, 'f1'))
+        second = analytics.perform_analytics(connection, 'orders', snapshot=cache.bind(KEY, 'f1'))
+    finally:
+        connection.close()
+    assert first == second == expected
+    assert len(loads) == 2
+    assert cache.stats()['hits'] == 1
+
+
+def test_snapshot_requests_reuse_the_snapshot_until_the_table_changes(serve, backend_app, orders_db, add_orders,
+                                                                      frozen_now, tmp_path, monkeypatch):
+    monkeypatch.setattr(backend_app, 'snapshot_cache', SnapshotCache(tmp_path / 'snapshots'))
+    path = orders_db(customers=20, orders_per_customer=4)
+    request = serve(StandinPool(path))
+
+    def run():
+        # a fresh result cache, so every run reaches the snapshot
+        monkeypatch.setattr(backend_app, 'result_cache', backend_app.ResultCache())
+        response, body = request('POST', '/api/analytics', {'table': 'orders', 'snapshot': True})
+        assert response.status == 200
+        return json.loads(body)['data']
+
+    first = run()
+    assert run() == first
+    assert backend_app.snapshot_cache.stats()['hits'] == 1
+    add_orders(path, [('CNEW', 'Newcomer', '2024-06-29 09:00:00', 9001, 5.0)])
+    assert len(run()) == len(first) + 1
+    stats = backend_app.snapshot_cache.stats()
+    assert (stats['hits'], stats['entries']) == (1, 1)
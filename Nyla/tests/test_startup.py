@@ -0,0 +1,80 @@
+"""Startup: lazy imports, liveness and readiness, and the warmup."""
+import json
+import os
+import subprocess
+import sys
+import threading
+
+import pytest
+
+from standin import StandinPool
+
+BACKEND_DIR = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'backend')
+
+
+def test_importing_app_does_not_import_the_analytics_stack():
+    script = ("import sys, app; "
+              "print(','.join(m for m in ('pandas', 'numpy', 'mysql.connector') if m in sys.modules))")
+    output = subprocess.run([sys.executable, '-c', script], cwd=BACKEND_DIR, capture_output=True, text=True,
+                            check=True).stdout
+    assert output.strip() == ''
+
+
+@pytest.fixture
+def starting(backend_app, monkeypatch):
+    """``app`` as it is before its warmup has finished, with no database configured."""
+    monkeypatch.setattr(backend_app, 'ready', threading.Event())
+    monkeypatch.setattr(backend_app, 'startup_phase', 'loading')
+    monkeypatch.setattr(backend_app, 'startup_errors', [])
+    for name in ('current_pool', 'current_schema', 'current_server'):
+        monkeypatch.setattr(backend_app, name, getattr(backend_app, name))
+    for name in ('NYLA_DB_HOST', 'NYLA_DB_USER', 'NYLA_DB_SCHEMA', 'NYLA_HOT_TABLES'):
+        monkeypatch.delenv(name, raising=False)
+    return backend_app
+
+
+def test_ready_only_after_warmup(starting, serve):
+    request = serve(None)
+    assert request('GET', '/healthz')[0].status == 200
+    response, body = request('GET', '/readyz')
+    assert response.status == 503 and json.loads(body)['status'] == 'loading'
+
+    starting.warmup()
+    response, body = request('GET', '/readyz')
+    assert response.status == 200
+    assert json.loads(body) == {'status': 'ready', 'errors': []}
+
+
+def test_warmup_connects_and_preloads_hot_tables(starting, orders_db, frozen_now, monkeypatch):
+    pool = StandinPool(orders_db(customers=10, orders_per_customer=3))
+    monkeypatch.setattr(starting, 'create_pool', lambda *args: pool)
+    monkeypatch.setenv('NYLA_DB_HOST', 'db')
+    monkeypatch.setenv('NYLA_DB_USER', 'nyla')
+    monkeypatch.setenv('NYLA_DB_SCHEMA', 'shop')
+    monkeypatch.setenv('NYLA_HOT_TABLES', 'orders, missing')
+
+    starting.warmup()
+    assert starting.ready.is_set()
+    assert (starting.current_pool, starting.current_schema, starting.current_server) == (pool, 'shop', 'db:3306')
+    assert starting.result_cache.stats()['entries'] == 1
+    assert len(starting.startup_errors) == 1 and 'missing' in starting.startup_errors[0]
+
+
+def test_failed_connection_is_reported_but_ready(starting, monkeypatch):
+    monkeypatch.setattr(starting, 'create_pool', lambda *args: None)
+    monkeypatch.setenv('NYLA_DB_HOST', 'db')
+    monkeypatch.setenv('NYLA_DB_USER', 'nyla')
+    monkeypatch.setenv('NYLA_DB_SCHEMA', 'shop')
+    starting.warmup()
+    assert starting.ready.is_set() and starting.current_pool is None
+    assert starting.startup_errors == ["Could not connect to shop at db:3306"]
+
+
+def test_failed_import_is_not_ready(starting, serve, monkeypatch):
+    def fail():
+        raise ImportError("no pandas")
+    monkeypatch.setattr(starting, 'load_backend', fail)
+    starting.warmup()
+    response, body = serve(None)('GET', '/readyz')
+    assert response.status == 503
+    assert json.loads(body)['status'] == 'failed'